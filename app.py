@@ -1,9 +1,196 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_file, url_for, abort, g
+import logging
 import os
-from config import BASE_DIR
+import threading
+from werkzeug.utils import secure_filename
+from config import (BASE_DIR, RESULTS_DIR, RESULT_PREVIEW_MAX_SIZE, RESULT_JPEG_QUALITY,
+                    MAX_FILE_SIZE, MAX_CONCURRENT_REQUESTS, MAX_QUEUED_REQUESTS,
+                    QUEUE_TIMEOUT, MAX_IMAGE_PIXELS, DOWNSCALE_OVERSIZED_IMAGES,
+                    UPLOADS_DIR, UPLOADS_MAX_BYTES, UPLOADS_MAX_AGE,
+                    RESULTS_MAX_BYTES, RESULTS_MAX_AGE, STORAGE_SWEEP_INTERVAL,
+                    PREWARM_MODELS, ensure_directories, LOG_LEVEL, LOG_FORMAT,
+                    UNKNOWN_ENCODINGS_DIR, STORE_UNKNOWN_FACES, UNKNOWN_FACES_MAX,
+                    DEDUP_IMAGES, DUPLICATE_CACHE_PATH, DUPLICATE_MAX_DISTANCE, DUPLICATE_CACHE_MAX_ENTRIES,
+                    GALLERY_DIR, GALLERY_POLL_INTERVAL, LEGACY_DATABASE_PATH,
+                    FACE_DETECTION_MODEL, NUMBER_OF_TIMES_TO_UPSAMPLE,
+                    ENROLLMENT_WORKERS, ENROLLMENT_MAX_PENDING_IMAGES, ENROLLMENT_MIN_FACE_SIZE,
+                    ENROLLMENT_MIN_SHARPNESS, ENROLLMENT_JOBS_DIR, ENROLLMENT_COMMIT_EVERY,
+                    ENROLLMENT_COMMIT_INTERVAL, KNOWN_FACES_DIR,
+                    PROFILE_DIR, PROFILE_MAX_ENTRIES, PROFILE_REQUESTS, PROFILE_SAMPLE_RATE,
+                    VIDEO_SOURCE, VIDEO_EVERY_N_FRAMES, VIDEO_SCALE, VIDEO_JPEG_QUALITY,
+                    VIDEO_IDLE_TIMEOUT)
+from face_detection.face_detector import FaceDetector
+from face_recognition.duplicate_cache import DuplicateCache
+from face_recognition.face_recognizer import FaceRecognizer
+from face_recognition.snapshot_store import SnapshotStore
+from face_recognition.unknown_faces import UnknownFaceStore
+from web.render_cache import ResultRenderCache, detection_annotations, recognition_annotations
+from web.admission import (AdmissionController, AdmissionRejected, ImageTooLarge, InvalidImage,
+                           enforce_pixel_budget)
+from web.artifact_store import ArtifactStore
+from web.enrollment import EnrollmentManager
+from logging_setup import configure_logging
+from profiling import ProfileRecorder, annotate, stage
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+# Oversized request bodies are rejected before they are read
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+
+# Uploads and previews live in quota-managed, content-addressed stores
+upload_store = ArtifactStore(UPLOADS_DIR, UPLOADS_MAX_BYTES, UPLOADS_MAX_AGE,
+                             sweep_interval=STORAGE_SWEEP_INTERVAL)
+results_store = ArtifactStore(RESULTS_DIR, RESULTS_MAX_BYTES, RESULTS_MAX_AGE,
+                              sweep_interval=STORAGE_SWEEP_INTERVAL)
+
+# Annotated previews are only rendered when a client requests them
+render_cache = ResultRenderCache(RESULTS_DIR,
+                                 max_size=RESULT_PREVIEW_MAX_SIZE,
+                                 jpeg_quality=RESULT_JPEG_QUALITY,
+                                 store=results_store)
+
+# Bounds how many detection / recognition requests run and wait at once
+admission = AdmissionController(max_concurrent=MAX_CONCURRENT_REQUESTS,
+                                max_queue=MAX_QUEUED_REQUESTS,
+                                queue_timeout=QUEUE_TIMEOUT)
+# Downscaling an oversized upload decodes it: bound those decodes like the heavy work itself
+downscale_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Unrecognized faces, clustered offline to find recurring strangers
+unknown_faces = UnknownFaceStore(UNKNOWN_ENCODINGS_DIR, max_faces=UNKNOWN_FACES_MAX)
+
+# Near-duplicate uploads reuse the faces found in their earlier twin
+duplicate_cache = (DuplicateCache(DUPLICATE_CACHE_PATH, DUPLICATE_MAX_DISTANCE,
+                                  max_entries=DUPLICATE_CACHE_MAX_ENTRIES) if DEDUP_IMAGES else None)
+
+# One recognizer per process over the gallery shared by all workers
+gallery_store = SnapshotStore(GALLERY_DIR)
+_recognizer = None
+_recognizer_lock = threading.Lock()
+_imported_database_mtime = None
+
+
+def _get_recognizer():
+    """The shared recognizer, created on first use; picks up a newly saved database pickle"""
+    global _recognizer
+    with _recognizer_lock:
+        if _recognizer is None:
+            _recognizer = FaceRecognizer(duplicate_cache=duplicate_cache, snapshot_store=gallery_store,
+                                         poll_interval=GALLERY_POLL_INTERVAL)
+        _import_saved_database(_recognizer)
+        return _recognizer
+
+
+def _import_saved_database(recognizer):
+    """Publish models/face_database.pkl when it was saved after the shared gallery (lock held)"""
+    global _imported_database_mtime
+    try:
+        mtime = os.path.getmtime(LEGACY_DATABASE_PATH)
+    except OSError:
+        return
+    if mtime == _imported_database_mtime:
+        return
+
+    try:
+        imported = recognizer.import_database(LEGACY_DATABASE_PATH)
+    except Exception as e:
+        # Possibly caught mid-save: tried again on the next request
+        logger.warning("⚠️  Could not import %s: %s", LEGACY_DATABASE_PATH, e)
+        return
+    _imported_database_mtime = mtime
+    if not imported:
+        logger.warning("⚠️  %s is older than the shared gallery and was not imported",
+                           LEGACY_DATABASE_PATH)
+
+
+# Training images are checked and encoded in the background, straight into the live gallery
+enrollment = EnrollmentManager(ENROLLMENT_JOBS_DIR, _get_recognizer,
+                               workers=ENROLLMENT_WORKERS,
+                               max_pending_images=ENROLLMENT_MAX_PENDING_IMAGES,
+                               model=FACE_DETECTION_MODEL,
+                               number_of_times_to_upsample=NUMBER_OF_TIMES_TO_UPSAMPLE,
+                               min_face_size=ENROLLMENT_MIN_FACE_SIZE,
+                               min_sharpness=ENROLLMENT_MIN_SHARPNESS,
+                               known_faces_dir=KNOWN_FACES_DIR,
+                               commit_every=ENROLLMENT_COMMIT_EVERY,
+                               commit_interval=ENROLLMENT_COMMIT_INTERVAL)
+
+
+# Per-request profiles, written to a bounded ring buffer on disk
+profiler = ProfileRecorder(PROFILE_DIR, max_entries=PROFILE_MAX_ENTRIES, sample_rate=PROFILE_SAMPLE_RATE)
+
+
+def _wants_json():
+    return request.path.startswith('/api/')
+
+
+@app.errorhandler(AdmissionRejected)
+def handle_admission_rejected(error):
+    """Fast 503 when the server is saturated"""
+    if _wants_json():
+        response = jsonify({'error': 'Server busy, please retry later', 'reason': error.reason})
+    else:
+        response = app.response_class('Server busy, please retry later', mimetype='text/plain')
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@app.errorhandler(ImageTooLarge)
+def handle_image_too_large(error):
+    """Reject images over the pixel budget"""
+    if _wants_json():
+        return jsonify({'error': str(error)}), 413
+    return app.response_class(str(error), status=413, mimetype='text/plain')
+
+
+@app.errorhandler(InvalidImage)
+def handle_invalid_image(error):
+    """Reject uploads that aren't images"""
+    if _wants_json():
+        return jsonify({'error': str(error)}), 400
+    return app.response_class(str(error), status=400, mimetype='text/plain')
+
+
+def _profile_requested():
+    if not PROFILE_REQUESTS:
+        return False
+    flag = request.headers.get('X-Profile') or request.args.get('profile', '')
+    return flag.lower() in ('1', 'true', 'yes')
+
+
+@app.before_request
+def start_profile():
+    """Profile this request when asked to (or sampled)"""
+    if request.endpoint in (None, 'static', 'video_feed'):
+        return
+    session = profiler.session(request.endpoint, force=_profile_requested())
+    trace = session.__enter__()
+    if trace is None:
+        session.__exit__(None, None, None)
+        return
+    annotate(method=request.method, path=request.path)
+    g.profile_session = session
+    g.profile_id = trace.profile_id
+
+
+@app.after_request
+def tag_profile(response):
+    """Tell the client where its profile went"""
+    if 'profile_id' in g:
+        annotate(status=response.status_code)
+        response.headers['X-Profile-Id'] = g.profile_id
+    return response
+
+
+@app.teardown_request
+def finish_profile(error=None):
+    session = g.pop('profile_session', None)
+    if session is not None:
+        session.__exit__(None, None, None)
+
 
 @app.route('/')
 def home():
@@ -21,22 +208,20 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'project': 'Face Recognition System',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'load': admission.stats(),
+        'storage': {'uploads': upload_store.last_sweep, 'results': results_store.last_sweep}
     })
 
-if __name__ == '__main__':
-    print("🚀 Starting Face Recognition System...")
-    print(f"📁 Project Directory: {BASE_DIR}")
-    print("🌐 Starting web server on http://localhost:5000")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
-    
-    # Add these imports to app.py
-from face_detection.face_detector import FaceDetector
-import os
-from werkzeug.utils import secure_filename
-
-# Add these routes to app.py (before if __name__ == '__main__')
+def _save_upload(file):
+    """Store an uploaded file by content hash and apply the per-request pixel budget"""
+    extension = os.path.splitext(secure_filename(file.filename))[1]
+    with stage('upload'):
+        upload_path, _ = upload_store.put_stream(file.stream, extension or '.jpg')
+        upload_path = enforce_pixel_budget(upload_path, MAX_IMAGE_PIXELS, downscale=DOWNSCALE_OVERSIZED_IMAGES,
+                                           decode_slots=downscale_slots, store=upload_store,
+                                           decode_timeout=QUEUE_TIMEOUT)
+    return upload_path
 
 @app.route('/detect-faces', methods=['GET', 'POST'])
 def detect_faces():
@@ -44,100 +229,248 @@ def detect_faces():
     if request.method == 'POST':
         if 'file' not in request.files:
             return render_template('detect_faces.html', error='No file selected')
-        
+
         file = request.files['file']
         if file.filename == '':
             return render_template('detect_faces.html', error='No file selected')
-        
+
         if file:
             # Save uploaded file
-            filename = secure_filename(file.filename)
-            upload_path = os.path.join('datasets', 'unknown_faces', filename)
-            file.save(upload_path)
-            
+            upload_path = _save_upload(file)
+
             # Detect faces
-            detector = FaceDetector()
-            face_locations, image = detector.detect_faces(upload_path)
-            
+            with admission.admit():
+                detector = FaceDetector()
+                face_locations, image = detector.detect_faces(upload_path)
+
             if face_locations:
-                # Create output image with bounding boxes
-                output_path = os.path.join('static', 'results', f'detected_{filename}')
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                detected_image = detector.draw_face_boxes(image, face_locations, output_path)
-                
-                return render_template('detect_faces.html', 
+                # Register the annotated preview; it is rendered on first view
+                key = render_cache.register(upload_path, detection_annotations(face_locations))
+
+                return render_template('detect_faces.html',
                                     faces_detected=len(face_locations),
-                                    result_image=f'results/detected_{filename}')
+                                    result_image=url_for('result_preview', key=key))
             else:
                 return render_template('detect_faces.html', error='No faces detected')
-    
-    return render_template('detect_faces.html')
-
-# Create the template directory for results
-os.makedirs('static/results', exist_ok=True)
 
-# Add to imports in app.py
-from face_recognition.face_recognizer import FaceRecognizer
-import pickle
-
-# Add these routes to app.py:
+    return render_template('detect_faces.html')
 
 @app.route('/recognize-faces', methods=['GET', 'POST'])
 def recognize_faces():
     """Face recognition page"""
-    recognizer = FaceRecognizer()
-    
-    # Try to load existing database
-    database_path = os.path.join('models', 'face_database.pkl')
-    if os.path.exists(database_path):
-        recognizer.load_database(database_path)
-    
+    recognizer = _get_recognizer()
+
     if request.method == 'POST':
         if 'file' not in request.files:
             return render_template('recognize_faces.html', error='No file selected')
-        
+
         file = request.files['file']
         if file.filename == '':
             return render_template('recognize_faces.html', error='No file selected')
-        
+
         if file:
             # Save uploaded file
-            filename = secure_filename(file.filename)
-            upload_path = os.path.join('datasets', 'unknown_faces', filename)
-            file.save(upload_path)
-            
-            # Recognize faces
-            recognized_faces, result_image = recognizer.recognize_faces(upload_path, draw_results=True)
-            
+            upload_path = _save_upload(file)
+
+            # Recognize faces (drawing happens lazily in result_preview)
+            with admission.admit():
+                recognized_faces, _ = recognizer.recognize_faces(upload_path, draw_results=False,
+                                                                 include_encodings=STORE_UNKNOWN_FACES)
+            if STORE_UNKNOWN_FACES:
+                unknown_faces.add_unknown(recognized_faces, upload_path)
+
             if recognized_faces:
-                # Save result image
-                output_path = os.path.join('static', 'results', f'recognized_{filename}')
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                if result_image:
-                    result_image.save(output_path)
-                
-                return render_template('recognize_faces.html', 
+                key = render_cache.register(upload_path, recognition_annotations(recognized_faces))
+
+                return render_template('recognize_faces.html',
                                     faces=recognized_faces,
-                                    result_image=f'results/recognized_{filename}',
+                                    result_image=url_for('result_preview', key=key),
                                     known_people=recognizer.known_face_names)
             else:
                 return render_template('recognize_faces.html', error='No faces detected or recognized')
-    
+
     return render_template('recognize_faces.html', known_people=recognizer.known_face_names)
 
+def _submit_training_images():
+    """Store the uploaded training images and start an enrollment job, returning (job, error)"""
+    person_name = (request.form.get('person_name') or '').strip()
+    if not person_name:
+        return None, 'Please enter a name'
+    # The name becomes a directory under known_faces
+    if person_name.startswith('.') or any(c in person_name for c in '/\\\0'):
+        return None, 'Names may not contain slashes or start with a dot'
+
+    files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not files:
+        return None, 'Please select at least one image'
+
+    # Turned away before any upload is stored or decoded when the queue is full
+    enrollment.reserve(len(files))
+    try:
+        images = [(_save_upload(file), secure_filename(file.filename)) for file in files]
+    except BaseException:
+        enrollment.release(len(files))
+        raise
+    return enrollment.submit(person_name, images), None
+
 @app.route('/train', methods=['GET', 'POST'])
 def train_model():
     """Train model page"""
     if request.method == 'POST':
-        person_name = request.form.get('person_name')
-        
-        if not person_name:
-            return render_template('train.html', error='Please enter a name')
-        
-        # In a real app, you'd handle file uploads here
-        return render_template('train.html', 
-                             success=f'Training interface for {person_name} would be implemented here')
-    
-    return render_template('train.html')
\ No newline at end of file
+        job, error = _submit_training_images()
+        if error:
+            return render_template('train.html', error=error)
+
+        return render_template('train.html',
+                             success=f"Enrolling {job['person']} from {job['images']} image(s)",
+                             job=job,
+                             status_url=url_for('api_training_status', job_id=job['job_id']))
+
+    return render_template('train.html')
+
+@app.route('/results/<key>.jpg')
+def result_preview(key):
+    """Serve an annotated preview, rendering it on first access"""
+    with stage('render'):
+        preview_path = render_cache.get_or_render(key)
+    if preview_path is None:
+        abort(404)
+
+    response = send_file(preview_path, mimetype='image/jpeg', conditional=True)
+    # Content-addressed: the bytes behind a key never change
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+def _save_api_upload():
+    """Save the uploaded file of an API request, returning its path or None"""
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return None
+    return _save_upload(file)
+
+def _wants_preview():
+    """API clients opt in to an annotated preview with ?render=1"""
+    return request.args.get('render', '0').lower() in ('1', 'true', 'yes')
+
+@app.route('/api/detect-faces', methods=['POST'])
+def api_detect_faces():
+    """Face detection API (JSON only, no image rendering by default)"""
+    upload_path = _save_api_upload()
+    if upload_path is None:
+        return jsonify({'error': 'No file selected'}), 400
+
+    with admission.admit():
+        detector = FaceDetector()
+        face_locations, _ = detector.detect_faces(upload_path)
+
+    result = {
+        'faces_detected': len(face_locations),
+        'faces': [{'face_number': i + 1, 'location': [int(v) for v in location]}
+                  for i, location in enumerate(face_locations)]
+    }
+    if face_locations and _wants_preview():
+        key = render_cache.register(upload_path, detection_annotations(face_locations))
+        result['result_url'] = url_for('result_preview', key=key)
+
+    return jsonify(result)
+
+@app.route('/api/recognize-faces', methods=['POST'])
+def api_recognize_faces():
+    """Face recognition API (JSON only, no image rendering by default)"""
+    upload_path = _save_api_upload()
+    if upload_path is None:
+        return jsonify({'error': 'No file selected'}), 400
+
+    recognizer = _get_recognizer()
+
+    # ?top_k=3 lists the closest known people for each face
+    top_k = min(max(request.args.get('top_k', 0, type=int), 0), 10)
+
+    with admission.admit():
+        recognized_faces, _ = recognizer.recognize_faces(upload_path, draw_results=False, top_k=top_k,
+                                                         include_encodings=STORE_UNKNOWN_FACES)
+    if STORE_UNKNOWN_FACES:
+        unknown_faces.add_unknown(recognized_faces, upload_path)
+
+    result = {
+        'faces_detected': len(recognized_faces),
+        'faces': [face.to_dict() for face in recognized_faces]
+    }
+    if recognized_faces and _wants_preview():
+        key = render_cache.register(upload_path, recognition_annotations(recognized_faces))
+        result['result_url'] = url_for('result_preview', key=key)
+
+    return jsonify(result)
+
+@app.route('/api/train', methods=['POST'])
+def api_train():
+    """Start enrolling a person (202 with a job id; poll the status URL for the outcome)"""
+    job, error = _submit_training_images()
+    if error:
+        return jsonify({'error': error}), 400
+
+    response = jsonify({**job, 'status_url': url_for('api_training_status', job_id=job['job_id'])})
+    response.status_code = 202
+    response.headers['Location'] = url_for('api_training_status', job_id=job['job_id'])
+    return response
+
+@app.route('/api/train/<job_id>')
+def api_training_status(job_id):
+    """Progress of an enrollment job: processed / accepted counts and rejection reasons"""
+    job = enrollment.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+_stream_hub = None
+_stream_hub_lock = threading.Lock()
+
+def _get_stream_hub():
+    """The single live pipeline shared by all viewers (created on first use)"""
+    global _stream_hub
+    with _stream_hub_lock:
+        if _stream_hub is None:
+            # OpenCV is only loaded once somebody actually watches the stream
+            from video.stream_hub import StreamHub
+            from video.face_tracker import FaceTracker
+
+            recognizer = _get_recognizer()
+
+            source = int(VIDEO_SOURCE) if VIDEO_SOURCE.isdigit() else VIDEO_SOURCE
+            _stream_hub = StreamHub(source, recognizer,
+                                    every_n_frames=VIDEO_EVERY_N_FRAMES,
+                                    scale=VIDEO_SCALE,
+                                    jpeg_quality=VIDEO_JPEG_QUALITY,
+                                    idle_timeout=VIDEO_IDLE_TIMEOUT,
+                                    tracker=FaceTracker())
+        return _stream_hub
+
+@app.route('/video-feed')
+def video_feed():
+    """Live annotated video as multipart MJPEG"""
+    if not VIDEO_SOURCE:
+        abort(404)
+
+    hub = _get_stream_hub()
+    response = Response(hub.frames(), mimetype=hub.mimetype())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def prewarm():
+    """Load the dlib models now so the first request doesn't pay for it"""
+    FaceDetector().warm_up()
+    FaceRecognizer().warm_up()
+
+if __name__ == '__main__':
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+    print("🚀 Starting Face Recognition System...")
+    print(f"📁 Project Directory: {BASE_DIR}")
+    ensure_directories()
+    if PREWARM_MODELS:
+        prewarm()
+    print("🌐 Starting web server on http://localhost:5000")
+
+    # Threaded so the admission controller, not the socket backlog, decides who waits
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,214 @@
+# benchmarks/bench_condensation.py
+"""
+Gallery condensation benchmark: shrinkage and recognition accuracy
+
+Compares a gallery that keeps every enrolled sample (the first one as
+primary) with the same gallery condensed by FaceRecognizer.condense
+(near-duplicates dropped, at most K medoids per person, the most typical
+one as primary) and reports samples, bytes, match latency, accuracy and
+false-accept rate for both.
+
+By default the enrolled samples are synthetic burst captures: a few
+capture sessions per person (pose / lighting) with several almost
+identical frames each, like capture_training_images.py produces. Probes
+come from new sessions of enrolled people and from never-seen people.
+With --dataset the real images are encoded once (cached like
+sweep_accuracy.py) and scored leave-one-out instead.
+
+Usage:
+    python benchmarks/bench_condensation.py
+    python benchmarks/bench_condensation.py --people 1000 --sessions 4 --burst 10 --max-samples 3,5
+    python benchmarks/bench_condensation.py --dataset datasets/known_faces --json condensation.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.bench_matching import IDENTITY_SPREAD, ENCODING_SIZE, _commit, _quiet  # noqa: E402
+from face_recognition.face_recognizer import FaceRecognizer  # noqa: E402
+from face_recognition.gallery_condensation import condense_encodings  # noqa: E402
+
+# Per-dimension spread of capture sessions around their identity, and of burst frames within one
+SESSION_SPREAD = 0.022
+FRAME_SPREAD = 0.005
+
+
+def synthetic_dataset(rng, people, sessions, burst, probes_per_person):
+    """
+    Burst-captured gallery and probes
+
+    Returns:
+        tuple: (face database, probe encodings, expected name per probe or None)
+    """
+    identities = rng.normal(0.0, IDENTITY_SPREAD, size=(people, ENCODING_SIZE))
+    names = [f"person_{i:06d}" for i in range(people)]
+
+    def session_frames(identity, count):
+        session = identity + rng.normal(0.0, SESSION_SPREAD, size=ENCODING_SIZE)
+        return session + rng.normal(0.0, FRAME_SPREAD, size=(count, ENCODING_SIZE))
+
+    database = {}
+    for name, identity in zip(names, identities):
+        database[name] = [frame for _ in range(sessions) for frame in session_frames(identity, burst)]
+
+    probes, expected = [], []
+    for name, identity in zip(names, identities):
+        for _ in range(probes_per_person):
+            probes.append(session_frames(identity, 1)[0])
+            expected.append(name)
+    strangers = rng.normal(0.0, IDENTITY_SPREAD, size=(people * probes_per_person, ENCODING_SIZE))
+    for stranger in strangers:
+        probes.append(stranger + rng.normal(0.0, SESSION_SPREAD, size=ENCODING_SIZE))
+        expected.append(None)
+    return database, probes, expected
+
+
+def build_recognizer(database, tolerance):
+    with _quiet():
+        recognizer = FaceRecognizer(tolerance=tolerance)
+    for name, encodings in database.items():
+        recognizer.add_person_encodings(name, encodings)
+    return recognizer
+
+
+def evaluate(recognizer, probes, expected):
+    """Accuracy on enrolled probes, false-accept rate on strangers, matching latency"""
+    started = time.perf_counter()
+    matches = recognizer.match_faces(probes, [(0, 1, 1, 0)] * len(probes))
+    elapsed = time.perf_counter() - started
+
+    genuine = [(m, name) for m, name in zip(matches, expected) if name is not None]
+    strangers = [m for m, name in zip(matches, expected) if name is None]
+    correct = sum(1 for m, name in genuine if m.recognized and m.name == name)
+    accepted = sum(1 for m in strangers if m.recognized)
+    return {
+        'accuracy': round(correct / len(genuine), 4) if genuine else None,
+        'false_accept_rate': round(accepted / len(strangers), 4) if strangers else None,
+        'match_ms_per_face': round(1000 * elapsed / len(probes), 4)
+    }
+
+
+def gallery_size(recognizer):
+    samples = sum(len(encodings) for encodings in recognizer.face_database.values())
+    return {'samples': samples, 'bytes': samples * ENCODING_SIZE * 8}
+
+
+def run_synthetic(args, max_samples_values):
+    rng = np.random.default_rng(args.seed)
+    database, probes, expected = synthetic_dataset(rng, args.people, args.sessions, args.burst,
+                                                   args.probes_per_person)
+    print(f"🧪 {args.people} people x {args.sessions} session(s) x {args.burst} frame(s), "
+          f"{len(probes)} probe(s)")
+
+    baseline = build_recognizer(database, args.tolerance)
+    results = [{'max_samples': None, **gallery_size(baseline), **evaluate(baseline, probes, expected)}]
+
+    for max_samples in max_samples_values:
+        recognizer = build_recognizer(database, args.tolerance)
+        started = time.perf_counter()
+        with _quiet():
+            recognizer.condense(max_samples, args.duplicate_distance)
+        condense_seconds = time.perf_counter() - started
+        results.append({'max_samples': max_samples, **gallery_size(recognizer),
+                        **evaluate(recognizer, probes, expected),
+                        'condense_seconds': round(condense_seconds, 3)})
+    return results
+
+
+def run_dataset(args, max_samples_values):
+    """Leave-one-out over real images: each probe is removed from its person's samples first"""
+    from benchmarks.sweep_accuracy import EncodingCache, list_dataset
+
+    samples = list_dataset(args.dataset)
+    cache = EncodingCache(args.cache_dir, samples)
+    encodings = cache.encodings('hog', 1, 0, 1)
+    by_person = {}
+    for person, image_path in samples:
+        if encodings[image_path]['encoding'] is not None:
+            by_person.setdefault(person, []).append((image_path, encodings[image_path]['encoding']))
+    print(f"📁 {len(samples)} image(s) of {len(by_person)} people")
+
+    results = []
+    for max_samples in [None] + list(max_samples_values):
+        def condensed(items):
+            kept = [encoding for _, encoding in items]
+            if max_samples is not None and kept:
+                kept = condense_encodings(kept, max_samples, args.duplicate_distance)
+            return kept
+
+        full = {person: condensed(items) for person, items in by_person.items()}
+        correct = genuine = accepted = impostor = 0
+        for person, items in by_person.items():
+            for image_path, probe in items:
+                others = [item for item in items if item[0] != image_path]
+                # Genuine trial: the person's other images are enrolled
+                gallery = dict(full)
+                if others:
+                    gallery[person] = condensed(others)
+                    match = build_recognizer(gallery, args.tolerance).match_faces([probe], [(0, 1, 1, 0)])[0]
+                    genuine += 1
+                    correct += match.recognized and match.name == person
+                # Impostor trial: the person isn't enrolled at all
+                del gallery[person]
+                if gallery:
+                    match = build_recognizer(gallery, args.tolerance).match_faces([probe], [(0, 1, 1, 0)])[0]
+                    impostor += 1
+                    accepted += match.recognized
+
+        kept = sum(len(encodings) for encodings in full.values())
+        results.append({'max_samples': max_samples, 'samples': kept, 'bytes': kept * ENCODING_SIZE * 8,
+                        'accuracy': round(correct / genuine, 4) if genuine else None,
+                        'false_accept_rate': round(accepted / impostor, 4) if impostor else None})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gallery condensation shrinkage / accuracy benchmark')
+    parser.add_argument('--dataset', default=None, help='score real images (person subdirectories) instead')
+    parser.add_argument('--cache-dir', default=os.path.join(REPO_DIR, 'benchmarks', '.sweep_cache'))
+    parser.add_argument('--people', type=int, default=500)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--probes-per-person', type=int, default=2)
+    parser.add_argument('--max-samples', default='1,3,5', help='comma separated K values')
+    parser.add_argument('--duplicate-distance', type=float, default=0.12)
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', default=None)
+    args = parser.parse_args()
+
+    max_samples_values = [int(part) for part in args.max_samples.split(',') if part]
+
+    print("🗜️  GALLERY CONDENSATION BENCHMARK")
+    print("=" * 40)
+    results = run_dataset(args, max_samples_values) if args.dataset else run_synthetic(args, max_samples_values)
+
+    baseline = results[0]
+    for result in results:
+        label = 'all samples' if result['max_samples'] is None else f"K={result['max_samples']}"
+        shrinkage = 1.0 - result['samples'] / baseline['samples'] if baseline['samples'] else 0.0
+        accuracy_change = (result['accuracy'] - baseline['accuracy']
+                           if result['accuracy'] is not None and baseline['accuracy'] is not None else None)
+        result['shrinkage'] = round(shrinkage, 4)
+        result['accuracy_change'] = round(accuracy_change, 4) if accuracy_change is not None else None
+        change = f" ({accuracy_change:+.4f})" if accuracy_change is not None else ''
+        print(f"   {label:>12}: {result['samples']} sample(s) ({result['bytes'] / 1e6:.1f} MB, "
+              f"-{100 * shrinkage:.0f}%), accuracy {result['accuracy']}{change}, "
+              f"FAR {result['false_accept_rate']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'commit': _commit(), 'args': vars(args), 'results': results}, f, indent=2)
+        print(f"💾 Results saved to: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# benchmarks/bench_matching.py
+"""
+Matching and storage benchmark on synthetic galleries
+
+Generates random 128-d galleries that look like dlib encodings to the
+matcher (same-person distances around 0.4, different people around 1.0)
+and probe sets with both enrolled and never-seen faces, then measures:
+
+- FaceRecognizer.match_faces latency percentiles (one face per call) and
+  throughput (a batch of faces per call, like a group photo)
+- save_database / load_database time, file size and peak Python memory
+- enrollment overhead of adding people to an existing gallery
+
+No images, dlib or GPU are needed. Results are written as JSON together
+with the commit they were measured on, so runs can be compared between
+commits. Galleries of 1M people need several GB of RAM.
+
+Usage:
+    python benchmarks/bench_matching.py
+    python benchmarks/bench_matching.py --sizes 1000,10000,100000,1000000 --samples 3 --json matching.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from face_recognition.face_recognizer import FaceRecognizer  # noqa: E402
+from face_recognition.gallery_snapshot import GallerySnapshot  # noqa: E402
+from face_recognition.sharded_recognizer import ShardedFaceRecognizer  # noqa: E402
+
+ENCODING_SIZE = 128
+# Per-dimension spread of identities and of samples around their identity
+IDENTITY_SPREAD = 0.06
+SAMPLE_SPREAD = 0.025
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the recognizer's console output while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'max_ms': round(float(samples.max()), 4)
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_identities(rng, count):
+    return rng.normal(0.0, IDENTITY_SPREAD, size=(count, ENCODING_SIZE))
+
+
+def make_samples(rng, identities):
+    return identities + rng.normal(0.0, SAMPLE_SPREAD, size=identities.shape)
+
+
+def build_recognizer(rng, people, samples_per_person, shards=0):
+    """
+    FaceRecognizer (ShardedFaceRecognizer when shards is set) holding a synthetic gallery
+
+    Returns:
+        tuple: (recognizer, identities array)
+    """
+    identities = make_identities(rng, people)
+    samples = [make_samples(rng, identities) for _ in range(samples_per_person)]
+
+    with _quiet():
+        recognizer = ShardedFaceRecognizer(workers=shards) if shards else FaceRecognizer()
+
+    names = [f"person_{i:07d}" for i in range(people)]
+    recognizer.gallery = GallerySnapshot(names, samples[0], [[sample[i] for sample in samples]
+                                                              for i in range(people)])
+    return recognizer, identities
+
+
+def make_probes(rng, identities, count, known_fraction=0.5):
+    """Probe encodings and the index of the enrolled person each one shows (-1: nobody)"""
+    known = int(count * known_fraction)
+    people = rng.integers(0, len(identities), size=known)
+    probes = np.concatenate([make_samples(rng, identities[people]),
+                             make_samples(rng, make_identities(rng, count - known))])
+    expected = np.concatenate([people, np.full(count - known, -1)])
+    # Interleave known and unknown so a cut-short run still sees both
+    order = rng.permutation(count)
+    return probes[order], expected[order]
+
+
+def measure_matching(recognizer, probes, expected, batch_size, time_budget):
+    """Per-face latency, batched throughput and match quality"""
+    location = (0, 100, 100, 0)
+    latencies = []
+    correct = false_accepts = known = unknown = 0
+
+    deadline = time.perf_counter() + time_budget
+    with _quiet():
+        for probe, person in zip(probes, expected):
+            started = time.perf_counter()
+            face_info = recognizer.match_faces([probe], [location])[0]
+            latencies.append(time.perf_counter() - started)
+
+            if person >= 0:
+                known += 1
+                correct += face_info.recognized and face_info.best_match_index == person
+            else:
+                unknown += 1
+                false_accepts += face_info.recognized
+
+            if time.perf_counter() > deadline:
+                break
+
+        batches = 0
+        faces = 0
+        started = time.perf_counter()
+        deadline = started + time_budget
+        while time.perf_counter() < deadline or batches == 0:
+            offset = (batches * batch_size) % max(1, len(probes) - batch_size)
+            batch = probes[offset:offset + batch_size]
+            recognizer.match_faces(batch, [location] * len(batch))
+            batches += 1
+            faces += len(batch)
+        batch_elapsed = time.perf_counter() - started
+
+    result = {
+        'probes': len(latencies),
+        'latency': _percentiles(latencies),
+        'batch_size': batch_size,
+        'faces_per_second': round(faces / batch_elapsed, 1),
+        'accuracy': round(correct / known, 4) if known else None,
+        'false_accept_rate': round(false_accepts / unknown, 4) if unknown else None
+    }
+    return result
+
+
+def measure_storage(recognizer, scratch_dir):
+    """save_database / load_database time, file size and peak memory"""
+    path = os.path.join(scratch_dir, 'face_database.pkl')
+
+    with _quiet():
+        started = time.perf_counter()
+        recognizer.save_database(path)
+        save_seconds = time.perf_counter() - started
+
+        loaded = FaceRecognizer()
+        started = time.perf_counter()
+        loaded.load_database(path)
+        load_seconds = time.perf_counter() - started
+        del loaded
+
+        # Separate pass, tracemalloc slows allocation down
+        tracemalloc.start()
+        loaded = FaceRecognizer()
+        loaded.load_database(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del loaded
+
+    size = os.path.getsize(path)
+    os.remove(path)
+    return {
+        'save_ms': round(save_seconds * 1000, 2),
+        'load_ms': round(load_seconds * 1000, 2),
+        'file_mb': round(size / 1e6, 2),
+        'load_peak_mb': round(peak / 1e6, 2)
+    }
+
+
+def measure_enrollment(recognizer, rng, people, samples_per_person):
+    """Latency of adding new people to an existing gallery"""
+    identities = make_identities(rng, people)
+    latencies = []
+    with _quiet():
+        for i, identity in enumerate(identities):
+            encodings = list(make_samples(rng, np.tile(identity, (samples_per_person, 1))))
+            started = time.perf_counter()
+            recognizer.add_person_encodings(f"enrolled_{i:07d}", encodings)
+            latencies.append(time.perf_counter() - started)
+
+    result = {'people': people}
+    result.update(_percentiles(latencies))
+    return result
+
+
+def run(size, args, scratch_dir):
+    rng = np.random.default_rng(args.seed)
+
+    started = time.perf_counter()
+    recognizer, identities = build_recognizer(rng, size, args.samples, args.shards)
+    build_seconds = time.perf_counter() - started
+
+    probes, expected = make_probes(rng, identities, args.probes)
+    try:
+        return {
+            'people': size,
+            'samples_per_person': args.samples,
+            'shards': args.shards,
+            'build_s': round(build_seconds, 3),
+            'matching': measure_matching(recognizer, probes, expected, args.batch_size, args.time_budget),
+            'storage': measure_storage(recognizer, scratch_dir),
+            'enrollment': measure_enrollment(recognizer, rng, args.enroll, args.samples)
+        }
+    finally:
+        if args.shards:
+            recognizer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching and storage benchmark on synthetic galleries')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated gallery sizes (people)')
+    parser.add_argument('--samples', type=int, default=3, help='encodings per person')
+    parser.add_argument('--probes', type=int, default=1000, help='probe faces per gallery')
+    parser.add_argument('--batch-size', type=int, default=8, help='faces per match_faces call for throughput')
+    parser.add_argument('--enroll', type=int, default=200, help='people added for the enrollment timing')
+    parser.add_argument('--time-budget', type=float, default=5.0,
+                        help='max seconds per matching measurement')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='match with ShardedFaceRecognizer over this many worker processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    print("⏱️  MATCHING & STORAGE BENCHMARK")
+    print("=" * 40)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench-matching-') as scratch_dir:
+        for size in sizes:
+            print(f"📊 Gallery: {size} people x {args.samples} samples")
+            result = run(size, args, scratch_dir)
+            results.append(result)
+
+            matching = result['matching']
+            storage = result['storage']
+            enrollment = result['enrollment']
+            print(f"   🔍 match: p50 {matching['latency']['p50_ms']:.3f} ms, "
+                  f"p99 {matching['latency']['p99_ms']:.3f} ms, "
+                  f"{matching['faces_per_second']:.0f} faces/s "
+                  f"(accuracy {matching['accuracy']}, FAR {matching['false_accept_rate']})")
+            print(f"   💾 save {storage['save_ms']:.0f} ms, load {storage['load_ms']:.0f} ms, "
+                  f"{storage['file_mb']:.1f} MB on disk, {storage['load_peak_mb']:.1f} MB peak on load")
+            print(f"   👤 enroll: p50 {enrollment['p50_ms']:.3f} ms, p99 {enrollment['p99_ms']:.3f} ms")
+
+    report = {
+        'commit': _commit(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'seed': args.seed,
+        'results': results
+    }
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
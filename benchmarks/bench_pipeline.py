@@ -0,0 +1,339 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end pipeline benchmark on a synthetic image corpus
+
+Builds a local corpus by pasting face photos (from datasets/known_faces, or
+--faces-dir) at random sizes and positions onto generated backgrounds of
+several resolutions, plus images without any face. The corpus and a
+manifest with the expected face count per image are cached on disk, so
+repeated runs (and runs on different commits) see the same images.
+
+Library mode runs the corpus through FaceDetector.detect_faces and
+FaceRecognizer.recognize_faces, then once more stage by stage (decode,
+detect, encode, match) for a time breakdown, and reports images/s,
+faces/s and peak RSS. HTTP mode posts the same corpus to a running app
+from a pool of client threads and reports throughput, latency
+percentiles and status codes (503s from admission control included).
+
+Usage:
+    python benchmarks/bench_pipeline.py --images 60 --json pipeline.json
+    python benchmarks/bench_pipeline.py --database models/face_database.pkl
+    python app.py &  python benchmarks/bench_pipeline.py --url http://127.0.0.1:5000 --concurrency 8
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+DEFAULT_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (4000, 3000)]
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the library's console output while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    samples = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples, 99)), 2),
+        'max_ms': round(float(samples.max()), 2)
+    }
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1e6 if sys.platform == 'darwin' else 1e3), 1)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _face_sources(faces_dir):
+    sources = []
+    for root, _, files in os.walk(faces_dir):
+        for name in sorted(files):
+            if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                sources.append(os.path.join(root, name))
+    return sorted(sources)
+
+
+def _background(rng, width, height):
+    """Smooth random gradient with some blurred clutter, never a face"""
+    colors = rng.integers(0, 256, size=(2, 3))
+    ramp = np.linspace(0.0, 1.0, width)[None, :, None]
+    pixels = (colors[0] * (1 - ramp) + colors[1] * ramp).repeat(height, axis=0)
+    image = Image.fromarray(pixels.astype(np.uint8))
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(int(rng.integers(3, 12))):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(20, max(21, min(width, height) // 3)))
+        draw.rectangle([x, y, x + size, y + size], fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    return image.filter(ImageFilter.GaussianBlur(3))
+
+
+def build_corpus(corpus_dir, faces_dir, count, resolutions, max_faces, no_face_fraction, seed):
+    """
+    Generate the benchmark corpus (or reuse a matching one)
+
+    Returns:
+        list: Manifest entries {file, width, height, faces}
+    """
+    settings = {'faces_dir': os.path.abspath(faces_dir), 'count': count, 'resolutions': resolutions,
+                'max_faces': max_faces, 'no_face_fraction': no_face_fraction, 'seed': seed}
+    manifest_path = os.path.join(corpus_dir, 'manifest.json')
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest['settings'] == settings:
+            return manifest['images']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sources = _face_sources(faces_dir)
+    if not sources:
+        print(f"⚠️  No face images in {faces_dir}: the corpus will only contain no-face images")
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    images = []
+
+    for i in range(count):
+        width, height = resolutions[i % len(resolutions)]
+        canvas = _background(rng, width, height)
+
+        faces = 0
+        if sources and rng.random() >= no_face_fraction:
+            faces = int(rng.integers(1, max_faces + 1))
+            for _ in range(faces):
+                with Image.open(picker.choice(sources)) as face:
+                    face = face.convert('RGB')
+                    # Face photo between 1/8 and 1/3 of the shorter side
+                    side = int(min(width, height) * rng.uniform(0.125, 0.33))
+                    face.thumbnail((side, side))
+                    x = int(rng.integers(0, max(1, width - face.width)))
+                    y = int(rng.integers(0, max(1, height - face.height)))
+                    canvas.paste(face, (x, y))
+
+        name = f"img_{i:05d}_{width}x{height}_{faces}f.jpg"
+        canvas.save(os.path.join(corpus_dir, name), quality=90)
+        images.append({'file': name, 'width': width, 'height': height, 'faces': faces})
+
+    with open(manifest_path, 'w') as f:
+        json.dump({'settings': settings, 'images': images}, f, indent=2)
+    print(f"🖼️  Generated {count} image(s) in {corpus_dir}")
+    return images
+
+
+def _load_recognizer(database_path):
+    from face_recognition.face_recognizer import FaceRecognizer
+
+    recognizer = FaceRecognizer()
+    if database_path:
+        recognizer.load_database(database_path)
+    return recognizer
+
+
+def run_library(corpus_dir, images, model, database_path):
+    """Entry point throughput plus a per-stage time breakdown"""
+    from face_detection.face_detector import FaceDetector
+    from face_recognition.face_recognizer import _face_recognition
+
+    with _quiet():
+        detector = FaceDetector(model=model)
+        recognizer = _load_recognizer(database_path)
+        detector.warm_up()
+    face_recognition = _face_recognition()
+    paths = [os.path.join(corpus_dir, image['file']) for image in images]
+
+    report = {}
+    with _quiet():
+        # FaceDetector.detect_faces
+        latencies, faces = [], 0
+        started = time.perf_counter()
+        for path in paths:
+            before = time.perf_counter()
+            face_locations, _ = detector.detect_faces(path)
+            latencies.append(time.perf_counter() - before)
+            faces += len(face_locations)
+        elapsed = time.perf_counter() - started
+        report['detect_faces'] = {'images_per_second': round(len(paths) / elapsed, 2),
+                                  'faces_per_second': round(faces / elapsed, 2),
+                                  'faces': faces, 'latency': _percentiles(latencies)}
+
+        # FaceRecognizer.recognize_faces
+        latencies, faces = [], 0
+        started = time.perf_counter()
+        for path in paths:
+            before = time.perf_counter()
+            recognized_faces, _ = recognizer.recognize_faces(path, draw_results=False)
+            latencies.append(time.perf_counter() - before)
+            faces += len(recognized_faces)
+        elapsed = time.perf_counter() - started
+        report['recognize_faces'] = {'images_per_second': round(len(paths) / elapsed, 2),
+                                     'faces_per_second': round(faces / elapsed, 2),
+                                     'faces': faces, 'latency': _percentiles(latencies)}
+
+        # Same work split into stages
+        stages = {'decode': 0.0, 'detect': 0.0, 'encode': 0.0, 'match': 0.0}
+        for path in paths:
+            before = time.perf_counter()
+            image = face_recognition.load_image_file(path)
+            decoded = time.perf_counter()
+            face_locations = face_recognition.face_locations(image, model=model)
+            detected = time.perf_counter()
+            face_encodings = face_recognition.face_encodings(image, face_locations)
+            encoded = time.perf_counter()
+            recognizer.match_faces(face_encodings, face_locations)
+            matched = time.perf_counter()
+
+            stages['decode'] += decoded - before
+            stages['detect'] += detected - decoded
+            stages['encode'] += encoded - detected
+            stages['match'] += matched - encoded
+
+    total = sum(stages.values()) or 1.0
+    report['stages'] = {stage: {'total_s': round(seconds, 3), 'share': round(seconds / total, 3)}
+                        for stage, seconds in stages.items()}
+
+    expected = sum(image['faces'] for image in images)
+    report['expected_faces'] = expected
+    report['peak_rss_mb'] = _peak_rss_mb()
+    return report
+
+
+def run_http(corpus_dir, images, url, endpoint, concurrency, timeout):
+    """Post the corpus to a running app from concurrent clients"""
+    import requests
+
+    paths = [os.path.join(corpus_dir, image['file']) for image in images]
+    # requests.Session isn't thread-safe: one per load thread (each keeps its own connection)
+    local = threading.local()
+    target = url.rstrip('/') + endpoint
+
+    def post(path):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        with open(path, 'rb') as f:
+            before = time.perf_counter()
+            try:
+                response = session.post(target, files={'file': (os.path.basename(path), f, 'image/jpeg')},
+                                        timeout=timeout)
+            except requests.RequestException as e:
+                return type(e).__name__, time.perf_counter() - before, 0
+        faces = 0
+        if response.status_code == 200:
+            faces = response.json().get('faces_detected', 0)
+        return response.status_code, time.perf_counter() - before, faces
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(post, paths))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [latency for status, latency, _ in outcomes if status == 200]
+
+    return {
+        'url': target,
+        'concurrency': concurrency,
+        'requests': len(outcomes),
+        'statuses': statuses,
+        'images_per_second': round(len(ok) / elapsed, 2),
+        'faces_per_second': round(sum(faces for _, _, faces in outcomes) / elapsed, 2),
+        'latency': _percentiles(ok)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end pipeline benchmark')
+    parser.add_argument('--corpus-dir', default=os.path.join(REPO_DIR, 'benchmarks', 'corpus'))
+    parser.add_argument('--faces-dir', default=os.path.join(REPO_DIR, 'datasets', 'known_faces'),
+                        help='face photos pasted into the generated images')
+    parser.add_argument('--images', type=int, default=40, help='images in the corpus')
+    parser.add_argument('--resolutions', default=','.join(f"{w}x{h}" for w, h in DEFAULT_RESOLUTIONS))
+    parser.add_argument('--max-faces', type=int, default=5, help='most faces in one image')
+    parser.add_argument('--no-face-fraction', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', choices=['hog', 'cnn'], default='hog')
+    parser.add_argument('--database', default=None, help='face database used for matching')
+    parser.add_argument('--url', default=None, help='benchmark a running app instead of the library')
+    parser.add_argument('--endpoint', default='/api/recognize-faces',
+                        choices=['/api/recognize-faces', '/api/detect-faces'])
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads in HTTP mode')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in HTTP mode')
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    args = parser.parse_args()
+
+    resolutions = [[int(part) for part in size.split('x')] for size in args.resolutions.split(',') if size]
+
+    print("⏱️  PIPELINE BENCHMARK")
+    print("=" * 40)
+
+    images = build_corpus(args.corpus_dir, args.faces_dir, args.images, resolutions,
+                          args.max_faces, args.no_face_fraction, args.seed)
+    report = {
+        'commit': _commit(),
+        'python': sys.version.split()[0],
+        'corpus': {'images': len(images), 'resolutions': resolutions,
+                   'expected_faces': sum(image['faces'] for image in images)}
+    }
+
+    if args.url:
+        result = run_http(args.corpus_dir, images, args.url, args.endpoint, args.concurrency, args.timeout)
+        report['http'] = result
+        print(f"🌐 {result['url']} x{result['concurrency']}: {result['images_per_second']} images/s, "
+              f"{result['faces_per_second']} faces/s")
+        print(f"   📊 statuses: {result['statuses']}")
+        if result['latency']:
+            print(f"   ⏱️  p50 {result['latency']['p50_ms']} ms, p99 {result['latency']['p99_ms']} ms")
+    else:
+        result = run_library(args.corpus_dir, images, args.model, args.database)
+        report['library'] = result
+        for entry_point in ('detect_faces', 'recognize_faces'):
+            stats = result[entry_point]
+            print(f"🔍 {entry_point}: {stats['images_per_second']} images/s, "
+                  f"{stats['faces_per_second']} faces/s ({stats['faces']}/{result['expected_faces']} faces found)")
+        for stage, stats in result['stages'].items():
+            print(f"   ⏱️  {stage}: {stats['total_s']:.2f} s ({stats['share'] * 100:.0f}%)")
+        print(f"🧠 Peak RSS: {result['peak_rss_mb']} MB")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
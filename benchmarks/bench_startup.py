@@ -0,0 +1,175 @@
+# benchmarks/bench_startup.py
+"""
+Cold start benchmark: import time and first-request latency
+
+Every measurement runs in a fresh interpreter so nothing is already cached
+in sys.modules. The script also checks that heavy libraries (OpenCV,
+matplotlib, dlib, face_recognition) are not imported as a side effect of
+importing our modules, and exits non-zero when a budget is exceeded so it
+can guard against regressions in CI.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --max-import-ms 800 --json startup.json
+    python benchmarks/bench_startup.py --with-detection   # needs dlib installed
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay off the import path of the web/library code
+HEAVY_MODULES = ['cv2', 'matplotlib', 'dlib', 'face_recognition.api']
+
+TARGET_MODULES = [
+    'config',
+    'face_detection.face_detector',
+    'face_recognition.face_recognizer',
+    'app',
+]
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'heavy_loaded': heavy}}))
+"""
+
+_REQUEST_PROBE = """
+import io, json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/api/health')
+health = time.perf_counter()
+result = {{'import_seconds': imported - started, 'health_seconds': health - imported}}
+if {with_detection!r}:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), 'gray').save(buffer, format='JPEG')
+    buffer.seek(0)
+    before = time.perf_counter()
+    client.post('/api/detect-faces', data={{'file': (buffer, 'bench.jpg')}},
+                content_type='multipart/form-data')
+    result['first_detection_seconds'] = time.perf_counter() - before
+print(json.dumps(result))
+"""
+
+
+def _run_probe(code):
+    """Run a probe in a fresh interpreter and parse its last output line"""
+    completed = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else 'probe failed')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(repeat):
+    """Median cold import time per module and heavy modules it pulled in"""
+    results = {}
+    for module in TARGET_MODULES:
+        samples = []
+        heavy_loaded = []
+        try:
+            for _ in range(repeat):
+                probe = _run_probe(_IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES))
+                samples.append(probe['seconds'])
+                heavy_loaded = probe['heavy_loaded']
+        except RuntimeError as e:
+            results[module] = {'error': str(e)}
+            continue
+        results[module] = {
+            'median_ms': round(statistics.median(samples) * 1000, 2),
+            'max_ms': round(max(samples) * 1000, 2),
+            'heavy_loaded': heavy_loaded
+        }
+    return results
+
+
+def measure_first_request(repeat, with_detection):
+    """Median cold import + first health check (and optionally first detection)"""
+    samples = []
+    for _ in range(repeat):
+        try:
+            samples.append(_run_probe(_REQUEST_PROBE.format(with_detection=with_detection)))
+        except RuntimeError as e:
+            return {'error': str(e)}
+
+    return {
+        key.replace('_seconds', '_ms'): round(statistics.median(sample[key] for sample in samples) * 1000, 2)
+        for key in samples[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per measurement')
+    parser.add_argument('--max-import-ms', type=float, default=None,
+                        help='fail if any module import median exceeds this')
+    parser.add_argument('--max-first-request-ms', type=float, default=None,
+                        help='fail if import + first health check exceeds this')
+    parser.add_argument('--with-detection', action='store_true',
+                        help='also time the first detection request (loads dlib)')
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    args = parser.parse_args()
+
+    print("⏱️  COLD START BENCHMARK")
+    print("=" * 40)
+
+    imports = measure_imports(args.repeat)
+    first_request = measure_first_request(args.repeat, args.with_detection)
+
+    failures = []
+    for module, result in imports.items():
+        if 'error' in result:
+            print(f"❌ import {module}: {result['error']}")
+            failures.append(f"{module} failed to import")
+            continue
+        print(f"📦 import {module}: {result['median_ms']:.1f} ms (max {result['max_ms']:.1f} ms)")
+        if result['heavy_loaded']:
+            print(f"   ⚠️  pulled in: {', '.join(result['heavy_loaded'])}")
+            failures.append(f"{module} imports {', '.join(result['heavy_loaded'])}")
+        if args.max_import_ms is not None and result['median_ms'] > args.max_import_ms:
+            failures.append(f"{module} import {result['median_ms']} ms > {args.max_import_ms} ms")
+
+    if 'error' in first_request:
+        print(f"❌ first request: {first_request['error']}")
+        failures.append('first request failed')
+    else:
+        for key, value in first_request.items():
+            print(f"🌐 {key.replace('_ms', '')}: {value:.1f} ms")
+        total = first_request['import_ms'] + first_request['health_ms']
+        if args.max_first_request_ms is not None and total > args.max_first_request_ms:
+            failures.append(f"first request {total} ms > {args.max_first_request_ms} ms")
+
+    report = {
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'imports': imports,
+        'first_request_ms': first_request,
+        'failures': failures
+    }
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to: {args.json_path}")
+
+    if failures:
+        print("❌ Budget exceeded:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+# benchmarks/sweep_accuracy.py
+"""
+Accuracy / latency trade-off sweep over the enrolled dataset
+
+Runs leave-one-out recognition over datasets/known_faces for every
+combination of detection model, upsampling, downscale size, jitters and
+tolerance. Each image yields two trials:
+
+- genuine: the image against a gallery built from everyone's other
+  images; it should be recognized as its own person
+- impostor: the same image with its person left out of the gallery
+  entirely; it should come back as Unknown
+
+Detections are cached per (model, upsample, downscale) and encodings per
+(+ jitters) on disk, so adding a tolerance or a jitter value doesn't
+redo the detection, and re-running the sweep is almost free. Tolerance is
+applied to cached distances and costs nothing.
+
+The report lists accuracy, false-accept rate and per-image latency for
+every configuration, and the Pareto front (no other configuration is at
+least as fast, as accurate and as strict, and better in one of them).
+
+Usage:
+    python benchmarks/sweep_accuracy.py
+    python benchmarks/sweep_accuracy.py --models hog,cnn --upsample 0,1,2 --downscale 0,1024,640 \\
+        --jitters 1,10 --tolerances 0.4,0.5,0.6 --json sweep.json
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from face_recognition.face_recognizer import _face_recognition  # noqa: E402
+
+
+def _csv(value, kind):
+    return [kind(part) for part in value.split(',') if part]
+
+
+def list_dataset(known_faces_dir):
+    """(person, image path) pairs in the same layout load_known_faces reads"""
+    samples = []
+    for person_name in sorted(os.listdir(known_faces_dir)):
+        person_dir = os.path.join(known_faces_dir, person_name)
+        if not os.path.isdir(person_dir):
+            continue
+        for image_file in sorted(os.listdir(person_dir)):
+            if image_file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                samples.append((person_name, os.path.join(person_dir, image_file)))
+    return samples
+
+
+def _load_image(image_path, downscale):
+    """RGB array, longest side reduced to downscale pixels (0 keeps it)"""
+    with Image.open(image_path) as image:
+        if downscale:
+            image.draft('RGB', (downscale, downscale))
+            image.thumbnail((downscale, downscale))
+        return np.asarray(image.convert('RGB'))
+
+
+class EncodingCache:
+    def __init__(self, cache_dir, samples):
+        """
+        On-disk cache of detections and encodings per configuration
+
+        Args:
+            cache_dir (str): Where cache files are kept
+            samples (list): (person, image path) pairs of the dataset
+        """
+        self.cache_dir = cache_dir
+        self.samples = samples
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Cache entries are keyed by path, size and mtime (cheaper than hashing every image),
+        # so edited or replaced images are redone
+        self._keys = {}
+        for _, image_path in samples:
+            stat = os.stat(image_path)
+            self._keys[image_path] = hashlib.sha1(
+                f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime}".encode('utf-8')).hexdigest()
+
+    def _path(self, kind, *options):
+        name = '_'.join(str(option) for option in (kind,) + options)
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+    @staticmethod
+    def _write(path, entries):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def detections(self, model, upsample, downscale):
+        """image path -> {location of the largest face or None, seconds}"""
+        face_recognition = _face_recognition()
+        path = self._path('detect', model, upsample, downscale)
+        entries = self._read(path)
+        changed = False
+
+        for _, image_path in self.samples:
+            key = self._keys[image_path]
+            if key in entries:
+                continue
+
+            started = time.perf_counter()
+            image = _load_image(image_path, downscale)
+            locations = face_recognition.face_locations(image, number_of_times_to_upsample=upsample, model=model)
+            elapsed = time.perf_counter() - started
+
+            # Enrollment photos may show bystanders: keep the largest face
+            location = max(locations, key=lambda b: (b[1] - b[3]) * (b[2] - b[0])) if locations else None
+            entries[key] = {'location': location, 'seconds': elapsed}
+            changed = True
+
+        if changed:
+            self._write(path, entries)
+        return {image_path: entries[self._keys[image_path]] for _, image_path in self.samples}
+
+    def encodings(self, model, upsample, downscale, jitters):
+        """image path -> {encoding or None, seconds (detection + encoding)}"""
+        face_recognition = _face_recognition()
+        detections = self.detections(model, upsample, downscale)
+        path = self._path('encode', model, upsample, downscale, jitters)
+        entries = self._read(path)
+        changed = False
+
+        for _, image_path in self.samples:
+            key = self._keys[image_path]
+            if key in entries:
+                continue
+
+            detection = detections[image_path]
+            encoding = None
+            elapsed = 0.0
+            if detection['location'] is not None:
+                image = _load_image(image_path, downscale)
+                started = time.perf_counter()
+                encoding = face_recognition.face_encodings(image, [detection['location']], num_jitters=jitters)[0]
+                elapsed = time.perf_counter() - started
+
+            entries[key] = {'encoding': encoding, 'seconds': detection['seconds'] + elapsed}
+            changed = True
+
+        if changed:
+            self._write(path, entries)
+        return {image_path: entries[self._keys[image_path]] for _, image_path in self.samples}
+
+
+def leave_one_out(samples, encodings):
+    """
+    Best-match distances for the genuine and impostor trial of every image
+
+    The gallery mirrors FaceRecognizer: one (the first available) encoding
+    per person.
+
+    Returns:
+        dict: genuine (distance, correct) pairs, impostor distances and the
+              number of images without a detected face
+    """
+    people = sorted({person for person, _ in samples})
+    by_person = {person: [path for p, path in samples if p == person and encodings[path]['encoding'] is not None]
+                 for person in people}
+
+    genuine = []
+    impostor = []
+    missed = 0
+
+    for person, image_path in samples:
+        probe = encodings[image_path]['encoding']
+        if probe is None:
+            missed += 1
+            continue
+
+        # Each person's primary encoding, skipping the probe image itself
+        gallery_names = []
+        gallery = []
+        for other in people:
+            candidates = [path for path in by_person[other] if path != image_path]
+            if candidates:
+                gallery_names.append(other)
+                gallery.append(encodings[candidates[0]]['encoding'])
+
+        if not gallery:
+            continue
+        distances = np.linalg.norm(np.asarray(gallery) - probe, axis=1)
+
+        if person in gallery_names:
+            best = int(np.argmin(distances))
+            genuine.append((float(distances[best]), gallery_names[best] == person))
+
+        others = [i for i, name in enumerate(gallery_names) if name != person]
+        if others:
+            impostor.append(float(distances[others].min()))
+
+    return {'genuine': genuine, 'impostor': impostor, 'missed': missed}
+
+
+def score(trials, tolerance, total_images):
+    """Accuracy (missed detections count as errors) and false-accept rate"""
+    correct = sum(1 for distance, right in trials['genuine'] if right and distance <= tolerance)
+    genuine_total = len(trials['genuine']) + trials['missed']
+    false_accepts = sum(1 for distance in trials['impostor'] if distance <= tolerance)
+    return {
+        'accuracy': round(correct / genuine_total, 4) if genuine_total else None,
+        'false_accept_rate': round(false_accepts / len(trials['impostor']), 4) if trials['impostor'] else None,
+        'genuine_trials': len(trials['genuine']),
+        'impostor_trials': len(trials['impostor']),
+        'missed_detections': trials['missed'],
+        'images': total_images
+    }
+
+
+def pareto_front(results):
+    """Configurations not dominated on (latency, accuracy, false-accept rate)"""
+    def dominates(a, b):
+        at_least = (a['latency_ms'] <= b['latency_ms'] and a['accuracy'] >= b['accuracy'] and
+                    a['false_accept_rate'] <= b['false_accept_rate'])
+        better = (a['latency_ms'] < b['latency_ms'] or a['accuracy'] > b['accuracy'] or
+                  a['false_accept_rate'] < b['false_accept_rate'])
+        return at_least and better
+
+    scored = [r for r in results if r['accuracy'] is not None and r['false_accept_rate'] is not None]
+    front = [r for r in scored if not any(dominates(other, r) for other in scored)]
+    return sorted(front, key=lambda r: r['latency_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy / latency sweep over the enrolled dataset')
+    parser.add_argument('--dataset', default=os.path.join(REPO_DIR, 'datasets', 'known_faces'))
+    parser.add_argument('--cache-dir', default=os.path.join(REPO_DIR, 'benchmarks', '.sweep_cache'))
+    parser.add_argument('--models', default='hog', help='comma separated: hog,cnn')
+    parser.add_argument('--upsample', default='0,1', help='comma separated upsample counts')
+    parser.add_argument('--downscale', default='0,1024,640',
+                        help='comma separated longest side in pixels (0 keeps full size)')
+    parser.add_argument('--jitters', default='1', help='comma separated num_jitters values')
+    parser.add_argument('--tolerances', default='0.4,0.45,0.5,0.55,0.6')
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    args = parser.parse_args()
+
+    samples = list_dataset(args.dataset) if os.path.isdir(args.dataset) else []
+    people = {person for person, _ in samples}
+    if len(people) < 2:
+        print(f"❌ Need at least two people with images in {args.dataset}")
+        sys.exit(1)
+
+    print("🎯 ACCURACY / LATENCY SWEEP")
+    print("=" * 40)
+    print(f"📁 {len(samples)} image(s) of {len(people)} people")
+
+    cache = EncodingCache(args.cache_dir, samples)
+    tolerances = _csv(args.tolerances, float)
+    results = []
+
+    grid = itertools.product(_csv(args.models, str), _csv(args.upsample, int),
+                             _csv(args.downscale, int), _csv(args.jitters, int))
+    for model, upsample, downscale, jitters in grid:
+        started = time.perf_counter()
+        encodings = cache.encodings(model, upsample, downscale, jitters)
+        computed = time.perf_counter() - started
+
+        trials = leave_one_out(samples, encodings)
+        latency_ms = 1000 * sum(entry['seconds'] for entry in encodings.values()) / len(samples)
+        print(f"⚙️  {model} upsample={upsample} downscale={downscale or 'full'} jitters={jitters}: "
+              f"{latency_ms:.0f} ms/image ({computed:.1f} s this run)")
+
+        for tolerance in tolerances:
+            result = {'model': model, 'upsample': upsample, 'downscale': downscale,
+                      'jitters': jitters, 'tolerance': tolerance, 'latency_ms': round(latency_ms, 2)}
+            result.update(score(trials, tolerance, len(samples)))
+            results.append(result)
+            print(f"   🎯 tolerance {tolerance}: accuracy {result['accuracy']}, "
+                  f"FAR {result['false_accept_rate']}")
+
+    front = pareto_front(results)
+    print("🏆 Pareto front (fastest first):")
+    for r in front:
+        print(f"   {r['model']} upsample={r['upsample']} downscale={r['downscale'] or 'full'} "
+              f"jitters={r['jitters']} tolerance={r['tolerance']}: {r['latency_ms']:.0f} ms, "
+              f"accuracy {r['accuracy']}, FAR {r['false_accept_rate']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'dataset': os.path.abspath(args.dataset), 'images': len(samples),
+                       'people': len(people), 'results': results, 'pareto_front': front}, f, indent=2)
+        print(f"💾 Results saved to: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_DIR = os.path.join(BASE_DIR, 'datasets')
 KNOWN_FACES_DIR = os.path.join(DATASET_DIR, 'known_faces')
 UNKNOWN_FACES_DIR = os.path.join(DATASET_DIR, 'unknown_faces')
+UPLOADS_DIR = os.path.join(UNKNOWN_FACES_DIR, 'uploads')  # managed, files get evicted
 TRAINING_DIR = os.path.join(DATASET_DIR, 'training')
 
 # Model paths
@@ -17,13 +18,78 @@ FACE_ENCODINGS_PATH = os.path.join(MODELS_DIR, 'face_encodings.pkl')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 
+# Result previews (rendered lazily on first request)
+RESULTS_DIR = os.path.join(BASE_DIR, 'static', 'results')
+RESULT_PREVIEW_MAX_SIZE = 1024  # longest side in pixels
+RESULT_JPEG_QUALITY = 80
+
+# Storage quotas for uploads and result previews (enforced by a background sweeper)
+UPLOADS_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2GB
+UPLOADS_MAX_AGE = 7 * 24 * 3600  # seconds
+RESULTS_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+RESULTS_MAX_AGE = 24 * 3600  # seconds
+STORAGE_SWEEP_INTERVAL = 300  # seconds
+
+# Admission control (backpressure for detection / recognition requests)
+MAX_CONCURRENT_REQUESTS = 2
+MAX_QUEUED_REQUESTS = 4
+QUEUE_TIMEOUT = 10.0  # seconds a request may wait for a slot
+MAX_IMAGE_PIXELS = 12 * 1000 * 1000  # per-request pixel budget
+DOWNSCALE_OVERSIZED_IMAGES = True  # JPEGs only (decoded at reduced size); False, or other formats, get a 413
+
 # Face recognition settings
 FACE_DETECTION_MODEL = 'hog'  # 'hog' or 'cnn'
 NUMBER_OF_TIMES_TO_UPSAMPLE = 1
 FACE_DETECTION_CONFIDENCE = 0.6
 
-# Create directories if they don't exist
-for directory in [KNOWN_FACES_DIR, UNKNOWN_FACES_DIR, TRAINING_DIR, MODELS_DIR]:
-    os.makedirs(directory, exist_ok=True)
+# Live video streaming (MJPEG); device index, file path or stream URL
+VIDEO_SOURCE = os.environ.get('VIDEO_SOURCE')  # e.g. '0' or 'rtsp://camera/stream'
+VIDEO_EVERY_N_FRAMES = 5
+VIDEO_SCALE = 0.25
+VIDEO_JPEG_QUALITY = 75
+VIDEO_IDLE_TIMEOUT = 30.0  # seconds without viewers before capture stops
+
+# Unrecognized faces are kept for clustering (python -m face_recognition.face_clustering)
+UNKNOWN_ENCODINGS_DIR = os.path.join(MODELS_DIR, 'unknown_faces')
+STORE_UNKNOWN_FACES = os.environ.get('STORE_UNKNOWN_FACES', '1') == '1'
+UNKNOWN_FACES_MAX = 200000  # the oldest half is dropped when full (~100 MB of encodings)
+
+# Near-duplicate images reuse earlier face results (perceptual hash lookup). Off by default:
+# a near-match can be a different upload, whose faces (and names) would be reported instead
+DEDUP_IMAGES = os.environ.get('DEDUP_IMAGES', '0') == '1'
+DUPLICATE_CACHE_PATH = os.path.join(MODELS_DIR, 'duplicate_cache.jsonl')
+DUPLICATE_MAX_DISTANCE = 3  # differing bits out of 64
+DUPLICATE_CACHE_MAX_ENTRIES = 10000  # the oldest half is dropped when exceeded
+
+# Live gallery shared by all worker processes (versioned snapshot files)
+GALLERY_DIR = os.path.join(MODELS_DIR, 'gallery')
+GALLERY_POLL_INTERVAL = 2.0  # seconds before a worker sees another worker's enrollment
+LEGACY_DATABASE_PATH = os.path.join(MODELS_DIR, 'face_database.pkl')  # imported once if the gallery is empty
+
+# Background enrollment (/train, /api/train): detection and encoding run in worker processes
+ENROLLMENT_WORKERS = int(os.environ.get('ENROLLMENT_WORKERS', '2'))
+ENROLLMENT_MAX_PENDING_IMAGES = 200  # images in flight before new jobs get a 503
+ENROLLMENT_MIN_FACE_SIZE = 60  # pixels, smaller faces are rejected
+ENROLLMENT_MIN_SHARPNESS = 30.0  # Laplacian variance of the face crop, blurrier faces are rejected
+ENROLLMENT_JOBS_DIR = os.path.join(MODELS_DIR, 'enrollment_jobs')
+ENROLLMENT_COMMIT_EVERY = 10  # accepted encodings per gallery commit (each commit rewrites the gallery)
+ENROLLMENT_COMMIT_INTERVAL = 5.0  # seconds an accepted encoding waits at most for its commit
+
+# Logging (per-face / per-file detail is DEBUG and capped per batch)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' or 'json'
+
+# Opt-in per-request profiling (X-Profile: 1 header or ?profile=1, or sampling)
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_MAX_ENTRIES = 50  # ring buffer size, oldest profiles are deleted
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS') == '1'  # honour the request flag
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # fraction profiled anyway
+
+# Load dlib models at startup instead of on the first request
+PREWARM_MODELS = os.environ.get('PREWARM_MODELS') == '1'
+
 
-print("✅ Configuration loaded successfully!")
\ No newline at end of file
+def ensure_directories():
+    """Create the data directories if they don't exist (call at startup, not import)"""
+    for directory in [KNOWN_FACES_DIR, UNKNOWN_FACES_DIR, UPLOADS_DIR, TRAINING_DIR, MODELS_DIR, RESULTS_DIR]:
+        os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,117 @@
+# face_detection/box_utils.py
+"""
+Helpers for face boxes in face_recognition's (top, right, bottom, left) order
+"""
+
+
+def box_iou(box_a, box_b):
+    """
+    Intersection over union of two (top, right, bottom, left) boxes
+
+    Returns:
+        float: IoU in [0, 1]
+    """
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def box_overlap(box_a, box_b):
+    """
+    Intersection over the area of the smaller box
+
+    Unlike IoU this is close to 1 when a partial box (e.g. a face cut by a
+    tile edge) lies inside a complete one.
+    """
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(min(area_a, area_b))
+
+
+def pad_box(box, padding, min_size, image_height, image_width):
+    """
+    Grow a box by a fraction of its size (and to a minimum size), clamped to the image
+
+    Args:
+        box: (top, right, bottom, left)
+        padding (float): Fraction of the box size added on every side
+        min_size (int): Minimum width and height of the result
+        image_height (int): Image height used for clamping
+        image_width (int): Image width used for clamping
+
+    Returns:
+        tuple: Padded (top, right, bottom, left)
+    """
+    top, right, bottom, left = box
+    pad_y = max(int((bottom - top) * padding), (min_size - (bottom - top)) // 2, 0)
+    pad_x = max(int((right - left) * padding), (min_size - (right - left)) // 2, 0)
+    return (max(0, top - pad_y), min(image_width, right + pad_x),
+            min(image_height, bottom + pad_y), max(0, left - pad_x))
+
+
+def merge_overlapping(boxes):
+    """
+    Merge boxes that overlap or touch into their bounding boxes
+
+    Returns:
+        list: Disjoint (top, right, bottom, left) boxes
+    """
+    merged = [tuple(box) for box in boxes]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for box in merged:
+            for i, other in enumerate(result):
+                if (box[3] <= other[1] and other[3] <= box[1] and
+                        box[0] <= other[2] and other[0] <= box[2]):
+                    result[i] = (min(box[0], other[0]), max(box[1], other[1]),
+                                 max(box[2], other[2]), min(box[3], other[3]))
+                    changed = True
+                    break
+            else:
+                result.append(box)
+        merged = result
+    return merged
+
+
+def suppress_duplicates(boxes, threshold=0.5, scores=None, metric=box_iou):
+    """
+    Non-maximum suppression: drop boxes that overlap a better box
+
+    Args:
+        boxes: List of (top, right, bottom, left) boxes
+        threshold (float): Boxes overlapping more than this are duplicates
+        scores: Optional score per box, higher is better (defaults to box area)
+        metric: Overlap function, box_iou or box_overlap
+
+    Returns:
+        list: Kept boxes, in their original order
+    """
+    if scores is None:
+        scores = [(box[1] - box[3]) * (box[2] - box[0]) for box in boxes]
+
+    order = sorted(range(len(boxes)), key=lambda i: scores[i], reverse=True)
+    kept = []
+    for i in order:
+        if all(metric(boxes[i], boxes[j]) <= threshold for j in kept):
+            kept.append(i)
+    return [tuple(boxes[i]) for i in sorted(kept)]
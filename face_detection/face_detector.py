@@ -3,12 +3,27 @@
 Face Detection Module using OpenCV and face_recognition
 """
 
-import cv2
-import face_recognition
+import logging
 import numpy as np
 from PIL import Image, ImageDraw
 import os
-import matplotlib.pyplot as plt
+
+from logging_setup import ItemLog, configure_logging
+from profiling import annotate, stage
+
+logger = logging.getLogger(__name__)
+
+
+def _face_recognition():
+    """
+    Import the face_recognition library on first use
+
+    Importing it loads dlib and the model weights, which dominates cold start,
+    so callers that never detect anything (or only plot) never pay for it.
+    """
+    import face_recognition
+    return face_recognition
+
 
 class FaceDetector:
     def __init__(self, model='hog'):
@@ -19,7 +34,19 @@ class FaceDetector:
             model (str): 'hog' for CPU, 'cnn' for GPU (more accurate but slower)
         """
         self.model = model
-        print(f"✅ Face Detector initialized with {model.upper()} model")
+        logger.debug("✅ Face Detector initialized with %s model", model.upper())
+
+    def warm_up(self):
+        """
+        Load the detection and encoding models ahead of the first request
+
+        Runs detection on a tiny blank image so lazily initialized model
+        state is created now instead of on the first real image.
+        """
+        face_recognition = _face_recognition()
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        face_recognition.face_locations(blank, number_of_times_to_upsample=0, model=self.model)
+        logger.info("🔥 Face Detector warmed up (%s model)", self.model.upper())
     
     def detect_faces(self, image_path):
         """
@@ -31,24 +58,44 @@ class FaceDetector:
         Returns:
             list: List of face locations [(top, right, bottom, left)]
         """
+        face_recognition = _face_recognition()
+
         try:
             # Load image
-            image = face_recognition.load_image_file(image_path)
+            with stage('decode'):
+                image = face_recognition.load_image_file(image_path)
             
             # Detect faces
-            face_locations = face_recognition.face_locations(
-                image, 
-                number_of_times_to_upsample=1, 
-                model=self.model
-            )
+            with stage('detect'):
+                face_locations = self.locate_faces(image)
+            annotate(image_size=list(image.shape[:2]), faces=len(face_locations))
             
-            print(f"✅ Detected {len(face_locations)} face(s) in {os.path.basename(image_path)}")
+            logger.info("✅ Detected %d face(s) in %s", len(face_locations), os.path.basename(image_path),
+                        extra={'faces': len(face_locations)})
             return face_locations, image
             
         except Exception as e:
-            print(f"❌ Error detecting faces: {e}")
+            logger.error("❌ Error detecting faces in %s: %s", os.path.basename(image_path), e)
             return [], None
     
+    def locate_faces(self, image, number_of_times_to_upsample=1):
+        """
+        Detect faces in an already decoded image
+        
+        Args:
+            image: numpy array image (RGB)
+            number_of_times_to_upsample (int): Upsampling passes, finds smaller faces
+            
+        Returns:
+            list: List of face locations [(top, right, bottom, left)]
+        """
+        face_recognition = _face_recognition()
+        return face_recognition.face_locations(
+            image,
+            number_of_times_to_upsample=number_of_times_to_upsample,
+            model=self.model
+        )
+    
     def draw_face_boxes(self, image, face_locations, output_path=None):
         """
         Draw bounding boxes around detected faces
@@ -65,18 +112,20 @@ class FaceDetector:
         pil_image = Image.fromarray(image)
         draw = ImageDraw.Draw(pil_image)
         
-        for i, (top, right, bottom, left) in enumerate(face_locations):
-            # Draw rectangle around face
-            draw.rectangle([left, top, right, bottom], outline="red", width=3)
-            
-            # Add face number
-            draw.text((left, top - 20), f"Face {i+1}", fill="red")
-            
-            print(f"   👤 Face {i+1}: Position (Top:{top}, Right:{right}, Bottom:{bottom}, Left:{left})")
+        with ItemLog(logger) as item_log:
+            for i, (top, right, bottom, left) in enumerate(face_locations):
+                # Draw rectangle around face
+                draw.rectangle([left, top, right, bottom], outline="red", width=3)
+
+                # Add face number
+                draw.text((left, top - 20), f"Face {i+1}", fill="red")
+
+                item_log("   👤 Face %d: Position (Top:%d, Right:%d, Bottom:%d, Left:%d)",
+                         i + 1, top, right, bottom, left)
         
         if output_path:
             pil_image.save(output_path)
-            print(f"💾 Output saved to: {output_path}")
+            logger.info("💾 Output saved to: %s", output_path)
         
         return pil_image
     
@@ -91,18 +140,22 @@ class FaceDetector:
         Returns:
             list: Face encodings for each detected face
         """
+        face_recognition = _face_recognition()
+
         try:
             face_encodings = face_recognition.face_encodings(image, face_locations)
-            print(f"✅ Extracted {len(face_encodings)} face encoding(s)")
+            logger.debug("✅ Extracted %d face encoding(s)", len(face_encodings))
             return face_encodings
         except Exception as e:
-            print(f"❌ Error extracting face encodings: {e}")
+            logger.error("❌ Error extracting face encodings: %s", e)
             return []
     
     def display_results(self, original_image, detected_image, face_locations):
         """
         Display original and detected images side by side
         """
+        import matplotlib.pyplot as plt
+
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
         
         # Original image
@@ -120,6 +173,7 @@ class FaceDetector:
 
 def test_face_detection():
     """Test the face detection functionality"""
+    configure_logging('DEBUG')
     print("🧪 TESTING FACE DETECTION")
     print("=" * 50)
     
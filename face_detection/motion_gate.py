@@ -0,0 +1,146 @@
+# face_detection/motion_gate.py
+"""
+Motion-gated, region-restricted face detection for static cameras
+
+For a fixed camera most frames are identical to the previous one. A cheap
+frame difference on a small grayscale copy decides whether anything moved;
+static frames skip detection and reuse the previous faces. When something
+did move, the detector only scans the padded motion regions plus the
+regions where faces were last seen, and the boxes are mapped back to
+full-frame coordinates.
+"""
+
+import cv2
+import numpy as np
+
+from face_detection.box_utils import merge_overlapping, pad_box
+
+
+class MotionGatedDetector:
+    def __init__(self, detector, diff_threshold=25, min_motion_fraction=0.0005,
+                 diff_scale=0.25, padding=0.3, min_region_size=160, full_scan_interval=100):
+        """
+        Initialize the motion-gated detector
+
+        Args:
+            detector (FaceDetector): Detector that does the actual face detection
+            diff_threshold (int): Per-pixel gray level change counted as motion
+            min_motion_fraction (float): Fraction of changed pixels below which
+                a frame is treated as static
+            diff_scale (float): Frames are resized by this factor for differencing
+            padding (float): Fraction of a region's size added around it
+            min_region_size (int): Regions are grown to at least this many pixels
+                so faces cut by the motion mask are still found
+            full_scan_interval (int): Scan the whole frame every N frames to
+                pick up faces that appeared without motion (0 disables)
+        """
+        self.detector = detector
+        self.diff_threshold = diff_threshold
+        self.min_motion_fraction = min_motion_fraction
+        self.diff_scale = diff_scale
+        self.padding = padding
+        self.min_region_size = min_region_size
+        self.full_scan_interval = full_scan_interval
+
+        self._previous_gray = None
+        self._previous_faces = []
+        self._frames_since_full_scan = 0
+
+        self.stats = {
+            'frames': 0,
+            'frames_skipped': 0,
+            'full_scans': 0,
+            'pixels_total': 0,
+            'pixels_scanned': 0
+        }
+
+    def scanned_fraction(self):
+        """Fraction of all frame pixels that were actually passed to the detector"""
+        if self.stats['pixels_total'] == 0:
+            return 0.0
+        return self.stats['pixels_scanned'] / float(self.stats['pixels_total'])
+
+    def _motion_regions(self, gray, image_height, image_width):
+        """Bounding boxes (full-frame coordinates) of the changed areas"""
+        diff = cv2.absdiff(gray, self._previous_gray)
+        _, mask = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+
+        if cv2.countNonZero(mask) < self.min_motion_fraction * mask.size:
+            return []
+
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        regions = []
+        for contour in contours:
+            x, y, width, height = cv2.boundingRect(contour)
+            regions.append((
+                int(y / self.diff_scale),
+                min(image_width, int((x + width) / self.diff_scale)),
+                min(image_height, int((y + height) / self.diff_scale)),
+                int(x / self.diff_scale)
+            ))
+        return regions
+
+    def locate_faces(self, image, number_of_times_to_upsample=1):
+        """
+        Detect faces, skipping static frames and scanning only active regions
+
+        Same interface as FaceDetector.locate_faces, so it can be passed as
+        the detector of a VideoRecognizer.
+
+        Args:
+            image: numpy array image (RGB)
+            number_of_times_to_upsample (int): Upsampling passes, finds smaller faces
+
+        Returns:
+            list: List of face locations [(top, right, bottom, left)]
+        """
+        image_height, image_width = image.shape[:2]
+        small = cv2.resize(image, (0, 0), fx=self.diff_scale, fy=self.diff_scale)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+
+        self.stats['frames'] += 1
+        self.stats['pixels_total'] += image_height * image_width
+        self._frames_since_full_scan += 1
+
+        full_scan = (self._previous_gray is None or gray.shape != self._previous_gray.shape or
+                     (self.full_scan_interval and self._frames_since_full_scan >= self.full_scan_interval))
+
+        if full_scan:
+            regions = [(0, image_width, image_height, 0)]
+            self.stats['full_scans'] += 1
+            self._frames_since_full_scan = 0
+        else:
+            motion = self._motion_regions(gray, image_height, image_width)
+            if not motion:
+                # Static frame: nothing could have changed
+                self._previous_gray = gray
+                self.stats['frames_skipped'] += 1
+                return list(self._previous_faces)
+
+            regions = [pad_box(region, self.padding, self.min_region_size, image_height, image_width)
+                       for region in motion + list(self._previous_faces)]
+            regions = merge_overlapping(regions)
+
+        self._previous_gray = gray
+
+        face_locations = []
+        for top, right, bottom, left in regions:
+            if bottom <= top or right <= left:
+                continue
+            self.stats['pixels_scanned'] += (bottom - top) * (right - left)
+
+            # dlib needs a contiguous buffer
+            crop = np.ascontiguousarray(image[top:bottom, left:right])
+            for face_top, face_right, face_bottom, face_left in self.detector.locate_faces(
+                    crop, number_of_times_to_upsample=number_of_times_to_upsample):
+                face_locations.append((face_top + top, face_right + left,
+                                       face_bottom + top, face_left + left))
+
+        self._previous_faces = face_locations
+        return face_locations
+
+    def extract_face_encodings(self, image, face_locations):
+        """Delegates to the wrapped detector"""
+        return self.detector.extract_face_encodings(image, face_locations)
@@ -0,0 +1,179 @@
+# face_detection/tiled_detector.py
+"""
+Tiled face detection for very large images
+
+Full-resolution HOG on a 50-megapixel photo needs gigabytes (the upsampled
+image pyramid is many times the image size), while downscaling first loses
+the small faces. Instead the image is decoded once into a memory-mapped
+file, split into overlapping tiles that are detected in parallel worker
+processes, and duplicate boxes from the overlaps are merged with
+non-maximum suppression. Each worker only ever touches one tile, so the
+detection working set is bounded by the tile size, not the image size.
+
+PIL can't decode part of an image, so the decode itself needs the full
+bitmap once. It runs in a short-lived child process, whose memory goes
+back to the OS when it exits, and images over a pixel cap are refused.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from face_detection.box_utils import box_overlap, suppress_duplicates
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set up once by _init_worker
+_worker_image = None
+_worker_options = None
+
+
+def _init_worker(image_path, model, number_of_times_to_upsample):
+    """Memory-map the decoded image in a worker process"""
+    global _worker_image, _worker_options
+    _worker_image = np.load(image_path, mmap_mode='r')
+    _worker_options = {'model': model, 'number_of_times_to_upsample': number_of_times_to_upsample}
+
+
+def _decode_to_memmap(image_path, target_path, max_pixels, strip_height=512):
+    """
+    Decode an image into a .npy memory map (runs in its own process)
+
+    Returns:
+        tuple: (height, width)
+    """
+    # Our own cap replaces PIL's decompression bomb limit in this throwaway process
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(image_path) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError(f"{os.path.basename(image_path)} is {width}x{height}, "
+                             f"over the {max_pixels} pixel cap for tiled detection")
+        image.load()
+        mapped = np.lib.format.open_memmap(target_path, mode='w+', dtype=np.uint8,
+                                           shape=(height, width, 3))
+        for top in range(0, height, strip_height):
+            bottom = min(height, top + strip_height)
+            strip = image.crop((0, top, width, bottom))
+            # Converted per strip: no second full-size copy for non-RGB images
+            mapped[top:bottom] = np.asarray(strip if strip.mode == 'RGB' else strip.convert('RGB'))
+        mapped.flush()
+        del mapped
+    return height, width
+
+
+def _detect_tile(tile):
+    """Detect faces in one tile and return them in full-image coordinates"""
+    import face_recognition
+
+    top, right, bottom, left = tile
+    # Copy just this tile out of the mapping (dlib needs a contiguous array)
+    crop = np.ascontiguousarray(_worker_image[top:bottom, left:right])
+    locations = face_recognition.face_locations(
+        crop,
+        number_of_times_to_upsample=_worker_options['number_of_times_to_upsample'],
+        model=_worker_options['model']
+    )
+    return [(t + top, r + left, b + top, l + left) for t, r, b, l in locations]
+
+
+def tile_grid(height, width, tile_size, overlap):
+    """
+    Overlapping tiles covering an image
+
+    Args:
+        height (int): Image height
+        width (int): Image width
+        tile_size (int): Width and height of a tile
+        overlap (int): Pixels shared by neighbouring tiles; should be larger
+                       than the biggest face expected
+
+    Returns:
+        list: Tiles as (top, right, bottom, left)
+    """
+    step = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(top, min(width, left + tile_size), min(height, top + tile_size), left)
+            for top in starts(height) for left in starts(width)]
+
+
+class TiledFaceDetector:
+    def __init__(self, model='hog', tile_size=1024, overlap=256, workers=None,
+                 number_of_times_to_upsample=1, duplicate_threshold=0.6, scratch_dir=None,
+                 max_pixels=200 * 1000 * 1000):
+        """
+        Initialize the tiled face detector
+
+        Args:
+            model (str): 'hog' for CPU, 'cnn' for GPU
+            tile_size (int): Width and height of each tile in pixels
+            overlap (int): Overlap between tiles, larger than the biggest face
+            workers (int): Worker processes (defaults to the number of CPUs)
+            number_of_times_to_upsample (int): Upsampling passes per tile
+            duplicate_threshold (float): Boxes whose intersection covers more than
+                this fraction of the smaller box are merged into the larger one
+            scratch_dir (str): Where the decoded image is memory-mapped from
+            max_pixels (int): Larger images are refused (decoding needs width * height * 3 bytes)
+        """
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.workers = workers or os.cpu_count() or 1
+        self.number_of_times_to_upsample = number_of_times_to_upsample
+        self.duplicate_threshold = duplicate_threshold
+        self.scratch_dir = scratch_dir
+        self.max_pixels = max_pixels
+
+        logger.debug("✅ Tiled Face Detector initialized (%s, %dpx tiles)", model.upper(), tile_size)
+
+    def locate_faces_in_file(self, image_path):
+        """
+        Detect faces in a (large) image file
+
+        The decoded image is not returned, and this process never holds it.
+
+        Args:
+            image_path (str): Path to the image file
+
+        Returns:
+            list: List of face locations [(top, right, bottom, left)]
+
+        Raises:
+            ValueError: If the image is over the pixel cap
+        """
+        scratch = tempfile.mkdtemp(prefix='tiles-', dir=self.scratch_dir)
+        try:
+            mapped_path = os.path.join(scratch, 'image.npy')
+            with ProcessPoolExecutor(max_workers=1) as decoder:
+                height, width = decoder.submit(_decode_to_memmap, image_path, mapped_path,
+                                               self.max_pixels).result()
+            tiles = tile_grid(height, width, self.tile_size, self.overlap)
+
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tiles)),
+                                     initializer=_init_worker,
+                                     initargs=(mapped_path, self.model,
+                                               self.number_of_times_to_upsample)) as executor:
+                boxes = [box for tile_boxes in executor.map(_detect_tile, tiles) for box in tile_boxes]
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        # Faces in overlaps are found twice, faces cut by a tile edge show up
+        # as partial boxes inside the complete one: keep the larger box
+        face_locations = suppress_duplicates(boxes, threshold=self.duplicate_threshold, metric=box_overlap)
+
+        logger.info("✅ Detected %d face(s) in %s (%dx%d, %d tiles)", len(face_locations),
+                    os.path.basename(image_path), width, height, len(tiles),
+                    extra={'faces': len(face_locations), 'tiles': len(tiles)})
+        return face_locations
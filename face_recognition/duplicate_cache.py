@@ -0,0 +1,211 @@
+# face_recognition/duplicate_cache.py
+"""
+Perceptual-hash cache of face detection results
+
+Each image gets a 64-bit difference hash (dHash) computed from a 9x8
+grayscale thumbnail, which JPEG draft mode decodes at a fraction of the
+full cost. Resized copies, re-encodes and most burst shots land within a
+few bits of each other, so a near-duplicate reuses the face locations and
+encodings of its earlier twin instead of running detection again.
+
+Lookups use a multi-index hash table: the hash is split into
+max_distance + 1 bands, and by the pigeonhole principle any hash within
+max_distance bits agrees exactly with the query on at least one band. Only
+the entries sharing a band are compared bit by bit.
+
+Cached results are appended to a JSON-lines file, so the cache survives
+restarts. The file is read on first use, not when the cache is created.
+The cache holds at most max_entries images: past that, the oldest half
+is dropped and the file is rewritten with the rest. Appends and rewrites
+from several processes are serialized with an flock'ed lock file. It is
+meant for recognition only; enrollment always detects, so a look-alike
+image of somebody else can never lend its encodings to a person. Even for
+recognition a near-match may be a different photo, which is why the app
+only enables it with DEDUP_IMAGES=1.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one writing process is supported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+
+def image_hash(image_path):
+    """
+    64-bit dHash of an image
+
+    Returns:
+        tuple: (hash as int, (width, height) of the original image)
+    """
+    with Image.open(image_path) as image:
+        size = image.size
+        image.draft('L', (64, 64))
+        pixels = list(image.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value, size
+
+
+class DuplicateCache:
+    def __init__(self, cache_path=None, max_distance=3, max_aspect_difference=0.02, max_entries=10000):
+        """
+        Initialize the cache (the file is loaded on first use)
+
+        Args:
+            cache_path (str): JSON-lines file to persist results in (None: memory only)
+            max_distance (int): Most differing hash bits for a near-duplicate
+            max_aspect_difference (float): Largest relative aspect ratio
+                                           difference, rejects crops that hash alike
+            max_entries (int): Images kept; the oldest half is dropped when exceeded
+        """
+        self.cache_path = cache_path
+        self.max_distance = max_distance
+        self.max_aspect_difference = max_aspect_difference
+        self.max_entries = max_entries
+
+        # Band layout: max_distance + 1 slices of the 64 hash bits
+        bands = max_distance + 1
+        edges = [round(i * HASH_BITS / bands) for i in range(bands + 1)]
+        self._bands = [(edges[i], (1 << (edges[i + 1] - edges[i])) - 1) for i in range(bands)]
+        self._tables = [{} for _ in range(bands)]
+        self._entries = []
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Read the cache file once (lock held); only its newest max_entries lines are kept"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        with open(self.cache_path, 'r') as f:
+            lines = deque(f, maxlen=self.max_entries)
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._index(entry)
+        logger.info("🗂️  Duplicate cache: %d image(s) loaded from %s", len(self._entries), self.cache_path)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize writes to the cache file across processes (thread lock held)"""
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with open(f"{self.cache_path}.lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _drop_oldest(self):
+        """Keep the newest half of the entries and rewrite the file with them (both locks held)"""
+        keep = self.max_entries // 2 if self.max_entries > 1 else 0
+        if self.cache_path:
+            # Re-read the file: it also holds what other processes appended
+            with open(self.cache_path, 'r') as f:
+                lines = deque(f, maxlen=keep) if keep else []
+            kept = []
+            for line in lines:
+                try:
+                    kept.append(json.loads(line))
+                except ValueError:
+                    continue
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(self.cache_path) or '.')
+            with os.fdopen(fd, 'w') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in kept)
+            os.replace(tmp_path, self.cache_path)
+        else:
+            kept = self._entries[-keep:] if keep else []
+
+        self._entries = []
+        self._tables = [{} for _ in self._bands]
+        for entry in kept:
+            self._index(entry)
+        logger.info("🗂️  Duplicate cache full: kept the newest %d image(s)", len(kept))
+
+    def _index(self, entry):
+        position = len(self._entries)
+        self._entries.append(entry)
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((entry['hash'] >> shift) & mask, []).append(position)
+
+    def _find(self, value, size):
+        """Closest cached entry within max_distance bits, or None"""
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            candidates.update(table.get((value >> shift) & mask, ()))
+
+        best, best_distance = None, self.max_distance + 1
+        aspect = size[0] / float(size[1])
+        for position in candidates:
+            entry = self._entries[position]
+            distance = bin(entry['hash'] ^ value).count('1')
+            if distance >= best_distance:
+                continue
+            entry_aspect = entry['size'][0] / float(entry['size'][1])
+            if abs(entry_aspect - aspect) / aspect <= self.max_aspect_difference:
+                best, best_distance = entry, distance
+        return best
+
+    def lookup(self, image_path):
+        """
+        Cached faces of a near-duplicate image
+
+        Returns:
+            tuple: (key to pass to store(), (locations, encodings) or None).
+                   Locations are scaled to this image's size.
+        """
+        value, size = image_hash(image_path)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._find(value, size)
+            if entry is None:
+                return (value, size), None
+
+        scale_x = size[0] / float(entry['size'][0])
+        scale_y = size[1] / float(entry['size'][1])
+        locations = [(int(round(top * scale_y)), int(round(right * scale_x)),
+                      int(round(bottom * scale_y)), int(round(left * scale_x)))
+                     for top, right, bottom, left in entry['locations']]
+        return (value, size), (locations, entry['encodings'])
+
+    def store(self, key, locations, encodings):
+        """Remember the faces found in the image lookup() returned key for"""
+        value, size = key
+        entry = {'hash': value, 'size': list(size),
+                 'locations': [[int(v) for v in location] for location in locations],
+                 'encodings': [[float(v) for v in encoding] for encoding in encodings]}
+        with self._lock:
+            self._ensure_loaded()
+            self._index(entry)
+            if not self.cache_path:
+                if len(self._entries) > self.max_entries:
+                    self._drop_oldest()
+                return
+            with self._file_lock():
+                with open(self.cache_path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+                if len(self._entries) > self.max_entries:
+                    self._drop_oldest()
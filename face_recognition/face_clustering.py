@@ -0,0 +1,399 @@
+# face_recognition/face_clustering.py
+"""
+Clustering of unknown faces to find people who keep showing up
+
+DBSCAN over the encodings in an UnknownFaceStore, with the pairwise
+distances computed block by block (block x block float32 matrices), so
+memory stays bounded by the block size rather than the number of faces:
+
+1. count the neighbours within eps of every face -> core faces
+2. union core faces that are within eps of each other (union-find)
+3. attach the remaining faces to their nearest core neighbour
+
+The result is saved as a state file. An incremental run only looks at
+faces added since: a new face within eps of an existing cluster's core
+faces joins that cluster, and the rest are clustered again together with
+the earlier noise within eps of them (faces of a stranger seen once or
+twice before, or of a cluster that was below min_cluster_size). An update
+therefore costs time in the number of new faces times the noise. Noise
+that no new face comes near, and clusters that would only merge through
+old faces, are left as they are: run --rebuild periodically (e.g. nightly)
+to cluster everything again. A store that dropped its oldest faces (new
+generation) always gets a full run. Clusters can be enrolled straight into
+a FaceRecognizer.
+
+Usage:
+    python -m face_recognition.face_clustering                      # cluster / update
+    python -m face_recognition.face_clustering --rebuild --eps 0.45
+    python -m face_recognition.face_clustering --enroll 3 --name "Delivery driver"
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from face_recognition.unknown_faces import UnknownFaceStore
+
+logger = logging.getLogger(__name__)
+
+NOISE = -1
+
+
+def _blocks(count, block_size):
+    return [(start, min(count, start + block_size)) for start in range(0, count, block_size)]
+
+
+def neighbor_pairs(a, b, eps, block_size=4096, same=False):
+    """
+    Yield index pairs of rows of a and b closer than eps, block by block
+
+    Args:
+        a, b: (n, 128) arrays (memory maps are fine)
+        eps (float): Distance threshold
+        block_size (int): Rows per block; memory use is about block_size² floats
+        same (bool): a and b are the same array: only pairs i < j are yielded
+
+    Yields:
+        tuple: (rows of a, rows of b, distances) arrays for one block pair
+    """
+    eps_squared = eps * eps
+    b_blocks = _blocks(len(b), block_size)
+    b_norms = {}
+
+    for a_start, a_end in _blocks(len(a), block_size):
+        a_block = np.asarray(a[a_start:a_end], dtype=np.float32)
+        a_norm = np.einsum('ij,ij->i', a_block, a_block)
+
+        for b_start, b_end in b_blocks:
+            if same and b_end <= a_start:
+                continue
+            b_block = np.asarray(b[b_start:b_end], dtype=np.float32)
+            if b_start not in b_norms:
+                b_norms[b_start] = np.einsum('ij,ij->i', b_block, b_block)
+
+            # |x - y|² = |x|² + |y|² - 2 x·y, one matrix product per block pair
+            squared = a_norm[:, None] + b_norms[b_start][None, :] - 2.0 * (a_block @ b_block.T)
+            rows, cols = np.nonzero(squared <= eps_squared)
+            rows = rows + a_start
+            cols = cols + b_start
+            if same:
+                keep = rows < cols
+                rows, cols = rows[keep], cols[keep]
+            if len(rows):
+                yield rows, cols, np.sqrt(np.maximum(squared[rows - a_start, cols - b_start], 0.0))
+
+
+class _UnionFind:
+    def __init__(self, count):
+        self.parent = list(range(count))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def dbscan(encodings, eps=0.5, min_samples=3, block_size=4096):
+    """
+    Blocked DBSCAN over face encodings
+
+    Args:
+        encodings: (n, 128) array or memory map
+        eps (float): Faces closer than this are neighbours
+        min_samples (int): Neighbours (including itself) a core face needs
+        block_size (int): Rows per distance block
+
+    Returns:
+        tuple: (labels array, -1 for noise; boolean core mask)
+    """
+    count = len(encodings)
+    neighbors = np.ones(count, dtype=np.int64)
+    for rows, cols, _ in neighbor_pairs(encodings, encodings, eps, block_size, same=True):
+        np.add.at(neighbors, rows, 1)
+        np.add.at(neighbors, cols, 1)
+    core = neighbors >= min_samples
+
+    union_find = _UnionFind(count)
+    nearest_core = np.full(count, NOISE, dtype=np.int64)
+    nearest_distance = np.full(count, np.inf)
+
+    for rows, cols, distances in neighbor_pairs(encodings, encodings, eps, block_size, same=True):
+        both = core[rows] & core[cols]
+        for i, j in zip(rows[both].tolist(), cols[both].tolist()):
+            union_find.union(i, j)
+
+        # Border faces remember their closest core neighbour
+        for border, other in ((rows, cols), (cols, rows)):
+            candidates = ~core[border] & core[other]
+            for i, j, distance in zip(border[candidates], other[candidates], distances[candidates]):
+                if distance < nearest_distance[i]:
+                    nearest_distance[i] = distance
+                    nearest_core[i] = j
+
+    labels = np.full(count, NOISE, dtype=np.int64)
+    roots = {}
+    for i in np.nonzero(core)[0]:
+        labels[i] = roots.setdefault(union_find.find(int(i)), len(roots))
+    border = nearest_core >= 0
+    labels[border] = labels[nearest_core[border]]
+    return labels, core
+
+
+class FaceClusterer:
+    def __init__(self, store, state_path=None, eps=0.5, min_samples=3, min_cluster_size=3, block_size=4096):
+        """
+        Initialize the clusterer
+
+        Args:
+            store (UnknownFaceStore): Where the unknown encodings are kept
+            state_path (str): Cluster state file (defaults to clusters.json in the store)
+            eps (float): Faces closer than this are neighbours; stricter than the
+                         recognition tolerance so different people don't chain up
+            min_samples (int): Neighbours a face needs to seed a cluster
+            min_cluster_size (int): Smaller clusters are reported as noise
+            block_size (int): Rows per distance block (memory ~ block_size² floats)
+        """
+        self.store = store
+        self.state_path = state_path or os.path.join(store.store_dir, 'clusters.json')
+        self.labels_path = os.path.splitext(self.state_path)[0] + '.labels.npy'
+        self.core_path = os.path.splitext(self.state_path)[0] + '.core.npy'
+        self.eps = eps
+        self.min_samples = min_samples
+        self.min_cluster_size = min_cluster_size
+        self.block_size = block_size
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            labels = np.load(self.labels_path)
+            core = np.load(self.core_path)
+        except (OSError, ValueError):
+            return None
+        if state.get('eps') != self.eps or state.get('min_samples') != self.min_samples:
+            return None
+        if state.get('generation', 0) != self.store.generation() or len(labels) > self.store.count():
+            # Rows were renumbered when the store dropped its oldest faces
+            return None
+        return state, labels, core
+
+    def _save_state(self, state, labels, core):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        np.save(self.labels_path, labels)
+        np.save(self.core_path, core)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, rebuild=False):
+        """
+        Cluster the store, incrementally unless rebuild is set
+
+        Returns:
+            dict: Cluster state (see clusters())
+        """
+        encodings = self.store.encodings()
+        count = len(encodings)
+        previous = None if rebuild else self._load_state()
+        started = time.monotonic()
+
+        if previous is None:
+            labels, core = dbscan(encodings, self.eps, self.min_samples, self.block_size)
+            next_label = int(labels.max()) + 1 if count else 0
+            enrolled = {}
+            mode = 'full'
+        else:
+            state, old_labels, old_core = previous
+            labels, core, next_label = self._update(encodings, old_labels, old_core, state['next_label'])
+            enrolled = state.get('enrolled', {})
+            mode = 'incremental'
+
+        labels = self._drop_small(labels)
+        state = {
+            'eps': self.eps,
+            'min_samples': self.min_samples,
+            'faces': count,
+            'generation': self.store.generation(),
+            'clusters': int(len(np.unique(labels[labels >= 0]))),
+            'noise': int(np.sum(labels == NOISE)),
+            # Cluster ids are never reused, so enrolled ids stay valid
+            'next_label': next_label,
+            'enrolled': enrolled,
+            'updated_at': time.time()
+        }
+        self._save_state(state, labels, core)
+        logger.info("🧩 Clustered %d unknown face(s) (%s): %d cluster(s), %d unclustered, %.1fs", count, mode,
+                    state['clusters'], state['noise'], time.monotonic() - started,
+                    extra={'faces': count, 'mode': mode, 'clusters': state['clusters'], 'noise': state['noise']})
+        return state
+
+    def _update(self, encodings, old_labels, old_core, next_label):
+        """Assign faces added since the last run, cluster the new faces left over"""
+        count = len(encodings)
+        labels = np.concatenate([old_labels, np.full(count - len(old_labels), NOISE, dtype=np.int64)])
+        core = np.concatenate([old_core, np.zeros(count - len(old_core), dtype=bool)])
+        new = np.arange(len(old_labels), count)
+        if len(new) == 0:
+            return labels, core, next_label
+
+        # New faces join the cluster of their nearest existing core face
+        core_rows = np.nonzero(core & (labels >= 0))[0]
+        nearest_distance = np.full(len(new), np.inf)
+        for rows, cols, distances in neighbor_pairs(encodings[new[0]:], encodings[core_rows],
+                                                    self.eps, self.block_size):
+            closer = distances < nearest_distance[rows]
+            for i, j, distance in zip(rows[closer], cols[closer], distances[closer]):
+                if distance < nearest_distance[i]:
+                    nearest_distance[i] = distance
+                    labels[new[i]] = labels[core_rows[j]]
+
+        # New faces that joined nothing are clustered again together with the earlier
+        # noise near them: a recurring stranger's first sightings were noise until now
+        leftover = new[labels[new] == NOISE]
+        if len(leftover):
+            old_noise = np.nonzero(labels[:len(old_labels)] == NOISE)[0]
+            leftover_encodings = encodings[leftover]
+            revisit = set()
+            for start, end in _blocks(len(old_noise), self.block_size):
+                block = old_noise[start:end]
+                for rows, _, _ in neighbor_pairs(encodings[block], leftover_encodings, self.eps, self.block_size):
+                    revisit.update(block[rows].tolist())
+            pool = np.concatenate([np.array(sorted(revisit), dtype=np.int64), leftover])
+
+            pool_labels, pool_core = dbscan(encodings[pool], self.eps, self.min_samples, self.block_size)
+            clustered = pool_labels >= 0
+            labels[pool[clustered]] = pool_labels[clustered] + next_label
+            core[pool] = pool_core
+            if clustered.any():
+                next_label += int(pool_labels.max()) + 1
+        return labels, core, next_label
+
+    def _drop_small(self, labels):
+        """Turn clusters below min_cluster_size into noise (ids are kept)"""
+        ids, sizes = np.unique(labels[labels >= 0], return_counts=True)
+        small = ids[sizes < self.min_cluster_size]
+        result = labels.copy()
+        result[np.isin(labels, small)] = NOISE
+        return result
+
+    def clusters(self, max_examples=5):
+        """
+        Current clusters, largest first
+
+        Returns:
+            list: dicts with cluster_id, size, members (row indices), images
+                  (for add_new_person), examples, spread (mean distance to the
+                  centroid) and enrolled_as
+        """
+        loaded = self._load_state()
+        if loaded is None:
+            return []
+        state, labels, _ = loaded
+        encodings = self.store.encodings()
+
+        # Group members by label in one pass, then read metadata once
+        clustered = np.nonzero(labels >= 0)[0]
+        clustered = clustered[np.argsort(labels[clustered], kind='stable')]
+        boundaries = np.nonzero(np.diff(labels[clustered]))[0] + 1
+        groups = np.split(clustered, boundaries) if len(clustered) else []
+        metadata = dict(zip(clustered.tolist(), self.store.metadata(clustered)))
+
+        clusters = []
+        for members in groups:
+            cluster_id = int(labels[members[0]])
+            cluster_encodings = np.asarray(encodings[members], dtype=np.float32)
+            centroid = cluster_encodings.mean(axis=0)
+            distances = np.linalg.norm(cluster_encodings - centroid, axis=1)
+            order = members[np.argsort(distances)]
+            entries = [metadata.get(int(i)) for i in order]
+            images = list(dict.fromkeys(entry['image'] for entry in entries if entry and entry['image']))
+            clusters.append({
+                'cluster_id': cluster_id,
+                'size': int(len(members)),
+                'members': [int(i) for i in order],
+                'images': images,
+                'examples': [entry for entry in entries[:max_examples] if entry],
+                'spread': round(float(distances.mean()), 4),
+                'enrolled_as': state.get('enrolled', {}).get(str(cluster_id))
+            })
+        return sorted(clusters, key=lambda c: c['size'], reverse=True)
+
+    def enroll(self, cluster_id, person_name, recognizer, max_encodings=10):
+        """
+        Enroll a cluster as a known person
+
+        Uses the stored encodings directly (closest to the cluster centre
+        first), so it works even after the source images were evicted.
+
+        Returns:
+            bool: True if the cluster exists and was enrolled
+        """
+        cluster = next((c for c in self.clusters() if c['cluster_id'] == cluster_id), None)
+        if cluster is None:
+            logger.error("❌ No cluster %s", cluster_id)
+            return False
+
+        encodings = self.store.encodings()
+        person_encodings = [np.asarray(encodings[i], dtype=np.float64) for i in cluster['members'][:max_encodings]]
+        recognizer.add_person_encodings(person_name, person_encodings)
+
+        state, labels, core = self._load_state()
+        state.setdefault('enrolled', {})[str(cluster_id)] = person_name
+        self._save_state(state, labels, core)
+        logger.info("✅ Cluster %s enrolled as %s (%d encoding(s))", cluster_id, person_name, len(person_encodings),
+                    extra={'cluster_id': cluster_id, 'encodings': len(person_encodings)})
+        return True
+
+
+def main():
+    from config import MODELS_DIR, UNKNOWN_ENCODINGS_DIR
+    from face_recognition.face_recognizer import FaceRecognizer
+    from logging_setup import configure_logging
+
+    parser = argparse.ArgumentParser(description='Cluster unknown faces into recurring people')
+    parser.add_argument('--store', default=UNKNOWN_ENCODINGS_DIR, help='unknown face store directory')
+    parser.add_argument('--eps', type=float, default=0.5)
+    parser.add_argument('--min-samples', type=int, default=3)
+    parser.add_argument('--min-cluster-size', type=int, default=3)
+    parser.add_argument('--block-size', type=int, default=4096)
+    parser.add_argument('--rebuild', action='store_true', help='ignore the previous clustering')
+    parser.add_argument('--enroll', type=int, default=None, metavar='CLUSTER_ID')
+    parser.add_argument('--name', default=None, help='person name for --enroll')
+    parser.add_argument('--database', default=os.path.join(MODELS_DIR, 'face_database.pkl'))
+    args = parser.parse_args()
+
+    configure_logging()
+    clusterer = FaceClusterer(UnknownFaceStore(args.store), eps=args.eps, min_samples=args.min_samples,
+                              min_cluster_size=args.min_cluster_size, block_size=args.block_size)
+
+    if args.enroll is not None:
+        if not args.name:
+            parser.error('--enroll needs --name')
+        recognizer = FaceRecognizer()
+        if os.path.exists(args.database):
+            recognizer.load_database(args.database)
+        if clusterer.enroll(args.enroll, args.name, recognizer):
+            recognizer.save_database(args.database)
+        return
+
+    clusterer.run(rebuild=args.rebuild)
+    for cluster in clusterer.clusters():
+        status = f" -> {cluster['enrolled_as']}" if cluster['enrolled_as'] else ''
+        print(f"👥 Cluster {cluster['cluster_id']}: {cluster['size']} face(s) in "
+              f"{len(cluster['images'])} image(s), spread {cluster['spread']}{status}")
+
+
+if __name__ == '__main__':
+    main()
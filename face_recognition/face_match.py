@@ -0,0 +1,92 @@
+# face_recognition/face_match.py
+"""
+Compact per-face recognition result
+
+Only the location and the best match are kept by default. The full
+distance vector (one entry per known person) and the 128-d encoding are
+attached only when the caller asks for them, so the size of a result no
+longer grows with the size of the gallery. The same two flags,
+include_distances and include_encodings, select them everywhere:
+match_faces, recognize_faces and to_dict.
+"""
+
+
+class FaceMatch:
+    __slots__ = ('face_number', 'location', 'name', 'distance', 'recognized',
+                 'best_match_index', 'top_k', 'distances', 'encoding', 'track_id')
+
+    def __init__(self, face_number, location, name='Unknown', distance=None, recognized=False,
+                 best_match_index=-1, top_k=None, distances=None, encoding=None, track_id=None):
+        """
+        Args:
+            face_number (int): 1-based position of the face in the image
+            location (tuple): (top, right, bottom, left)
+            name (str): Best matching person, or 'Unknown'
+            distance (float): Distance to the closest known face (None for an
+                              empty gallery), also set when it is over tolerance
+            recognized (bool): Whether distance is within the tolerance
+            best_match_index (int): Gallery index of the closest face (-1: none)
+            top_k (list): Optional [(name, distance)] of the closest people
+            distances: Optional distance to every known face
+            encoding: Optional face encoding
+            track_id (int): Set by FaceTracker for tracked video faces
+        """
+        self.face_number = face_number
+        self.location = location
+        self.name = name
+        self.distance = distance
+        self.recognized = recognized
+        self.best_match_index = best_match_index
+        self.top_k = top_k
+        self.distances = distances
+        self.encoding = encoding
+        self.track_id = track_id
+
+    @property
+    def confidence(self):
+        """1 - distance for recognized faces, 0.0 otherwise"""
+        return 1.0 - self.distance if self.recognized else 0.0
+
+    def __getitem__(self, key):
+        # Keeps dict-style reads (face['name']) working in templates and scripts
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def copy(self, **changes):
+        """Shallow copy with some fields replaced"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return FaceMatch(**fields)
+
+    def to_dict(self, include_distances=False, include_encodings=False):
+        """
+        JSON-friendly dict; top_k and track_id are included when set
+
+        Args:
+            include_distances (bool): Also include the distance vector when present
+            include_encodings (bool): Also include the encoding when present
+        """
+        result = {
+            'face_number': self.face_number,
+            'location': [int(v) for v in self.location],
+            'name': self.name,
+            'confidence': round(float(self.confidence), 4),
+            'distance': round(float(self.distance), 4) if self.distance is not None else None,
+            'recognized': bool(self.recognized)
+        }
+        if self.top_k is not None:
+            result['top_k'] = [{'name': name, 'distance': round(float(distance), 4)}
+                               for name, distance in self.top_k]
+        if self.track_id is not None:
+            result['track_id'] = self.track_id
+        if include_distances and self.distances is not None:
+            result['distances'] = [round(float(d), 4) for d in self.distances]
+        if include_encodings and self.encoding is not None:
+            result['encoding'] = [float(v) for v in self.encoding]
+        return result
+
+    def __repr__(self):
+        return (f"FaceMatch(face_number={self.face_number}, name={self.name!r}, "
+                f"distance={self.distance}, recognized={self.recognized})")
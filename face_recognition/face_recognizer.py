@@ -3,30 +3,172 @@
 Face Recognition Module - Encoding and Matching Faces
 """
 
-import face_recognition
+import logging
 import numpy as np
 import pickle
 import os
-import cv2
+import threading
+import time
 from PIL import Image, ImageDraw
-import matplotlib.pyplot as plt
+
+from face_recognition.face_match import FaceMatch
+from face_recognition.gallery_condensation import condense_encodings, condense_gallery
+from face_recognition.gallery_snapshot import GallerySnapshot
+from logging_setup import ItemLog
+from profiling import annotate, stage
+
+logger = logging.getLogger(__name__)
+
+
+def _face_recognition():
+    """
+    Import the face_recognition library on first use
+
+    Importing it loads dlib and the model weights, so loading a saved
+    database or listing people does not pay that cost.
+    """
+    import face_recognition
+    return face_recognition
 
 
 class FaceRecognizer:
-    def __init__(self, tolerance=0.6):
+    def __init__(self, tolerance=0.6, duplicate_cache=None, max_samples_per_person=None,
+                 duplicate_sample_distance=0.12, snapshot_store=None, poll_interval=2.0):
         """
         Initialize Face Recognizer
 
         Args:
             tolerance (float): How much distance between faces to consider it a match.
                              Lower is more strict.
+            duplicate_cache (DuplicateCache): Optional cache that lets near-duplicate
+                             images reuse earlier results in recognize_faces
+            max_samples_per_person (int): Condense each enrolled person to at most this
+                             many representative encodings (None keeps every sample)
+            duplicate_sample_distance (float): Enrolled samples closer than this to a
+                             kept one are dropped when condensing
+            snapshot_store (SnapshotStore): Optional gallery shared between processes;
+                             changes are published to it and newer versions mapped
+            poll_interval (float): Seconds between checks for a newer shared version
         """
         self.tolerance = tolerance
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.face_database = {}
+        self.duplicate_cache = duplicate_cache
+        self.max_samples_per_person = max_samples_per_person
+        self.duplicate_sample_distance = duplicate_sample_distance
+        # Readers take self.gallery once; writers swap in a new snapshot under _write_lock
+        self._gallery = GallerySnapshot()
+        self._write_lock = threading.Lock()
+        self.snapshot_store = snapshot_store
+        self.poll_interval = poll_interval
+        self._gallery_version = None
+        self._next_poll = 0.0
+        self._poll_lock = threading.Lock()
+
+        logger.debug("✅ Face Recognizer initialized (tolerance: %s)", tolerance)
+
+    @property
+    def gallery(self):
+        """Current gallery snapshot (re-mapped when the shared store has a newer version)"""
+        if self.snapshot_store is not None and time.monotonic() >= self._next_poll:
+            self._poll_store()
+        return self._gallery
+
+    @gallery.setter
+    def gallery(self, gallery):
+        self._gallery = gallery
+
+    def _poll_store(self):
+        """Map the store's current version if it is newer than ours"""
+        # Only the very first load makes readers wait; later polls are skipped while one is running
+        if not self._poll_lock.acquire(blocking=self._gallery_version is None):
+            return
+        try:
+            if time.monotonic() < self._next_poll:
+                return
+            self._next_poll = time.monotonic() + self.poll_interval
+            version = self.snapshot_store.current_version()
+            if version is None or version == self._gallery_version:
+                return
+
+            gallery, version, meta = self.snapshot_store.load(version)
+            with self._write_lock:
+                if self._gallery_version is None or version > self._gallery_version:
+                    self._gallery, self._gallery_version = gallery, version
+                    self.tolerance = meta.get('tolerance', self.tolerance)
+                    logger.info("🔄 Gallery version %d mapped (%d people)", version, len(gallery))
+        except OSError as e:
+            logger.warning("⚠️  Could not map the shared gallery: %s", e)
+        finally:
+            self._poll_lock.release()
+
+    def _commit(self, change, meta=None):
+        """
+        Replace the gallery with change(current snapshot)
+
+        With a snapshot store the change is applied to the newest shared
+        version and published, so other processes pick it up too.
+        """
+        with self._write_lock:
+            if self.snapshot_store is None:
+                self._gallery = change(self._gallery)
+            else:
+                self._gallery, self._gallery_version = self.snapshot_store.update(change, meta)
+
+    @property
+    def known_face_encodings(self):
+        """Primary encoding per person (read-only array of the current snapshot)"""
+        return self.gallery.encodings
 
-        print(f"✅ Face Recognizer initialized (tolerance: {tolerance})")
+    @property
+    def known_face_names(self):
+        """Person names, in gallery order"""
+        return self.gallery.names
+
+    @property
+    def face_database(self):
+        """Read-only name -> all enrolled encodings"""
+        return self.gallery.database
+
+    def warm_up(self):
+        """
+        Load the detection and encoding models ahead of the first request
+
+        Encodes a tiny blank image so the dlib models are loaded and
+        initialized now rather than inside the first real request.
+        """
+        face_recognition = _face_recognition()
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        face_recognition.face_encodings(blank, [(0, 63, 63, 0)])
+        logger.info("🔥 Face Recognizer warmed up")
+
+    def _find_faces(self, face_recognition, image_path):
+        """
+        Face locations and encodings of an image, from the duplicate cache when possible
+
+        The hash lookup only needs a tiny draft decode, so the image itself is
+        decoded only on a miss.
+
+        Returns:
+            tuple: (face locations, face encodings, decoded image or None on a cache hit)
+        """
+        key = None
+        if self.duplicate_cache is not None:
+            with stage('dedup'):
+                key, cached = self.duplicate_cache.lookup(image_path)
+            if cached is not None:
+                annotate(duplicate=True)
+                locations, encodings = cached
+                return locations, [np.asarray(encoding) for encoding in encodings], None
+
+        with stage('decode'):
+            image = face_recognition.load_image_file(image_path)
+        with stage('detect'):
+            face_locations = face_recognition.face_locations(image)
+        with stage('encode'):
+            face_encodings = face_recognition.face_encodings(image, face_locations)
+
+        if key is not None:
+            self.duplicate_cache.store(key, face_locations, face_encodings)
+        return face_locations, face_encodings, image
 
     def load_known_faces(self, known_faces_dir):
         """
@@ -35,22 +177,25 @@ class FaceRecognizer:
         Args:
             known_faces_dir (str): Path to directory with person subdirectories
         """
-        print(f"📁 Loading known faces from: {known_faces_dir}")
+        logger.info("📁 Loading known faces from: %s", known_faces_dir)
+
+        face_recognition = _face_recognition()
 
         if not os.path.exists(known_faces_dir):
-            print(f"❌ Directory not found: {known_faces_dir}")
+            logger.error("❌ Directory not found: %s", known_faces_dir)
             return False
 
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.face_database = {}
+        # Built aside and swapped in at the end, so readers keep the old gallery meanwhile
+        gallery = GallerySnapshot()
+        counts = {'images': 0, 'no_face': 0, 'errors': 0, 'samples': 0}
+        item_log = ItemLog(logger)
 
         # Each person should have their own directory
         for person_name in os.listdir(known_faces_dir):
             person_dir = os.path.join(known_faces_dir, person_name)
 
             if os.path.isdir(person_dir):
-                print(f"👤 Loading faces for: {person_name}")
+                item_log("👤 Loading faces for: %s", person_name)
 
                 person_encodings = []
 
@@ -59,119 +204,156 @@ class FaceRecognizer:
                     if image_file.lower().endswith(('.png', '.jpg', '.jpeg')):
                         image_path = os.path.join(person_dir, image_file)
 
+                        counts['images'] += 1
                         try:
-                            # Load and encode face
+                            # Load and encode face (never from the duplicate cache: a
+                            # look-alike of someone else must not lend its encodings)
                             image = face_recognition.load_image_file(image_path)
                             face_encodings = face_recognition.face_encodings(image)
 
                             if face_encodings:
                                 person_encodings.append(face_encodings[0])
-                                print(f"   ✅ {image_file}: Face encoded")
+                                item_log("   ✅ %s: Face encoded", image_file)
                             else:
-                                print(f"   ❌ {image_file}: No face detected")
+                                counts['no_face'] += 1
+                                item_log("   ❌ %s: No face detected", image_file)
 
                         except Exception as e:
-                            print(f"   ❌ {image_file}: Error - {e}")
+                            counts['errors'] += 1
+                            logger.warning("   ❌ %s: Error - %s", image_path, e)
 
                 if person_encodings:
-                    # Use the first encoding as primary, store all for this person
-                    primary_encoding = person_encodings[0]
-                    self.known_face_encodings.append(primary_encoding)
-                    self.known_face_names.append(person_name)
-
-                    # Store all encodings for this person in database
-                    self.face_database[person_name] = person_encodings
-
-                    print(f"   📊 {person_name}: {len(person_encodings)} face encoding(s) loaded")
+                    kept = self._prepare_samples(person_encodings)
+                    gallery = gallery.with_person(person_name, kept)
+                    counts['samples'] += len(person_encodings)
+                    item_log("   📊 %s: %d face encoding(s) loaded, %d kept", person_name,
+                             len(person_encodings), len(kept))
                 else:
-                    print(f"   ⚠️  {person_name}: No valid faces found")
-
-        print(f"✅ Loaded {len(self.known_face_names)} people from database")
+                    logger.warning("   ⚠️  %s: No valid faces found", person_name)
+
+        item_log.close()
+        self._commit(lambda _: gallery)
+        logger.info("✅ Loaded %d people from %d image(s) (%d without a face, %d error(s))",
+                    len(gallery), counts['images'], counts['no_face'], counts['errors'],
+                    extra={'people': len(gallery), **counts})
+        if self.max_samples_per_person is not None:
+            kept = sum(len(encodings) for encodings in gallery.database.values())
+            logger.info("🗜️  Condensed %d sample(s) to %d", counts['samples'], kept)
         return True
 
-    def recognize_faces(self, image_path, draw_results=True):
+    def recognize_faces(self, image_path, draw_results=True, top_k=0, include_distances=False,
+                        include_encodings=False):
         """
         Recognize faces in an image
 
         Args:
             image_path (str): Path to the image file
             draw_results (bool): Whether to draw bounding boxes and labels
+            top_k (int): Also return the k closest known faces per face
+            include_distances (bool): Attach the full distance vector per face
+            include_encodings (bool): Attach each face's encoding
 
         Returns:
-            dict: Recognition results
+            tuple: (list of FaceMatch, result image or None)
         """
-        print(f"🔍 Recognizing faces in: {os.path.basename(image_path)}")
 
-        try:
-            # Load image
-            unknown_image = face_recognition.load_image_file(image_path)
-
-            # Find faces and their encodings
-            face_locations = face_recognition.face_locations(unknown_image)
-            face_encodings = face_recognition.face_encodings(unknown_image, face_locations)
-
-            print(f"📊 Found {len(face_encodings)} face(s) to recognize")
-
-            recognized_faces = []
-
-            for i, (face_encoding, face_location) in enumerate(zip(face_encodings, face_locations)):
-                # Compare with known faces
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings,
-                    face_encoding,
-                    tolerance=self.tolerance
-                )
-
-                # Calculate face distances
-                face_distances = face_recognition.face_distance(
-                    self.known_face_encodings,
-                    face_encoding
-                )
-
-                # Find best match
-                best_match_index = np.argmin(face_distances) if face_distances.size > 0 else -1
-
-                face_info = {
-                    'face_number': i + 1,
-                    'location': face_location,
-                    'encoding': face_encoding,
-                    'matches': matches,
-                    'distances': face_distances,
-                    'best_match_index': best_match_index
-                }
-
-                if best_match_index >= 0 and matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    distance = face_distances[best_match_index]
-                    face_info.update({
-                        'name': name,
-                        'confidence': 1 - distance,  # Convert distance to confidence
-                        'distance': distance,
-                        'recognized': True
-                    })
-                    print(f"   ✅ Face {i + 1}: Recognized as {name} (confidence: {1 - distance:.2f})")
-                else:
-                    face_info.update({
-                        'name': 'Unknown',
-                        'confidence': 0.0,
-                        'distance': float('inf'),
-                        'recognized': False
-                    })
-                    print(f"   ❌ Face {i + 1}: Unknown person")
+        face_recognition = _face_recognition()
 
-                recognized_faces.append(face_info)
+        try:
+            # Find faces and their encodings (decodes the image unless it's a known near-duplicate)
+            face_locations, face_encodings, unknown_image = self._find_faces(face_recognition, image_path)
+
+            with stage('match'):
+                recognized_faces = self.match_faces(face_encodings, face_locations, top_k=top_k,
+                                                    include_distances=include_distances,
+                                                    include_encodings=include_encodings)
+            annotate(faces=len(recognized_faces), gallery_size=len(self.gallery))
+            if unknown_image is not None:
+                annotate(image_size=list(unknown_image.shape[:2]))
+
+            recognized = sum(1 for face_info in recognized_faces if face_info.recognized)
+            logger.info("🔍 %s: %d face(s), %d recognized", os.path.basename(image_path),
+                        len(recognized_faces), recognized,
+                        extra={'faces': len(recognized_faces), 'recognized': recognized})
 
             # Draw results if requested
             if draw_results and recognized_faces:
-                result_image = self._draw_recognition_results(unknown_image, recognized_faces)
+                if unknown_image is None:
+                    with stage('decode'):
+                        unknown_image = face_recognition.load_image_file(image_path)
+                with stage('draw'):
+                    result_image = self._draw_recognition_results(unknown_image, recognized_faces)
                 return recognized_faces, result_image
             else:
                 return recognized_faces, None
 
         except Exception as e:
-            print(f"❌ Error recognizing faces: {e}")
+            logger.error("❌ Error recognizing faces in %s: %s", os.path.basename(image_path), e)
             return [], None
 
+    def match_faces(self, face_encodings, face_locations, top_k=0, include_distances=False,
+                    include_encodings=False):
+        """
+        Match face encodings against the known faces
+
+        Args:
+            face_encodings: Face encodings to identify
+            face_locations: Face locations matching face_encodings
+            top_k (int): Also return the k closest known faces per face
+            include_distances (bool): Attach the full (gallery-sized) distance vector
+            include_encodings (bool): Attach each face's encoding
+
+        Returns:
+            list: FaceMatch for each face
+        """
+        recognized_faces = []
+        # One snapshot for the whole call, however the gallery changes meanwhile
+        gallery = self.gallery
+        known_encodings = gallery.encodings
+        item_log = ItemLog(logger)
+
+        for i, (face_encoding, face_location) in enumerate(zip(face_encodings, face_locations)):
+            face_info = FaceMatch(i + 1, face_location)
+            if include_encodings:
+                face_info.encoding = face_encoding
+
+            if len(known_encodings) == 0:
+                if include_distances:
+                    face_info.distances = np.empty(0)
+                item_log("   ❌ Face %d: Unknown person", i + 1)
+                recognized_faces.append(face_info)
+                continue
+
+            # Calculate face distances (same metric as face_recognition.face_distance)
+            face_distances = np.linalg.norm(known_encodings - face_encoding, axis=1)
+
+            # Find best match
+            best_match_index = int(np.argmin(face_distances))
+            distance = float(face_distances[best_match_index])
+            face_info.best_match_index = best_match_index
+            face_info.distance = distance
+
+            if top_k:
+                k = min(top_k, len(face_distances))
+                closest = np.argpartition(face_distances, k - 1)[:k]
+                closest = closest[np.argsort(face_distances[closest])]
+                face_info.top_k = [(gallery.name_at(j), float(face_distances[j])) for j in closest]
+            if include_distances:
+                face_info.distances = face_distances
+
+            if distance <= self.tolerance:
+                face_info.name = gallery.name_at(best_match_index)
+                face_info.recognized = True
+                item_log("   ✅ Face %d: Recognized as %s (confidence: %.2f)", i + 1, face_info.name, 1 - distance)
+            else:
+                item_log("   ❌ Face %d: Unknown person", i + 1)
+
+            recognized_faces.append(face_info)
+
+        item_log.close()
+
+        return recognized_faces
+
     def _draw_recognition_results(self, image, recognized_faces):
         """
         Draw recognition results on image
@@ -188,12 +370,12 @@ class FaceRecognizer:
         draw = ImageDraw.Draw(pil_image)
 
         for face_info in recognized_faces:
-            top, right, bottom, left = face_info['location']
+            top, right, bottom, left = face_info.location
 
             # Choose color based on recognition
-            if face_info['recognized']:
+            if face_info.recognized:
                 color = "green"
-                label = f"{face_info['name']} ({face_info['confidence']:.2f})"
+                label = f"{face_info.name} ({face_info.confidence:.2f})"
             else:
                 color = "red"
                 label = "Unknown"
@@ -219,12 +401,15 @@ class FaceRecognizer:
             person_name (str): Name of the person
             image_paths (list): List of image paths for this person
         """
-        print(f"👤 Adding new person: {person_name}")
+        logger.info("👤 Adding new person: %s", person_name)
+
+        face_recognition = _face_recognition()
 
         if person_name in self.known_face_names:
-            print(f"⚠️  Person {person_name} already exists. Updating...")
+            logger.info("⚠️  Person %s already exists. Updating...", person_name)
 
         person_encodings = []
+        item_log = ItemLog(logger)
 
         for image_path in image_paths:
             try:
@@ -233,33 +418,88 @@ class FaceRecognizer:
 
                 if face_encodings:
                     person_encodings.append(face_encodings[0])
-                    print(f"   ✅ {os.path.basename(image_path)}: Face encoded")
+                    item_log("   ✅ %s: Face encoded", os.path.basename(image_path))
                 else:
-                    print(f"   ❌ {os.path.basename(image_path)}: No face detected")
+                    item_log("   ❌ %s: No face detected", os.path.basename(image_path))
 
             except Exception as e:
-                print(f"   ❌ {os.path.basename(image_path)}: Error - {e}")
+                logger.warning("   ❌ %s: Error - %s", os.path.basename(image_path), e)
 
+        item_log.close()
         if person_encodings:
-            # Update database
-            primary_encoding = person_encodings[0]
-
-            if person_name in self.known_face_names:
-                # Update existing person
-                index = self.known_face_names.index(person_name)
-                self.known_face_encodings[index] = primary_encoding
-            else:
-                # Add new person
-                self.known_face_encodings.append(primary_encoding)
-                self.known_face_names.append(person_name)
-
-            self.face_database[person_name] = person_encodings
-            print(f"✅ {person_name}: Added {len(person_encodings)} face encoding(s)")
+            self.add_person_encodings(person_name, person_encodings)
+            logger.info("✅ %s: Added %d of %d image(s)", person_name, len(person_encodings), len(image_paths))
             return True
         else:
-            print(f"❌ {person_name}: No valid faces found")
+            logger.warning("❌ %s: No valid faces found", person_name)
             return False
 
+    def add_person_encodings(self, person_name, person_encodings):
+        """
+        Add (or replace) a person from already computed face encodings
+
+        Args:
+            person_name (str): Name of the person
+            person_encodings (list): Face encodings; the first one is used for matching
+                                     (after condensing, the most representative one)
+        """
+        person_encodings = self._prepare_samples(person_encodings)
+        # Copy-on-write: readers holding the old snapshot are unaffected
+        self._commit(lambda gallery: gallery.with_person(person_name, person_encodings))
+
+    def extend_person(self, person_name, person_encodings):
+        """
+        Add encodings to a person's samples, enrolling them if new
+
+        The merge happens on the newest gallery (shared version included),
+        so concurrent enrollments of the same person are not lost.
+
+        Args:
+            person_name (str): Name of the person
+            person_encodings (list): New face encodings
+        """
+        def extended(gallery):
+            existing = list(gallery.samples_of(person_name) or ())
+            return gallery.with_person(person_name, self._prepare_samples(existing + list(person_encodings)))
+
+        self._commit(extended)
+
+    def _prepare_samples(self, person_encodings):
+        """The samples actually enrolled for a person (condensed if configured)"""
+        if self.max_samples_per_person is not None:
+            return condense_encodings(person_encodings, self.max_samples_per_person,
+                                      self.duplicate_sample_distance)
+        return list(person_encodings)
+
+    def condense(self, max_samples_per_person=5, duplicate_sample_distance=0.12):
+        """
+        Condense an already enrolled gallery (e.g. one loaded with load_database)
+
+        Args:
+            max_samples_per_person (int): Most encodings kept per person
+            duplicate_sample_distance (float): Samples closer than this count as duplicates
+
+        Returns:
+            dict: Sample counts and bytes before and after
+        """
+        reports = []
+
+        def condensed(gallery):
+            database, report = condense_gallery(gallery.database, max_samples_per_person,
+                                                duplicate_sample_distance)
+            reports.append(report)
+            names = gallery.names
+            return GallerySnapshot(names, [database[name][0] for name in names] if names else None,
+                                   [database[name] for name in names])
+
+        self._commit(condensed)
+        report = reports[-1]
+
+        logger.info("🗜️  Gallery condensed from %d to %d sample(s) (%.0f%% smaller)",
+                    report['samples_before'], report['samples_after'], 100 * report['shrinkage'],
+                    extra=report)
+        return report
+
     def save_database(self, filepath):
         """
         Save face database to file
@@ -268,21 +508,22 @@ class FaceRecognizer:
             filepath (str): Path to save the database
         """
         try:
+            gallery = self.gallery
             database = {
-                'encodings': self.known_face_encodings,
-                'names': self.known_face_names,
-                'full_database': self.face_database,
+                'encodings': list(gallery.encodings),
+                'names': list(gallery.names),
+                'full_database': {name: list(samples) for name, samples in gallery.database.items()},
                 'tolerance': self.tolerance
             }
 
             with open(filepath, 'wb') as f:
                 pickle.dump(database, f)
 
-            print(f"💾 Database saved to: {filepath}")
+            logger.info("💾 Database saved to: %s", filepath)
             return True
 
         except Exception as e:
-            print(f"❌ Error saving database: {e}")
+            logger.error("❌ Error saving database: %s", e)
             return False
 
     def load_database(self, filepath):
@@ -293,22 +534,59 @@ class FaceRecognizer:
             filepath (str): Path to load the database from
         """
         try:
-            with open(filepath, 'rb') as f:
-                database = pickle.load(f)
+            gallery, tolerance = self._read_database(filepath)
+            self.tolerance = tolerance
+            self._commit(lambda _: gallery, {'tolerance': self.tolerance})
 
-            self.known_face_encodings = database['encodings']
-            self.known_face_names = database['names']
-            self.face_database = database['full_database']
-            self.tolerance = database.get('tolerance', 0.6)
-
-            print(f"📂 Database loaded from: {filepath}")
-            print(f"📊 Loaded {len(self.known_face_names)} people")
+            logger.info("📂 Database loaded from: %s (%d people)", filepath, len(self.gallery))
             return True
 
         except Exception as e:
-            print(f"❌ Error loading database: {e}")
+            logger.error("❌ Error loading database: %s", e)
             return False
 
+    @staticmethod
+    def _read_database(filepath):
+        """(GallerySnapshot, tolerance) of a pickled database"""
+        with open(filepath, 'rb') as f:
+            database = pickle.load(f)
+        gallery = GallerySnapshot.from_database(database['names'], database['encodings'],
+                                                database['full_database'])
+        return gallery, database.get('tolerance', 0.6)
+
+    def import_database(self, filepath):
+        """
+        Publish a pickled database to the snapshot store unless the shared gallery is newer
+
+        Lets the offline flow (load_known_faces + save_database) reach running
+        workers: a pickle saved after the current gallery version replaces it,
+        an older one is left alone.
+
+        Args:
+            filepath (str): Path of the pickled database
+
+        Returns:
+            bool: True if it was published, False if the shared gallery is newer
+
+        Raises:
+            OSError, pickle.UnpicklingError: If the file can't be read
+        """
+        meta = {}
+
+        def load():
+            gallery, meta['tolerance'] = self._read_database(filepath)
+            return gallery, meta
+
+        with self._write_lock:
+            published, version = self.snapshot_store.publish_if_newer(load, os.path.getmtime(filepath))
+            if published is None:
+                return False
+            self._gallery, self._gallery_version = published, version
+            self.tolerance = meta['tolerance']
+        logger.info("📂 Database imported from: %s (%d people, gallery version %d)", filepath,
+                    len(published), version)
+        return True
+
     def list_known_people(self):
         """List all known people in the database"""
         print("📋 KNOWN PEOPLE IN DATABASE:")
@@ -0,0 +1,127 @@
+# face_recognition/gallery_condensation.py
+"""
+Enrollment-time condensation of a person's face samples
+
+Burst captures give many near-identical encodings that cost memory and
+matching time without adding information. A person's samples are first
+thinned so no two kept samples are closer than duplicate_distance, then
+reduced to at most max_samples representatives with k-medoids (the kept
+samples are real encodings, not averages). The medoid of the largest
+group comes first, so it becomes the person's primary encoding: the most
+typical face instead of whichever image happened to be loaded first.
+"""
+
+import numpy as np
+
+
+def _pairwise_distances(encodings):
+    squared = np.einsum('ij,ij->i', encodings, encodings)
+    distances = squared[:, None] + squared[None, :] - 2.0 * encodings @ encodings.T
+    return np.sqrt(np.maximum(distances, 0.0))
+
+
+def drop_near_duplicates(encodings, duplicate_distance=0.12):
+    """
+    Indices of the samples kept after removing near-duplicates
+
+    Samples are visited in order and kept when they are further than
+    duplicate_distance from every sample kept so far.
+    """
+    encodings = np.asarray(encodings, dtype=np.float64)
+    kept = []
+    for i in range(len(encodings)):
+        if not kept or np.min(np.linalg.norm(encodings[kept] - encodings[i], axis=1)) > duplicate_distance:
+            kept.append(i)
+    return kept
+
+
+def k_medoids(distances, k, max_iterations=50):
+    """
+    k-medoids (greedy PAM build, then alternating assignment / update)
+
+    Args:
+        distances: (n, n) pairwise distance matrix
+        k (int): Number of medoids (at most n)
+        max_iterations (int): Update rounds
+
+    Returns:
+        tuple: (medoid indices, cluster label per sample)
+    """
+    n = len(distances)
+    k = min(k, n)
+
+    # Build: start from the overall medoid, then add whichever sample lowers the total cost most
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    nearest = distances[medoids[0]].copy()
+    for _ in range(1, k):
+        gains = np.maximum(nearest[None, :] - distances, 0.0).sum(axis=1)
+        gains[medoids] = -1.0
+        candidate = int(np.argmax(gains))
+        medoids.append(candidate)
+        nearest = np.minimum(nearest, distances[candidate])
+
+    medoids = np.asarray(medoids)
+    for _ in range(max_iterations):
+        labels = np.argmin(distances[medoids], axis=0)
+        updated = medoids.copy()
+        for cluster in range(k):
+            members = np.nonzero(labels == cluster)[0]
+            if len(members):
+                costs = distances[np.ix_(members, members)].sum(axis=1)
+                updated[cluster] = members[int(np.argmin(costs))]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+
+    return medoids, np.argmin(distances[medoids], axis=0)
+
+
+def condense_encodings(encodings, max_samples=5, duplicate_distance=0.12):
+    """
+    Representative subset of one person's encodings
+
+    Args:
+        encodings: The person's face encodings
+        max_samples (int): Most encodings kept (None: only drop duplicates)
+        duplicate_distance (float): Samples closer than this count as duplicates
+
+    Returns:
+        list: Kept encodings, the most representative one first
+    """
+    if len(encodings) <= 1:
+        return list(encodings)
+
+    kept = drop_near_duplicates(encodings, duplicate_distance)
+    candidates = np.asarray(encodings, dtype=np.float64)[kept]
+    k = len(kept) if max_samples is None else min(max_samples, len(kept))
+
+    medoids, labels = k_medoids(_pairwise_distances(candidates), k)
+    # Largest group first; its medoid becomes the primary encoding
+    order = sorted(range(len(medoids)), key=lambda cluster: -int(np.sum(labels == cluster)))
+    return [encodings[kept[medoids[cluster]]] for cluster in order]
+
+
+def condense_gallery(face_database, max_samples=5, duplicate_distance=0.12):
+    """
+    Condense every person of a face database
+
+    Args:
+        face_database (dict): person name -> list of encodings
+
+    Returns:
+        tuple: (condensed database, report dict with the sample counts and bytes before and after)
+    """
+    condensed = {name: condense_encodings(encodings, max_samples, duplicate_distance)
+                 for name, encodings in face_database.items()}
+    before = sum(len(encodings) for encodings in face_database.values())
+    after = sum(len(encodings) for encodings in condensed.values())
+    # dlib encodings are 128 float64 values
+    report = {
+        'people': len(face_database),
+        'samples_before': before,
+        'samples_after': after,
+        'bytes_before': before * 128 * 8,
+        'bytes_after': after * 128 * 8,
+        'shrinkage': round(1.0 - after / before, 4) if before else 0.0
+    }
+    return condensed, report
@@ -0,0 +1,195 @@
+# face_recognition/gallery_snapshot.py
+"""
+Immutable gallery snapshots with copy-on-write updates
+
+A GallerySnapshot holds the names, primary encodings and all enrolled
+samples of a gallery as one consistent object. Readers take
+recognizer.gallery once (a single attribute read) and use only that
+snapshot, so they never see a names list and an encodings array of
+different lengths, and they never take a lock.
+
+Writers build a new snapshot with with_person() and swap it in. Rows live
+in capacity-doubling buffers shared by a snapshot and its successors:
+adding a person writes the row just past the end of the current snapshot,
+where no existing snapshot looks, so adding is amortized O(1) and shares
+every unchanged row. Replacing an existing person's row, or adding from a
+snapshot that is no longer the newest one of its buffer, copies the
+buffers first.
+"""
+
+import threading
+from types import MappingProxyType
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+class _Buffers:
+    """Row storage shared by a chain of snapshots"""
+
+    def __init__(self, encodings, names, samples, index, filled, writable, sample_rows=None):
+        self.encodings = encodings
+        self.names = names
+        self.samples = samples
+        self.index = index
+        self.filled = filled
+        self.writable = writable
+        # Optional (stacked samples, offsets) arrays for rows whose samples entry is None
+        self.sample_rows = sample_rows
+        self.lock = threading.Lock()
+
+    @classmethod
+    def allocate(cls, size, capacity):
+        return cls(np.empty((capacity, ENCODING_SIZE), dtype=np.float64),
+                   np.empty(capacity, dtype=object), np.empty(capacity, dtype=object),
+                   {}, size, True)
+
+    def copy(self, size, capacity):
+        """Private copy of the first size rows"""
+        buffers = _Buffers.allocate(size, max(capacity, size))
+        buffers.encodings[:size] = self.encodings[:size]
+        buffers.names[:size] = self.names[:size]
+        buffers.samples[:size] = self.samples[:size]
+        buffers.index = {name: i for i, name in enumerate(buffers.names[:size])}
+        buffers.sample_rows = self.sample_rows
+        return buffers
+
+
+class GallerySnapshot:
+    __slots__ = ('_buffers', '_size', 'lineage', 'version', '_names', '_database')
+
+    def __init__(self, names=(), encodings=None, samples=None, sample_rows=None):
+        """
+        Snapshot of a complete gallery
+
+        Args:
+            names: Person names
+            encodings: Primary encoding per name; an existing float64 array
+                       (e.g. a memory map) is used without copying
+            samples: Optional list of all enrolled encodings per name
+                     (defaults to just the primary one)
+            sample_rows: Alternatively (stacked samples array, offsets array), person i
+                         owning rows offsets[i]:offsets[i + 1]; sliced on demand
+        """
+        size = len(names)
+        if encodings is None or size == 0:
+            buffers = _Buffers.allocate(0, 16)
+        else:
+            array = np.asarray(encodings, dtype=np.float64).reshape(size, ENCODING_SIZE)
+            shared = isinstance(encodings, np.ndarray) and np.may_share_memory(array, encodings)
+            name_array = np.empty(size, dtype=object)
+            name_array[:] = list(names)
+            sample_array = np.empty(size, dtype=object)
+            if samples is not None:
+                sample_array[:] = [tuple(person) for person in samples]
+            buffers = _Buffers(array, name_array, sample_array,
+                               {name: i for i, name in enumerate(names)}, size, not shared, sample_rows)
+        self._init(buffers, size, object(), 0)
+
+    def _init(self, buffers, size, lineage, version):
+        self._buffers = buffers
+        self._size = size
+        # Snapshots derived with with_person() share a lineage; a loaded gallery starts a new one
+        self.lineage = lineage
+        self.version = version
+        self._names = None
+        self._database = None
+
+    @classmethod
+    def _derive(cls, parent, buffers, size):
+        snapshot = cls.__new__(cls)
+        snapshot._init(buffers, size, parent.lineage, parent.version + 1)
+        return snapshot
+
+    @classmethod
+    def from_database(cls, names, encodings, database):
+        """Snapshot of a pickled face database (names, primary encodings, name -> samples)"""
+        return cls(names, encodings, [database.get(name) or [encoding]
+                                      for name, encoding in zip(names, encodings)])
+
+    # Reads (never block, never change)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return self.index_of(name) >= 0
+
+    @property
+    def encodings(self):
+        """Read-only (people, 128) array of primary encodings"""
+        view = self._buffers.encodings[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def names(self):
+        """Names as a tuple, in gallery order"""
+        if self._names is None:
+            self._names = tuple(self._buffers.names[:self._size])
+        return self._names
+
+    def name_at(self, index):
+        return self._buffers.names[index]
+
+    def index_of(self, name):
+        """Gallery index of a person, -1 if not enrolled"""
+        index = self._buffers.index.get(name)
+        if index is None or index >= self._size or self._buffers.names[index] != name:
+            return -1
+        return index
+
+    def samples_of(self, name):
+        """All enrolled encodings of a person (None if not enrolled)"""
+        index = self.index_of(name)
+        if index < 0:
+            return None
+        samples = self._buffers.samples[index]
+        if samples is not None:
+            return samples
+        if self._buffers.sample_rows is not None:
+            rows, offsets = self._buffers.sample_rows
+            return tuple(rows[offsets[index]:offsets[index + 1]])
+        return (self._buffers.encodings[index],)
+
+    @property
+    def database(self):
+        """Read-only name -> samples mapping"""
+        if self._database is None:
+            self._database = MappingProxyType({name: self.samples_of(name) for name in self.names})
+        return self._database
+
+    # Writes (return a new snapshot)
+
+    def with_person(self, name, person_encodings):
+        """
+        Snapshot with a person added, or replaced if already enrolled
+
+        Args:
+            name (str): Person name
+            person_encodings (list): Encodings; the first one is the primary
+        """
+        samples = tuple(person_encodings)
+        primary = np.asarray(samples[0], dtype=np.float64)
+        index = self.index_of(name)
+
+        if index >= 0:
+            # Readers of this snapshot may be scanning the row: copy before changing it
+            buffers = self._buffers.copy(self._size, len(self._buffers.encodings))
+            buffers.encodings[index] = primary
+            buffers.samples[index] = samples
+            return GallerySnapshot._derive(self, buffers, self._size)
+
+        buffers = self._buffers
+        with buffers.lock:
+            if (not buffers.writable or buffers.filled != self._size
+                    or self._size == len(buffers.encodings)):
+                buffers = buffers.copy(self._size, 2 * self._size + 16)
+            # Row self._size is past the end of every snapshot sharing these buffers
+            buffers.encodings[self._size] = primary
+            buffers.names[self._size] = name
+            buffers.samples[self._size] = samples
+            buffers.index[name] = self._size
+            buffers.filled = self._size + 1
+        return GallerySnapshot._derive(self, buffers, self._size + 1)
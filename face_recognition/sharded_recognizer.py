@@ -0,0 +1,313 @@
+# face_recognition/sharded_recognizer.py
+"""
+Scatter-gather matching over a gallery split across worker processes
+
+The gallery's primary encodings (the ones match_faces compares against)
+are partitioned into N shard files of float64 rows. Each shard is scanned
+by its own local worker process, which memory-maps the file, so the scans
+run in parallel on separate cores and the page cache holds one copy of the
+data no matter how often it is re-mapped. A probe batch is broadcast to
+every worker; each returns its per-probe top-k, and the results are merged
+into the same FaceMatch list FaceRecognizer.match_faces returns. Distances
+are computed exactly like FaceRecognizer does (norm of the difference, in
+float64), so decisions right at the tolerance come out the same.
+
+One probe batch is in flight at a time: the workers are shared, so
+concurrent match_faces calls queue up behind each other. Callers with many
+faces should pass them in one batch rather than one call per face.
+
+New people go to the smallest shard, so shards stay within one person of
+each other, and only the shards that changed are rewritten (as a new file
+generation) before the next match. A gallery snapshot of a new lineage (a
+snapshot store commit or poll, load_database, condense) is compared with
+the partitioned one: if it starts with the same people in the same order,
+only shards with changed rows are rewritten and new people are appended as
+usual. Otherwise the gallery is re-partitioned.
+
+Usage:
+    with ShardedFaceRecognizer(workers=4) as recognizer:
+        recognizer.load_database('models/face_database.pkl')
+        faces, _ = recognizer.recognize_faces('group.jpg')
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from face_recognition.face_match import FaceMatch
+from face_recognition.face_recognizer import FaceRecognizer
+from logging_setup import ItemLog
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SIZE = 128
+
+
+def _shard_worker(connection):
+    """
+    Worker process loop: match probe batches against one memory-mapped shard
+
+    Requests are (shard path, rows, probes, k, full); the reply is
+    (distances, row indices) of the k closest rows per probe, or every
+    distance when full is set.
+    """
+    path, shard = None, None
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        shard_path, rows, probes, k, full = request
+        try:
+            if shard_path != path:
+                # A new generation of the shard was published: re-map it
+                shard = np.memmap(shard_path, dtype=np.float64, mode='r',
+                                  shape=(rows, ENCODING_SIZE)) if rows else np.empty((0, ENCODING_SIZE))
+                path = shard_path
+
+            if rows == 0:
+                connection.send((np.empty((len(probes), 0)), np.empty((len(probes), 0), np.int64)))
+                continue
+
+            # Same computation as FaceRecognizer.match_faces (the expanded |a|²+|b|²-2ab form
+            # loses ~1e-3 to cancellation near zero, enough to flip a match at the tolerance)
+            distances = np.stack([np.linalg.norm(shard - probe, axis=1) for probe in probes])
+            if full or k >= rows:
+                connection.send((distances, np.broadcast_to(np.arange(rows), distances.shape).copy()))
+            else:
+                closest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                connection.send((np.take_along_axis(distances, closest, axis=1), closest))
+        except Exception as e:
+            connection.send(e)
+
+
+class ShardedFaceRecognizer(FaceRecognizer):
+    def __init__(self, tolerance=0.6, workers=4, shard_dir=None, **kwargs):
+        """
+        Initialize the sharded recognizer (worker processes start on the first match)
+
+        Args:
+            tolerance (float): Same as FaceRecognizer
+            workers (int): Number of shards / worker processes
+            shard_dir (str): Where shard files are written (default: a temporary directory)
+            **kwargs: Passed on to FaceRecognizer
+        """
+        super().__init__(tolerance=tolerance, **kwargs)
+        self.workers = workers
+        self._own_shard_dir = shard_dir is None
+        self.shard_dir = shard_dir or tempfile.mkdtemp(prefix='face_shards_')
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._processes = []
+        self._connections = []
+        self._generation = 0
+        # Gallery index -> shard, and per shard the gallery indices of its rows
+        self._shard_of = []
+        self._members = [[] for _ in range(workers)]
+        self._dirty = set(range(workers))
+        self._published = [(None, 0)] * workers
+        self._stale_files = []
+        self._partitioned_gallery = None
+
+    # Gallery updates
+
+    def add_person_encodings(self, person_name, person_encodings):
+        super().add_person_encodings(person_name, person_encodings)
+        self._mark_changed(person_name)
+
+    def extend_person(self, person_name, person_encodings):
+        super().extend_person(person_name, person_encodings)
+        self._mark_changed(person_name)
+
+    def _mark_changed(self, person_name):
+        index = self.gallery.index_of(person_name)
+        with self._lock:
+            if 0 <= index < len(self._shard_of):
+                # Replaced in place: that shard's file is out of date
+                self._dirty.add(self._shard_of[index])
+
+    def rebalance(self, gallery=None):
+        """Re-partition the whole gallery into equal contiguous shards"""
+        gallery = gallery if gallery is not None else self.gallery
+        size = len(gallery)
+        bounds = np.linspace(0, size, self.workers + 1).astype(int)
+        self._members = [list(range(bounds[i], bounds[i + 1])) for i in range(self.workers)]
+        self._shard_of = [0] * size
+        for shard, members in enumerate(self._members):
+            for index in members:
+                self._shard_of[index] = shard
+        self._dirty = set(range(self.workers))
+        self._partitioned_gallery = gallery
+
+    def _sync_partition(self, gallery):
+        """Bring the shard assignment in line with a gallery snapshot"""
+        previous = self._partitioned_gallery
+        size = len(gallery)
+        if previous is None or size < len(self._shard_of):
+            self.rebalance(gallery)
+            return
+
+        if gallery.lineage is not previous.lineage:
+            # Reloaded, usually by the snapshot store: the same people plus a few new ones
+            known = len(self._shard_of)
+            if gallery.names[:known] != previous.names[:known]:
+                self.rebalance(gallery)
+                return
+            changed = np.any(gallery.encodings[:known] != previous.encodings[:known], axis=1)
+            for index in np.nonzero(changed)[0]:
+                self._dirty.add(self._shard_of[index])
+
+        # People added since the last match go to the smallest shards
+        for index in range(len(self._shard_of), size):
+            shard = min(range(self.workers), key=lambda s: len(self._members[s]))
+            self._members[shard].append(index)
+            self._shard_of.append(shard)
+            self._dirty.add(shard)
+        self._partitioned_gallery = gallery
+
+    def _publish(self, gallery):
+        """Write a new generation of every changed shard"""
+        if not self._dirty:
+            return
+        self._generation += 1
+        encodings = gallery.encodings
+        for shard in sorted(self._dirty):
+            members = self._members[shard]
+            path = os.path.join(self.shard_dir, f"shard_{shard}.g{self._generation}.f64")
+            rows = encodings[np.asarray(members, dtype=np.int64)].astype(np.float64).reshape(-1, ENCODING_SIZE)
+            with open(path, 'wb') as f:
+                f.write(rows.tobytes())
+            if self._published[shard][0]:
+                self._stale_files.append(self._published[shard][0])
+            self._published[shard] = (path, len(members))
+        logger.debug("🧩 Published shard generation %d (%d shard(s) rewritten)", self._generation, len(self._dirty))
+        self._dirty = set()
+
+    # Worker processes
+
+    def _start_workers(self):
+        context = multiprocessing.get_context('spawn')
+        for shard in range(self.workers):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_end,),
+                                      name=f"gallery-shard-{shard}", daemon=True)
+            process.start()
+            child_end.close()
+            self._processes.append(process)
+            self._connections.append(parent_end)
+        logger.info("🧩 Started %d gallery shard worker(s)", self.workers)
+
+    def close(self):
+        """Stop the worker processes and remove a temporary shard directory"""
+        with self._lock:
+            for connection in self._connections:
+                try:
+                    connection.send(None)
+                    connection.close()
+                except OSError:
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+            self._processes, self._connections = [], []
+            if self._own_shard_dir:
+                shutil.rmtree(self.shard_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _scatter(self, probes, k, full):
+        """
+        Send a probe batch to every shard and collect the replies
+
+        Returns:
+            tuple: (gallery snapshot the shards hold, list of (distances, gallery indices) per shard)
+        """
+        # Held for the whole round trip: the pipes carry one batch at a time
+        with self._lock:
+            gallery = self.gallery
+            self._sync_partition(gallery)
+            self._publish(gallery)
+            if not self._processes:
+                self._start_workers()
+
+            for connection, (path, rows) in zip(self._connections, self._published):
+                connection.send((path, rows, probes, k, full))
+            replies = [connection.recv() for connection in self._connections]
+            # Copied with the replies: a later rebalance replaces the member lists
+            members = [np.asarray(shard_members, dtype=np.int64) for shard_members in self._members]
+
+            # Every worker has moved past the older generations now
+            for path in self._stale_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._stale_files = []
+
+        results = []
+        for reply, shard_members in zip(replies, members):
+            if isinstance(reply, Exception):
+                raise reply
+            distances, rows = reply
+            results.append((distances, shard_members[rows] if len(shard_members) else rows))
+        return gallery, results
+
+    # Matching
+
+    def match_faces(self, face_encodings, face_locations, top_k=0, include_distances=False,
+                    include_encodings=False):
+        """Same as FaceRecognizer.match_faces, with the gallery scan spread over the shard workers"""
+        if len(face_encodings) == 0 or len(self.gallery) == 0:
+            return super().match_faces(face_encodings, face_locations, top_k, include_distances,
+                                       include_encodings)
+
+        probes = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        k = max(top_k, 1)
+        gallery, shards = self._scatter(probes, k, include_distances)
+        distances = np.concatenate([d for d, _ in shards], axis=1)
+        indices = np.concatenate([i for _, i in shards], axis=1)
+
+        recognized_faces = []
+        item_log = ItemLog(logger)
+        for i, (face_encoding, face_location) in enumerate(zip(face_encodings, face_locations)):
+            face_info = FaceMatch(i + 1, face_location)
+            if include_encodings:
+                face_info.encoding = face_encoding
+
+            order = np.argsort(distances[i])[:k]
+            best = order[0]
+            face_info.best_match_index = int(indices[i, best])
+            face_info.distance = float(distances[i, best])
+
+            if top_k:
+                face_info.top_k = [(gallery.name_at(int(indices[i, j])), float(distances[i, j]))
+                                   for j in order]
+            if include_distances:
+                full = np.empty(len(gallery))
+                full[indices[i]] = distances[i]
+                face_info.distances = full
+
+            if face_info.distance <= self.tolerance:
+                face_info.name = gallery.name_at(face_info.best_match_index)
+                face_info.recognized = True
+                item_log("   ✅ Face %d: Recognized as %s (confidence: %.2f)", i + 1, face_info.name,
+                         1 - face_info.distance)
+            else:
+                item_log("   ❌ Face %d: Unknown person", i + 1)
+
+            recognized_faces.append(face_info)
+
+        item_log.close()
+        return recognized_faces
@@ -0,0 +1,252 @@
+# face_recognition/snapshot_store.py
+"""
+Versioned gallery snapshot files shared by several worker processes
+
+Every published gallery is a directory v<version>/ of flat arrays
+(primary encodings, stacked samples with per-person offsets) plus
+names.json and meta.json. It is written under a temporary name, fsynced
+and renamed into place, and only then does the tiny CURRENT pointer file
+(also replaced by rename) move to it. A reader therefore sees either the
+old or the new version, never a half-written one.
+
+Workers poll CURRENT, a read of a few bytes, and memory-map a version only
+when the pointer changes, so N worker processes share one physical copy of
+the gallery through the page cache. Writers serialize on an flock'ed lock
+file, apply their change to the newest version and publish the result, so
+enrollments from different workers are never lost. Old versions are
+pruned; a worker still mapping one keeps reading it until it re-maps.
+
+Every version is a complete copy: each update rewrites and fsyncs all
+encodings and samples, so it costs time in the size of the gallery, not
+the change. Writers should batch changes (one update per enrollment job,
+not per image) rather than publishing every single encoding.
+
+Usage:
+    store = SnapshotStore('models/gallery')
+    recognizer = FaceRecognizer(snapshot_store=store, poll_interval=2.0)
+"""
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from face_recognition.gallery_snapshot import GallerySnapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one writing process is supported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SIZE = 128
+POINTER_NAME = 'CURRENT'
+
+
+def _fsync_directory(path):
+    # Makes a rename inside the directory durable (not supported on Windows)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _save_array(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Empty arrays can't be memory-mapped
+        return np.load(path)
+
+
+class SnapshotStore:
+    def __init__(self, store_dir, keep_versions=3):
+        """
+        Open (or create) a snapshot store
+
+        Args:
+            store_dir (str): Directory holding the versions and the CURRENT pointer
+            keep_versions (int): Published versions kept on disk
+        """
+        self.store_dir = store_dir
+        self.keep_versions = keep_versions
+        self._thread_lock = threading.Lock()
+
+    def _version_dir(self, version):
+        return os.path.join(self.store_dir, f"v{version:08d}")
+
+    def current_version(self):
+        """Version the pointer names, or None when nothing is published yet"""
+        try:
+            with open(os.path.join(self.store_dir, POINTER_NAME), 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def load(self, version=None):
+        """
+        Memory-map a published version (the current one by default)
+
+        Returns:
+            tuple: (GallerySnapshot, version, meta dict), or (None, None, {}) if the store is empty
+        """
+        for _ in range(3):
+            version = version if version is not None else self.current_version()
+            if version is None:
+                return None, None, {}
+            directory = self._version_dir(version)
+            try:
+                with open(os.path.join(directory, 'names.json'), 'r', encoding='utf-8') as f:
+                    names = json.load(f)
+                with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                encodings = _load_array(os.path.join(directory, 'encodings.npy'))
+                samples = _load_array(os.path.join(directory, 'samples.npy'))
+                offsets = np.load(os.path.join(directory, 'offsets.npy'))
+            except OSError:
+                # Pruned between reading the pointer and opening it: read the pointer again
+                version = None
+                continue
+            gallery = GallerySnapshot(names, encodings if len(names) else None, sample_rows=(samples, offsets))
+            return gallery, version, meta
+        raise OSError(f"Could not load a gallery version from {self.store_dir}")
+
+    @contextlib.contextmanager
+    def _publish_lock(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        with self._thread_lock, open(os.path.join(self.store_dir, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self, version):
+        try:
+            with open(os.path.join(self._version_dir(version), 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update(self, change, meta=None):
+        """
+        Apply a change to the newest version and publish the result
+
+        The whole gallery is rewritten, however small the change.
+
+        Args:
+            change: Function taking the newest GallerySnapshot (empty if none) and
+                    returning the new one
+            meta (dict): Extra fields stored in meta.json (e.g. tolerance)
+
+        Returns:
+            tuple: (published GallerySnapshot, memory-mapped, and its version)
+        """
+        with self._publish_lock():
+            base, version, base_meta = self.load()
+            gallery = change(base if base is not None else GallerySnapshot())
+            version = (version or 0) + 1
+            self._write_version(version, gallery, {**base_meta, **(meta or {})})
+            self._prune(version)
+        published, version, _ = self.load(version)
+        return published, version
+
+    def publish(self, gallery, meta=None):
+        """Publish a complete gallery as the next version"""
+        return self.update(lambda _: gallery, meta)
+
+    def publish_if_newer(self, load, modified):
+        """
+        Publish a gallery from an outside source unless the store has a newer version
+
+        The check and the publish happen under the store lock, so when several
+        workers start together only the first one publishes.
+
+        Args:
+            load: Function returning (GallerySnapshot, meta dict); only called to publish
+            modified (float): Time the source was last changed
+
+        Returns:
+            tuple: (published GallerySnapshot or None if the store was newer, current version)
+        """
+        with self._publish_lock():
+            version = self.current_version()
+            if version is not None and self._read_meta(version).get('published', 0) >= modified:
+                return None, version
+            gallery, meta = load()
+            version = (version or 0) + 1
+            self._write_version(version, gallery, meta)
+            self._prune(version)
+        published, version, _ = self.load(version)
+        return published, version
+
+    def _write_version(self, version, gallery, meta):
+        started = time.perf_counter()
+        names = list(gallery.names)
+        samples = [np.asarray(gallery.samples_of(name), dtype=np.float64).reshape(-1, ENCODING_SIZE)
+                   for name in names]
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(person) for person in samples])
+
+        # Leftovers of a publisher that crashed mid-write (we hold the lock, so nobody else is writing)
+        for entry in os.listdir(self.store_dir):
+            if entry.startswith('.tmp-'):
+                shutil.rmtree(os.path.join(self.store_dir, entry), ignore_errors=True)
+
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.store_dir)
+        _save_array(os.path.join(tmp_dir, 'encodings.npy'), np.asarray(gallery.encodings, dtype=np.float64))
+        _save_array(os.path.join(tmp_dir, 'samples.npy'),
+                    np.concatenate(samples) if samples else np.empty((0, ENCODING_SIZE)))
+        _save_array(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+        _write_file(os.path.join(tmp_dir, 'names.json'), json.dumps(names).encode('utf-8'))
+        _write_file(os.path.join(tmp_dir, 'meta.json'),
+                    json.dumps({**meta, 'version': version, 'people': len(names),
+                                'published': round(time.time(), 3)}).encode('utf-8'))
+        _fsync_directory(tmp_dir)
+
+        os.rename(tmp_dir, self._version_dir(version))
+        _fsync_directory(self.store_dir)
+
+        # Move the pointer last: readers only ever see complete versions
+        pointer_tmp = os.path.join(self.store_dir, f".{POINTER_NAME}.tmp")
+        _write_file(pointer_tmp, f"{version}\n".encode('ascii'))
+        os.replace(pointer_tmp, os.path.join(self.store_dir, POINTER_NAME))
+        _fsync_directory(self.store_dir)
+
+        logger.info("📦 Gallery version %d published (%d people) in %.0f ms", version, len(names),
+                    (time.perf_counter() - started) * 1000, extra={'version': version, 'people': len(names)})
+
+    def _prune(self, current):
+        for entry in os.listdir(self.store_dir):
+            if entry.startswith('v') and entry[1:].isdigit() and int(entry[1:]) <= current - self.keep_versions:
+                # Workers that still map it keep their open pages (POSIX unlink semantics)
+                shutil.rmtree(os.path.join(self.store_dir, entry), ignore_errors=True)
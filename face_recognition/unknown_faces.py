@@ -0,0 +1,224 @@
+# face_recognition/unknown_faces.py
+"""
+Append-only store of unrecognized face encodings
+
+Encodings are appended as raw float32 rows to one binary file and their
+metadata (row, source image, box, time) as lines of a JSON-lines file, so
+adding a face is two small appends and the whole store can be memory-mapped for
+clustering without loading it.
+
+Appends from several processes are serialized with an flock'ed lock file.
+When the store grows past max_faces, the oldest faces are dropped on a
+background thread (never on the request that crossed the limit): the newest
+half is copied into fresh files without holding the lock, faces appended
+meanwhile are added under the lock, and the files are swapped in. The
+store's generation number goes up, which tells the clusterer its row-based
+state is stale.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one writing process is supported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SIZE = 128
+
+
+class UnknownFaceStore:
+    def __init__(self, store_dir, max_faces=200000):
+        """
+        Initialize the store
+
+        Args:
+            store_dir (str): Directory holding encodings.f32 and faces.jsonl
+            max_faces (int): Faces kept before the oldest half is dropped (None: no limit);
+                             the store may briefly run over it while trimming
+        """
+        self.store_dir = store_dir
+        self.max_faces = max_faces
+        self.encodings_path = os.path.join(store_dir, 'encodings.f32')
+        self.metadata_path = os.path.join(store_dir, 'faces.jsonl')
+        self.generation_path = os.path.join(store_dir, 'generation')
+        self._lock = threading.Lock()
+        self._trimming = False
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.store_dir, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def add(self, encodings, image_path=None, locations=None):
+        """
+        Append unknown faces
+
+        Args:
+            encodings: Face encodings (128-d each)
+            image_path (str): Image the faces were found in
+            locations: (top, right, bottom, left) per encoding
+
+        Returns:
+            int: Number of faces stored
+        """
+        if len(encodings) == 0:
+            return 0
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        locations = locations if locations is not None else [None] * len(rows)
+        now = time.time()
+
+        with self._write_lock():
+            with open(self.encodings_path, 'ab') as f:
+                # Drop a partial row left by an interrupted write
+                row_bytes = 4 * ENCODING_SIZE
+                first_row = f.tell() // row_bytes
+                if f.tell() % row_bytes:
+                    f.truncate(first_row * row_bytes)
+                f.write(rows.tobytes())
+
+            # Rows carry their index, so a lost metadata line never shifts the others
+            with open(self.metadata_path, 'a') as f:
+                f.write(''.join(json.dumps({'row': first_row + i,
+                                            'image': image_path,
+                                            'location': [int(v) for v in location] if location is not None else None,
+                                            'time': round(now, 3)}) + '\n'
+                                for i, location in enumerate(locations)))
+            over_limit = self.max_faces is not None and self.count() > self.max_faces
+
+        if over_limit:
+            self._start_trim()
+        return len(rows)
+
+    def _start_trim(self):
+        """Drop the oldest faces on a background thread (one at a time per process)"""
+        with self._lock:
+            if self._trimming:
+                return
+            self._trimming = True
+        threading.Thread(target=self._trim, name='unknown-faces-trim', daemon=True).start()
+
+    def _trim(self):
+        try:
+            # Faces appended during a trim can push the store over the limit again
+            while self.count() > self.max_faces:
+                self._drop_oldest(self.max_faces // 2)
+        except Exception as e:
+            logger.error("❌ Could not trim the unknown face store: %s", e)
+        finally:
+            with self._lock:
+                self._trimming = False
+
+    @staticmethod
+    def _write_rows(encodings_file, metadata_file, rows, entries, first_row):
+        """Append encodings and their metadata, renumbered from first_row"""
+        encodings_file.write(np.ascontiguousarray(rows).tobytes())
+        for offset, entry in enumerate(entries):
+            if entry is not None:
+                metadata_file.write(json.dumps({**entry, 'row': first_row + offset}) + '\n')
+
+    def _drop_oldest(self, keep):
+        """Keep only the newest faces, renumbering their rows"""
+        # Rows below count are complete (metadata included) once the lock is released
+        with self._write_lock():
+            count = self.count()
+            generation = self.generation()
+            if self.max_faces is not None and count <= self.max_faces:
+                return
+        first = max(0, count - keep)
+
+        # The bulk copy runs without the lock: appends keep going meanwhile
+        fd, encodings_tmp = tempfile.mkstemp(suffix='.tmp', dir=self.store_dir)
+        fd_metadata, metadata_tmp = tempfile.mkstemp(suffix='.tmp', dir=self.store_dir)
+        try:
+            with os.fdopen(fd, 'wb') as encodings_file, os.fdopen(fd_metadata, 'w') as metadata_file:
+                self._write_rows(encodings_file, metadata_file, self.encodings()[first:count],
+                                 self.metadata(range(first, count)), 0)
+
+                with self._write_lock():
+                    if self.generation() != generation:
+                        # Another process trimmed the store first
+                        return
+                    end = self.count()
+                    self._write_rows(encodings_file, metadata_file, self.encodings()[count:end],
+                                     self.metadata(range(count, end)), count - first)
+                    encodings_file.close()
+                    metadata_file.close()
+                    os.replace(encodings_tmp, self.encodings_path)
+                    os.replace(metadata_tmp, self.metadata_path)
+                    with open(self.generation_path, 'w') as f:
+                        f.write(f"{generation + 1}\n")
+        finally:
+            for path in (encodings_tmp, metadata_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+        logger.info("🧹 Unknown face store full: dropped the %d oldest face(s), kept %d", first, end - first,
+                    extra={'dropped': first, 'kept': end - first})
+
+    def generation(self):
+        """Bumped whenever old faces are dropped and rows are renumbered"""
+        try:
+            with open(self.generation_path, 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0
+
+    def add_unknown(self, recognized_faces, image_path=None):
+        """Store the unrecognized faces of a recognize_faces result (needs include_encodings)"""
+        unknown = [face for face in recognized_faces if not face.recognized and face.encoding is not None]
+        return self.add([face.encoding for face in unknown], image_path,
+                        [face.location for face in unknown])
+
+    def count(self):
+        """Number of complete faces in the store"""
+        try:
+            return os.path.getsize(self.encodings_path) // (4 * ENCODING_SIZE)
+        except OSError:
+            return 0
+
+    def encodings(self):
+        """All stored encodings as a read-only (count, 128) float32 memory map"""
+        count = self.count()
+        if count == 0:
+            return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        return np.memmap(self.encodings_path, dtype=np.float32, mode='r', shape=(count, ENCODING_SIZE))
+
+    def metadata(self, indices=None):
+        """
+        Metadata dicts of the stored faces
+
+        Args:
+            indices: Only return these rows (all rows when None)
+        """
+        wanted = set(int(i) for i in indices) if indices is not None else None
+        result = {}
+        try:
+            with open(self.metadata_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if wanted is None or entry['row'] in wanted:
+                        result[entry['row']] = entry
+        except OSError:
+            pass
+        if indices is None:
+            return [result.get(i) for i in range(self.count())]
+        return [result.get(int(i)) for i in indices]
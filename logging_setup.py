@@ -0,0 +1,152 @@
+# logging_setup.py
+"""
+Leveled, queue-based logging for the library and the web app
+
+Log calls only put the record on an in-process queue; a single listener
+thread formats and writes it, so a slow terminal never stalls detection
+and output from concurrent requests doesn't interleave mid-line. Per-item
+detail (one line per face or per file) is logged at DEBUG and capped per
+batch with ItemLog, while each batch gets one INFO summary. With DEBUG
+disabled, per-item calls cost a level check and nothing else.
+
+A forked child (e.g. a ProcessPoolExecutor worker) inherits the queue
+handler but not the listener thread, so after a fork the child writes
+its records directly to the output instead.
+
+Usage:
+    configure_logging('INFO')             # text lines on stdout
+    configure_logging('DEBUG', 'json')    # one JSON object per line
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_output = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including the fields passed with extra="""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items()
+                      if key not in _STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread
+
+    The stock QueueHandler formats the message in the calling thread so the
+    record can be pickled; our queue never leaves the process, so the
+    record is passed through untouched.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level='INFO', log_format='text', stream=None):
+    """
+    Route all logging through a queue to one background writer
+
+    Safe to call more than once; later calls only change the level.
+
+    Args:
+        level (str): Minimum level, e.g. 'DEBUG' for per-face detail
+        log_format (str): 'text' for plain lines, 'json' for structured output
+        stream: Where records are written (defaults to stdout)
+    """
+    global _listener, _queue_handler, _output
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    with _lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if log_format == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(message)s'))
+
+        records = queue.SimpleQueue()
+        _output = output
+        _queue_handler = _DeferredQueueHandler(records)
+        root.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        # Flush whatever is still queued when the interpreter exits
+        atexit.register(_listener.stop)
+
+
+def _write_directly_after_fork():
+    """In a forked child: no listener thread exists, so bypass the queue"""
+    if _queue_handler is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    root.addHandler(_output)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_write_directly_after_fork)
+
+
+class ItemLog:
+    """
+    Per-item DEBUG lines for one batch, capped at a fixed number
+
+    Usage:
+        with ItemLog(logger, limit=20) as item_log:
+            for face in faces:
+                item_log("   ✅ Face %d: %s", number, name)
+
+    or call close() at the end of the batch instead of using with.
+    """
+
+    def __init__(self, logger, limit=20):
+        self.logger = logger
+        self.limit = limit
+        self.enabled = logger.isEnabledFor(logging.DEBUG)
+        self.count = 0
+
+    def __call__(self, message, *args):
+        if not self.enabled:
+            return
+        self.count += 1
+        if self.count <= self.limit:
+            self.logger.debug(message, *args)
+
+    def close(self):
+        """Log how many lines were left out"""
+        if self.count > self.limit:
+            self.logger.debug("   ... %d more", self.count - self.limit)
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -8,6 +8,7 @@ import os
 sys.path.append('..')
 
 from face_detection.face_detector import FaceDetector
+from logging_setup import configure_logging
 import cv2
 import matplotlib.pyplot as plt
 
@@ -89,5 +90,6 @@ def compare_detection_models():
         print("   ⚠️  Models detected different number of faces!")
 
 if __name__ == "__main__":
+    configure_logging('DEBUG')
     test_with_sample_images()
     compare_detection_models()
\ No newline at end of file
@@ -8,6 +8,7 @@ import os
 sys.path.append('..')
 
 from face_recognition.face_recognizer import FaceRecognizer
+from logging_setup import configure_logging
 import matplotlib.pyplot as plt
 
 def test_face_recognition():
@@ -74,12 +75,14 @@ def test_face_recognition():
             # Print detailed results
             print("\n📊 DETAILED RESULTS:")
             for face in recognized_faces:
-                if face['recognized']:
-                    print(f"   ✅ Face {face['face_number']}: {face['name']} "
-                          f"(Confidence: {face['confidence']:.2f}, Distance: {face['distance']:.2f})")
+                if face.recognized:
+                    print(f"   ✅ Face {face.face_number}: {face.name} "
+                          f"(Confidence: {face.confidence:.2f}, Distance: {face.distance:.2f})")
+                elif face.distance is not None:
+                    print(f"   ❌ Face {face.face_number}: Unknown "
+                          f"(Min Distance: {face.distance:.2f})")
                 else:
-                    print(f"   ❌ Face {face['face_number']}: Unknown "
-                          f"(Min Distance: {min(face['distances']):.2f})")
+                    print(f"   ❌ Face {face.face_number}: Unknown (no known faces)")
         else:
             print("❌ No faces detected or recognized")
     
@@ -109,5 +112,6 @@ def add_new_person_demo():
     recognizer.list_known_people()
 
 if __name__ == "__main__":
+    configure_logging('DEBUG')
     test_face_recognition()
     add_new_person_demo()
\ No newline at end of file
@@ -0,0 +1,376 @@
+# photo_library/photo_indexer.py
+"""
+Photo library face index with "find all photos of X" search
+
+Every image of a directory tree is decoded, detected and encoded once, in
+parallel worker processes, and the faces are appended to a compact
+on-disk index:
+
+    encodings.f32   float32 rows, 128 per face
+    faces.i32       int32 rows per face: image id, top, right, bottom, left
+    images.jsonl    one line per indexed image (path, size, mtime, faces)
+
+An image line is only written after its face rows, so images.jsonl is the
+commit log: an interrupted run truncates the face files back to what it
+lists and resumes with the images that are missing (or changed) since.
+Images deleted from the directory get a 'deleted' line, which hides their
+faces from searches (the face rows themselves stay in the files).
+Queries memory-map the index and scan it in blocks, so searching a
+million faces takes a fraction of a second and no re-detection.
+
+Usage:
+    python -m photo_library.photo_indexer index ~/Pictures --index models/photo_index
+    python -m photo_library.photo_indexer search --person Alice
+    python -m photo_library.photo_indexer search --example someone.jpg --limit 50
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SIZE = 128
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Per-worker settings, set up once by _init_worker
+_worker_options = None
+
+
+def _init_worker(model, number_of_times_to_upsample, max_side):
+    global _worker_options
+    _worker_options = {'model': model, 'upsample': number_of_times_to_upsample, 'max_side': max_side}
+
+
+def _index_image(path):
+    """
+    Detect and encode the faces of one image (runs in a worker process)
+
+    Returns:
+        tuple: (path, locations in original pixels, float32 encodings, error)
+    """
+    import face_recognition
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            max_side = _worker_options['max_side']
+            if max_side and max(width, height) > max_side:
+                # JPEG draft mode decodes straight at a reduced size
+                image.draft('RGB', (max_side, max_side))
+                image.thumbnail((max_side, max_side))
+            pixels = np.asarray(image.convert('RGB'))
+
+        scale = width / float(pixels.shape[1])
+        locations = face_recognition.face_locations(pixels, number_of_times_to_upsample=_worker_options['upsample'],
+                                                    model=_worker_options['model'])
+        encodings = face_recognition.face_encodings(pixels, locations) if locations else []
+        locations = [tuple(int(round(v * scale)) for v in location) for location in locations]
+        return path, locations, np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE), None
+    except Exception as e:
+        return path, [], np.empty((0, ENCODING_SIZE), dtype=np.float32), str(e)
+
+
+def list_images(root_dir):
+    """All image files below a directory, in a stable order"""
+    paths = []
+    for directory, _, files in os.walk(root_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.abspath(os.path.join(directory, name)))
+    return sorted(paths)
+
+
+class PhotoLibraryIndex:
+    def __init__(self, index_dir):
+        """
+        Open (or create) a photo library index
+
+        Args:
+            index_dir (str): Directory holding the index files
+        """
+        self.index_dir = index_dir
+        self.encodings_path = os.path.join(index_dir, 'encodings.f32')
+        self.faces_path = os.path.join(index_dir, 'faces.i32')
+        self.images_path = os.path.join(index_dir, 'images.jsonl')
+
+    # Writing
+
+    def _committed_images(self):
+        """Image records from the commit log, in order"""
+        images = []
+        try:
+            with open(self.images_path, 'r') as f:
+                for line in f:
+                    try:
+                        images.append(json.loads(line))
+                    except ValueError:
+                        # Torn last line of an interrupted run
+                        break
+        except OSError:
+            pass
+        return images
+
+    def _recover(self, images):
+        """Cut the face files back to the rows the commit log accounts for"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        face_count = sum(image['faces'] for image in images)
+        for path, row_bytes in ((self.encodings_path, 4 * ENCODING_SIZE), (self.faces_path, 4 * 5)):
+            with open(path, 'ab') as f:
+                if f.tell() != face_count * row_bytes:
+                    f.truncate(face_count * row_bytes)
+
+        # Rewrite the log without a torn last line, never leaving a half-written log behind
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.index_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(''.join(json.dumps(image) + '\n' for image in images))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.images_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def build(self, root_dir, workers=None, model='hog', number_of_times_to_upsample=1,
+              max_side=1600, checkpoint_every=50):
+        """
+        Index every image below root_dir that isn't indexed yet
+
+        Args:
+            root_dir (str): Photo directory
+            workers (int): Worker processes (defaults to the number of CPUs)
+            model (str): 'hog' or 'cnn'
+            number_of_times_to_upsample (int): Upsampling passes (finds smaller faces)
+            max_side (int): Images are decoded at most this large (0: full size)
+            checkpoint_every (int): Images per flush of the commit log
+
+        Returns:
+            dict: Counts of indexed, skipped, removed and failed images and throughput
+        """
+        images = self._committed_images()
+        self._recover(images)
+
+        done = {}
+        for image in images:
+            if image.get('deleted'):
+                done.pop(image['path'], None)
+            else:
+                done[image['path']] = (image['size'], image['mtime'])
+
+        pending = []
+        found = set()
+        for path in list_images(root_dir):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.add(path)
+            if done.get(path) != (stat.st_size, stat.st_mtime):
+                pending.append((path, stat.st_size, stat.st_mtime))
+
+        root = os.path.join(os.path.abspath(root_dir), '')
+        removed = [path for path in done if path.startswith(root) and path not in found]
+        next_image_id = images[-1]['image_id'] + 1 if images else 0
+        if removed:
+            # Searches only use the latest line of a path: this one has no faces
+            with open(self.images_path, 'a') as images_file:
+                for path in removed:
+                    images_file.write(json.dumps({'image_id': next_image_id, 'path': path, 'size': None,
+                                                  'mtime': None, 'faces': 0, 'error': None,
+                                                  'deleted': True}) + '\n')
+                    next_image_id += 1
+
+        logger.info("📚 Indexing %s: %d new or changed image(s), %d already indexed, %d removed", root_dir,
+                    len(pending), len(done) - len(removed), len(removed),
+                    extra={'pending': len(pending), 'removed': len(removed)})
+        stats = {'indexed': 0, 'faces': 0, 'failed': 0, 'skipped': len(done) - len(removed),
+                 'removed': len(removed)}
+        if not pending:
+            return stats
+
+        started = time.monotonic()
+        workers = workers or os.cpu_count() or 1
+        info = {path: (size, mtime) for path, size, mtime in pending}
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model, number_of_times_to_upsample, max_side)) as executor, \
+                open(self.encodings_path, 'ab') as encodings_file, \
+                open(self.faces_path, 'ab') as faces_file, \
+                open(self.images_path, 'a') as images_file:
+
+            log_lines = []
+            results = executor.map(_index_image, [path for path, _, _ in pending], chunksize=4)
+            for count, (path, locations, encodings, error) in enumerate(results, start=1):
+                size, mtime = info[path]
+                if error:
+                    stats['failed'] += 1
+                    logger.warning("   ❌ %s: %s", os.path.basename(path), error, extra={'path': path})
+
+                rows = np.array([[next_image_id] + list(location) for location in locations],
+                                dtype=np.int32).reshape(-1, 5)
+                encodings_file.write(encodings.tobytes())
+                faces_file.write(rows.tobytes())
+                log_lines.append(json.dumps({'image_id': next_image_id, 'path': path, 'size': size,
+                                             'mtime': mtime, 'faces': len(locations), 'error': error}) + '\n')
+                next_image_id += 1
+                stats['indexed'] += 1
+                stats['faces'] += len(locations)
+
+                if count % checkpoint_every == 0 or count == len(pending):
+                    # Face rows reach the disk before the log lines that commit them
+                    encodings_file.flush()
+                    faces_file.flush()
+                    os.fsync(encodings_file.fileno())
+                    os.fsync(faces_file.fileno())
+                    images_file.write(''.join(log_lines))
+                    images_file.flush()
+                    log_lines = []
+
+                    elapsed = time.monotonic() - started
+                    logger.info("   ✅ %d/%d image(s), %d face(s), %.1f images/s", count, len(pending),
+                                stats['faces'], count / elapsed,
+                                extra={'indexed': count, 'faces': stats['faces']})
+
+        stats['images_per_second'] = round(stats['indexed'] / (time.monotonic() - started), 2)
+        return stats
+
+    # Searching
+
+    def _load(self):
+        images = self._committed_images()
+        face_count = sum(image['faces'] for image in images)
+        if face_count == 0:
+            return images, np.empty((0, ENCODING_SIZE), np.float32), np.empty((0, 5), np.int32)
+        encodings = np.memmap(self.encodings_path, dtype=np.float32, mode='r', shape=(face_count, ENCODING_SIZE))
+        faces = np.memmap(self.faces_path, dtype=np.int32, mode='r', shape=(face_count, 5))
+        return images, encodings, faces
+
+    def search(self, query_encodings, tolerance=0.6, limit=100, block_size=65536):
+        """
+        Images containing a face close to any of the query encodings
+
+        Args:
+            query_encodings: One or more 128-d encodings of the person
+            tolerance (float): Largest distance counted as a match
+            limit (int): Most images returned
+            block_size (int): Index rows compared at a time
+
+        Returns:
+            list: {path, distance, location} per image, closest first
+        """
+        images, encodings, faces = self._load()
+        queries = np.asarray(query_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) == 0 or len(queries) == 0:
+            return []
+
+        # Only the latest indexing of a path counts
+        latest = {}
+        for image in images:
+            latest[image['path']] = image['image_id']
+        by_id = {image['image_id']: image for image in images}
+        current = set(latest.values())
+
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        best = {}
+        for start in range(0, len(encodings), block_size):
+            block = np.asarray(encodings[start:start + block_size])
+            # |a - q|^2 = |a|^2 + |q|^2 - 2 a.q, closest query encoding per indexed face
+            squared = (np.einsum('ij,ij->i', block, block)[:, None] + query_norms[None, :]
+                       - 2.0 * block @ queries.T)
+            distances = np.sqrt(np.maximum(squared.min(axis=1), 0.0))
+            for row in np.nonzero(distances <= tolerance)[0]:
+                image_id, top, right, bottom, left = (int(v) for v in faces[start + row])
+                distance = float(distances[row])
+                if image_id in current and (image_id not in best or distance < best[image_id][0]):
+                    best[image_id] = (distance, (top, right, bottom, left))
+
+        ranked = sorted(best.items(), key=lambda item: item[1][0])[:limit]
+        return [{'path': by_id[image_id]['path'], 'distance': round(distance, 4), 'location': list(location)}
+                for image_id, (distance, location) in ranked]
+
+    def find_person(self, person_name, recognizer, tolerance=None, limit=100):
+        """Images of an enrolled person (all of their stored encodings are used)"""
+        encodings = recognizer.face_database.get(person_name)
+        if not encodings:
+            logger.error("❌ %s is not enrolled", person_name)
+            return []
+        return self.search(encodings, tolerance if tolerance is not None else recognizer.tolerance, limit)
+
+    def find_similar(self, example_path, tolerance=0.6, limit=100):
+        """Images showing the (largest) face of an example photo"""
+        import face_recognition
+
+        image = face_recognition.load_image_file(example_path)
+        locations = face_recognition.face_locations(image)
+        if not locations:
+            logger.error("❌ No face found in %s", os.path.basename(example_path))
+            return []
+        largest = max(locations, key=lambda b: (b[1] - b[3]) * (b[2] - b[0]))
+        return self.search(face_recognition.face_encodings(image, [largest]), tolerance, limit)
+
+    def stats(self):
+        latest = {}
+        for image in self._committed_images():
+            latest[image['path']] = image
+        current = [image for image in latest.values() if not image.get('deleted')]
+        return {'images': len(current), 'faces': sum(image['faces'] for image in current)}
+
+
+def main():
+    from config import MODELS_DIR
+
+    parser = argparse.ArgumentParser(description='Index a photo library and search it by person')
+    parser.add_argument('--index', default=os.path.join(MODELS_DIR, 'photo_index'), help='index directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', help='index (or update) a photo directory')
+    index_parser.add_argument('directory')
+    index_parser.add_argument('--workers', type=int, default=None)
+    index_parser.add_argument('--model', choices=['hog', 'cnn'], default='hog')
+    index_parser.add_argument('--upsample', type=int, default=1)
+    index_parser.add_argument('--max-side', type=int, default=1600)
+
+    search_parser = commands.add_parser('search', help='find photos of a person')
+    target = search_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--person', help='enrolled person name')
+    target.add_argument('--example', help='photo of the person')
+    search_parser.add_argument('--database', default=os.path.join(MODELS_DIR, 'face_database.pkl'))
+    search_parser.add_argument('--tolerance', type=float, default=None)
+    search_parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    configure_logging()
+    index = PhotoLibraryIndex(args.index)
+
+    if args.command == 'index':
+        stats = index.build(args.directory, workers=args.workers, model=args.model,
+                            number_of_times_to_upsample=args.upsample, max_side=args.max_side)
+        print(f"✅ {stats}")
+        return
+
+    started = time.perf_counter()
+    if args.person:
+        from face_recognition.face_recognizer import FaceRecognizer
+        recognizer = FaceRecognizer()
+        recognizer.load_database(args.database)
+        results = index.find_person(args.person, recognizer, args.tolerance, args.limit)
+    else:
+        results = index.find_similar(args.example, args.tolerance or 0.6, args.limit)
+
+    print(f"🔍 {len(results)} photo(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for result in results:
+        print(f"   {result['distance']:.3f}  {result['path']}")
+
+
+if __name__ == '__main__':
+    main()
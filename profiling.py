@@ -0,0 +1,191 @@
+# profiling.py
+"""
+Opt-in profiling of single requests
+
+Library entry points mark their stages with stage('detect') etc. That is a
+no-op unless a profiling session is active on the current thread, in which
+case the stage timings are recorded. A session (started per request by a
+header/query flag or by sampling) also runs cProfile when no other session
+holds it, and writes the stage trace, the hottest functions and the raw
+.prof file to a bounded on-disk ring buffer, so one pathological image can
+be examined without turning on global profiling.
+
+Usage:
+    recorder = ProfileRecorder('profiles', max_entries=50)
+    with recorder.session('recognize', force=True) as trace:
+        recognizer.recognize_faces('photo.jpg')
+    print(trace.profile_id)
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name):
+    """Time a named stage of the active trace (does nothing without one)"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, started, time.perf_counter())
+
+
+def annotate(**meta):
+    """Attach extra fields (image size, face count...) to the active trace"""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.meta.update(meta)
+
+
+class Trace:
+    __slots__ = ('profile_id', 'label', 'started_at', 'started', 'stages', 'meta', 'profiler')
+
+    def __init__(self, label):
+        now = datetime.now()
+        # Sortable ids, so the ring buffer can drop the oldest by name
+        self.profile_id = f"{now:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        self.label = label
+        self.started_at = now.isoformat(timespec='milliseconds')
+        self.started = time.perf_counter()
+        self.stages = []
+        self.meta = {}
+        self.profiler = None
+
+    def add_stage(self, name, started, ended):
+        self.stages.append({
+            'name': name,
+            'offset_ms': round((started - self.started) * 1000, 3),
+            'ms': round((ended - started) * 1000, 3)
+        })
+
+
+class ProfileRecorder:
+    def __init__(self, profile_dir, max_entries=50, sample_rate=0.0, use_cprofile=True, top_functions=30):
+        """
+        Initialize the profile recorder
+
+        Args:
+            profile_dir (str): Directory of the on-disk ring buffer
+            max_entries (int): Profiles kept; the oldest are deleted
+            sample_rate (float): Fraction of sessions profiled without being asked
+            use_cprofile (bool): Run cProfile as well as the stage trace
+            top_functions (int): Functions listed in the trace summary
+        """
+        self.profile_dir = profile_dir
+        self.max_entries = max_entries
+        self.sample_rate = sample_rate
+        self.use_cprofile = use_cprofile
+        self.top_functions = top_functions
+
+        # Only one cProfile can be active per process (Python 3.12+ enforces
+        # it), concurrent sessions fall back to the stage trace alone
+        self._cprofile_lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+
+    def should_profile(self, force=False):
+        """Profile when asked to, or for a random sample of sessions"""
+        return force or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def session(self, label, force=False):
+        """
+        Profile the enclosed block if requested or sampled
+
+        Yields:
+            Trace: The active trace, or None when this session isn't profiled
+        """
+        if not self.should_profile(force) or getattr(_local, 'trace', None) is not None:
+            yield None
+            return
+
+        trace = Trace(label)
+        if self.use_cprofile and self._cprofile_lock.acquire(blocking=False):
+            trace.profiler = cProfile.Profile()
+            try:
+                trace.profiler.enable()
+            except ValueError:
+                # Another profiler (a debugger, coverage...) is already active
+                trace.profiler = None
+                self._cprofile_lock.release()
+
+        _local.trace = trace
+        try:
+            yield trace
+        finally:
+            _local.trace = None
+            if trace.profiler is not None:
+                trace.profiler.disable()
+                self._cprofile_lock.release()
+            try:
+                self._write(trace, time.perf_counter() - trace.started)
+            except OSError as e:
+                logger.warning("⚠️  Could not save profile %s: %s", trace.profile_id, e,
+                               extra={'profile_id': trace.profile_id})
+
+    def _write(self, trace, elapsed):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base_path = os.path.join(self.profile_dir, trace.profile_id)
+
+        record = {
+            'id': trace.profile_id,
+            'label': trace.label,
+            'started_at': trace.started_at,
+            'total_ms': round(elapsed * 1000, 3),
+            'stages': trace.stages,
+            'meta': trace.meta,
+            'profile': None,
+            'top_functions': None
+        }
+
+        if trace.profiler is not None:
+            trace.profiler.dump_stats(f"{base_path}.prof")
+            summary = io.StringIO()
+            pstats.Stats(trace.profiler, stream=summary).sort_stats('cumulative').print_stats(self.top_functions)
+            record['profile'] = f"{trace.profile_id}.prof"
+            record['top_functions'] = summary.getvalue().splitlines()
+
+        tmp_path = f"{base_path}.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(tmp_path, f"{base_path}.json")
+
+        self._prune()
+
+    def _prune(self):
+        """Keep only the newest max_entries profiles"""
+        with self._prune_lock:
+            ids = sorted(name[:-len('.json')] for name in os.listdir(self.profile_dir)
+                         if name.endswith('.json'))
+            for profile_id in ids[:-self.max_entries] if self.max_entries else ids:
+                for extension in ('.json', '.prof'):
+                    try:
+                        os.remove(os.path.join(self.profile_dir, profile_id + extension))
+                    except FileNotFoundError:
+                        pass
+
+    def list_profiles(self):
+        """Ids of the stored profiles, newest first"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        return sorted((name[:-len('.json')] for name in os.listdir(self.profile_dir)
+                       if name.endswith('.json')), reverse=True)
@@ -0,0 +1,212 @@
+# video/face_tracker.py
+"""
+Lightweight multi-face tracker for video streams
+
+Carries identities between frames so a face only has to be encoded and
+matched against the gallery when its track is new, was lost and found
+again, or is due for a periodic refresh. Detections are associated with
+tracks by IoU, falling back to centroid distance for fast-moving faces.
+Between detection frames, boxes can optionally be moved with OpenCV
+correlation trackers.
+"""
+
+from collections import Counter, deque
+
+import cv2
+
+from face_detection.box_utils import box_iou
+
+
+def _centroid_distance(box_a, box_b):
+    """Centroid distance relative to the size of box_a"""
+    center_a = ((box_a[0] + box_a[2]) / 2.0, (box_a[1] + box_a[3]) / 2.0)
+    center_b = ((box_b[0] + box_b[2]) / 2.0, (box_b[1] + box_b[3]) / 2.0)
+    size = max(box_a[2] - box_a[0], box_a[1] - box_a[3], 1)
+    return ((center_a[0] - center_b[0]) ** 2 + (center_a[1] - center_b[1]) ** 2) ** 0.5 / size
+
+
+def _create_correlation_tracker():
+    """Best available OpenCV single-object tracker, or None"""
+    for factory in ('TrackerKCF_create', 'TrackerCSRT_create', 'TrackerMIL_create'):
+        if hasattr(cv2, factory):
+            return getattr(cv2, factory)()
+        legacy = getattr(cv2, 'legacy', None)
+        if legacy is not None and hasattr(legacy, factory):
+            return getattr(legacy, factory)()
+    return None
+
+
+class Track:
+    """State of a single tracked face"""
+
+    __slots__ = ('track_id', 'location', 'face_info', 'name_history', 'hits', 'missed',
+                 'last_encoded_frame', 'lost', 'correlation_tracker')
+
+    def __init__(self, track_id, location):
+        self.track_id = track_id
+        self.location = tuple(location)
+        self.face_info = None
+        self.name_history = deque(maxlen=5)
+        self.hits = 1
+        self.missed = 0
+        self.last_encoded_frame = None
+        self.lost = False
+        self.correlation_tracker = None
+
+    @property
+    def stable_name(self):
+        """Most frequent name among the recent matches of this track"""
+        if not self.name_history:
+            return None
+        return Counter(self.name_history).most_common(1)[0][0]
+
+
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_missed=10,
+                 refresh_interval=30, use_correlation=False):
+        """
+        Initialize the face tracker
+
+        Args:
+            iou_threshold (float): Minimum IoU to associate a detection with a track
+            max_centroid_distance (float): Fallback association when IoU is too low,
+                as a fraction of the track's box size
+            max_missed (int): Detection rounds a track may go unmatched before removal
+            refresh_interval (int): Re-encode a tracked face after this many frames
+            use_correlation (bool): Move boxes with OpenCV trackers between detections
+        """
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.refresh_interval = refresh_interval
+        self.use_correlation = use_correlation and _create_correlation_tracker() is not None
+
+        self.tracks = []
+        self._next_track_id = 1
+
+    def reset(self):
+        """Forget all tracks (e.g. when the video source is restarted)"""
+        self.tracks = []
+        self._next_track_id = 1
+
+    def update(self, face_locations, frame=None):
+        """
+        Associate a new set of detections with the existing tracks
+
+        Args:
+            face_locations: Detected face locations [(top, right, bottom, left)]
+            frame: BGR frame, needed only when correlation tracking is enabled
+
+        Returns:
+            list: Track for each detection, in the same order as face_locations
+        """
+        candidates = []
+        for track_index, track in enumerate(self.tracks):
+            for detection_index, location in enumerate(face_locations):
+                iou = box_iou(track.location, location)
+                if iou >= self.iou_threshold:
+                    candidates.append((1.0 + iou, track_index, detection_index))
+                else:
+                    distance = _centroid_distance(track.location, location)
+                    if distance <= self.max_centroid_distance:
+                        candidates.append((1.0 - distance, track_index, detection_index))
+
+        # Greedy assignment, best score first
+        candidates.sort(reverse=True)
+        assigned_tracks = set()
+        detection_tracks = [None] * len(face_locations)
+
+        for _, track_index, detection_index in candidates:
+            if track_index in assigned_tracks or detection_tracks[detection_index] is not None:
+                continue
+            assigned_tracks.add(track_index)
+
+            track = self.tracks[track_index]
+            track.location = tuple(face_locations[detection_index])
+            track.hits += 1
+            if track.missed > 0:
+                track.lost = True
+            track.missed = 0
+            detection_tracks[detection_index] = track
+
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in assigned_tracks:
+                track.missed += 1
+
+        for detection_index, location in enumerate(face_locations):
+            if detection_tracks[detection_index] is None:
+                track = Track(self._next_track_id, location)
+                self._next_track_id += 1
+                self.tracks.append(track)
+                detection_tracks[detection_index] = track
+
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        if self.use_correlation and frame is not None:
+            for track in detection_tracks:
+                self._start_correlation(track, frame)
+
+        return detection_tracks
+
+    def needs_encoding(self, track, frame_index):
+        """
+        Whether a track's face has to be encoded and matched again
+
+        True for new tracks, tracks that were lost and re-acquired, and
+        tracks whose last encoding is older than refresh_interval frames.
+        """
+        if track.face_info is None or track.lost:
+            return True
+        return frame_index - track.last_encoded_frame >= self.refresh_interval
+
+    def assign_identity(self, track, face_info, frame_index):
+        """Record a fresh recognition result for a track"""
+        track.name_history.append(face_info.name)
+        # A single noisy match doesn't rename an established track
+        if track.face_info is None or face_info.name == track.stable_name:
+            track.face_info = face_info
+        track.last_encoded_frame = frame_index
+        track.lost = False
+
+    def predict(self, frame):
+        """
+        Move track boxes to a new frame with the correlation trackers
+
+        Does nothing unless correlation tracking is enabled.
+        """
+        if not self.use_correlation:
+            return
+
+        for track in self.tracks:
+            if track.correlation_tracker is None or track.missed > 0:
+                continue
+            ok, (x, y, width, height) = track.correlation_tracker.update(frame)
+            if ok:
+                track.location = (int(y), int(x + width), int(y + height), int(x))
+
+    def _start_correlation(self, track, frame):
+        top, right, bottom, left = track.location
+        tracker = _create_correlation_tracker()
+        try:
+            tracker.init(frame, (int(left), int(top), int(right - left), int(bottom - top)))
+            track.correlation_tracker = tracker
+        except cv2.error:
+            track.correlation_tracker = None
+
+    def faces(self):
+        """
+        Recognition results for the currently visible tracks
+
+        Returns:
+            list: FaceMatch per visible track, with its current location,
+                  track_id and the result for the track's stable (majority) name
+        """
+        faces = []
+        for track in self.tracks:
+            if track.missed > 0 or track.face_info is None:
+                continue
+
+            faces.append(track.face_info.copy(face_number=len(faces) + 1,
+                                              location=track.location,
+                                              track_id=track.track_id))
+        return faces
@@ -0,0 +1,342 @@
+# video/multi_stream.py
+"""
+Pipelined face recognition across many video streams
+
+Each stream gets its own decode thread. Sampled frames from every stream are
+scheduled round-robin onto one shared process pool that runs detection,
+encoding and matching, so a busy camera can't starve the others. The
+gallery is written once to a .npy file that every worker memory-maps
+read-only, so N workers share one physical copy of it.
+
+Results come back per stream, in frame order, together with lag and drop
+counters.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set up once by _init_worker
+_worker_recognizer = None
+_worker_options = None
+
+
+def _init_worker(gallery_path, names, tolerance, model, number_of_times_to_upsample):
+    """Load the shared gallery in a worker process (memory-mapped, read-only)"""
+    global _worker_recognizer, _worker_options
+    from face_recognition.face_recognizer import FaceRecognizer
+    from face_recognition.gallery_snapshot import GallerySnapshot
+
+    recognizer = FaceRecognizer(tolerance=tolerance)
+    recognizer.gallery = GallerySnapshot(list(names), np.load(gallery_path, mmap_mode='r'))
+
+    _worker_recognizer = recognizer
+    _worker_options = {'model': model, 'number_of_times_to_upsample': number_of_times_to_upsample}
+
+
+def _recognize_in_worker(rgb_frame):
+    """Detect, encode and match faces on a (downscaled) RGB frame"""
+    import face_recognition
+
+    face_locations = face_recognition.face_locations(
+        rgb_frame,
+        number_of_times_to_upsample=_worker_options['number_of_times_to_upsample'],
+        model=_worker_options['model']
+    )
+    if not face_locations:
+        return []
+    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+    return _worker_recognizer.match_faces(face_encodings, face_locations)
+
+
+class _StreamState:
+    """Bookkeeping for one stream"""
+
+    def __init__(self, stream_id, source):
+        self.stream_id = stream_id
+        self.source = source
+        self.ready = deque()
+        self.in_flight = 0
+        self.next_seq = 0
+        self.next_emit_seq = 0
+        self.reorder_buffer = {}
+        self.finished = False
+        self.error = None
+        self.stats = {
+            'frames_read': 0,
+            'frames_submitted': 0,
+            'frames_dropped': 0,
+            'results': 0,
+            'last_lag': 0.0,
+            'max_lag': 0.0
+        }
+
+
+class MultiStreamProcessor:
+    def __init__(self, sources, recognizer, workers=None, every_n_frames=5, scale=0.25,
+                 max_pending_per_stream=4, drop_when_busy=True, model='hog',
+                 number_of_times_to_upsample=1):
+        """
+        Initialize the multi-stream processor
+
+        Args:
+            sources (dict): Stream id -> cv2.VideoCapture source (path, URL, device)
+            recognizer (FaceRecognizer): Recognizer whose gallery is shared with workers
+            workers (int): Worker processes (defaults to the number of CPUs)
+            every_n_frames (int): Process every Nth frame of each stream
+            scale (float): Frames are resized by this factor before detection
+            max_pending_per_stream (int): Sampled frames a stream may have queued
+                or in flight before new ones are dropped (or decoding waits)
+            drop_when_busy (bool): Drop frames when a stream is saturated (live
+                cameras); False makes decoding wait instead (recorded files)
+            model (str): 'hog' or 'cnn'
+            number_of_times_to_upsample (int): Upsampling passes for detection
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.every_n_frames = max(1, int(every_n_frames))
+        self.scale = scale
+        self.max_pending_per_stream = max_pending_per_stream
+        self.drop_when_busy = drop_when_busy
+        self.model = model
+        self.number_of_times_to_upsample = number_of_times_to_upsample
+
+        self.recognizer = recognizer
+        self.streams = {stream_id: _StreamState(stream_id, source) for stream_id, source in sources.items()}
+
+        self._lock = threading.Condition()
+        self._results = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._executor = None
+        self._gallery_dir = None
+        self._max_in_flight = self.workers * 2
+        self._in_flight = 0
+
+    def _write_gallery(self):
+        """Write the gallery once so workers can memory-map it"""
+        self._gallery_dir = tempfile.mkdtemp(prefix='face-gallery-')
+        gallery_path = os.path.join(self._gallery_dir, 'encodings.npy')
+        encodings = np.asarray(self.recognizer.known_face_encodings, dtype=np.float64)
+        np.save(gallery_path, encodings.reshape(-1, 128))
+        return gallery_path
+
+    def start(self):
+        """Start decode threads, the scheduler and the worker pool"""
+        gallery_path = self._write_gallery()
+        # Spawned, not forked: workers start on the first submit, when decode threads already run
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(gallery_path, list(self.recognizer.known_face_names), self.recognizer.tolerance,
+                      self.model, self.number_of_times_to_upsample)
+        )
+
+        for state in self.streams.values():
+            thread = threading.Thread(target=self._decode_loop, args=(state,),
+                                      name=f"decode-{state.stream_id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        scheduler = threading.Thread(target=self._schedule_loop, name='scheduler', daemon=True)
+        scheduler.start()
+        self._threads.append(scheduler)
+
+        logger.info("🎥 Processing %d stream(s) with %d worker(s)", len(self.streams), self.workers,
+                    extra={'streams': len(self.streams), 'workers': self.workers})
+
+    def stop(self):
+        """Stop all threads and the worker pool"""
+        self._stop_event.set()
+        with self._lock:
+            self._lock.notify_all()
+        # Wake up anyone still iterating results()
+        self._results.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._gallery_dir is not None:
+            shutil.rmtree(self._gallery_dir, ignore_errors=True)
+            self._gallery_dir = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _decode_loop(self, state):
+        capture = cv2.VideoCapture(state.source)
+        if not capture.isOpened():
+            logger.error("❌ Cannot open stream %s: %s", state.stream_id, state.source,
+                         extra={'stream_id': state.stream_id})
+        frame_index = 0
+
+        try:
+            while capture.isOpened() and not self._stop_event.is_set():
+                # grab() skips decoding for frames that won't be processed
+                if not capture.grab():
+                    break
+                state.stats['frames_read'] += 1
+
+                if frame_index % self.every_n_frames == 0:
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        self._enqueue(state, frame_index, frame)
+                frame_index += 1
+        finally:
+            capture.release()
+            with self._lock:
+                state.finished = True
+                self._lock.notify_all()
+
+    def _enqueue(self, state, frame_index, frame):
+        with self._lock:
+            while self._pending(state) >= self.max_pending_per_stream:
+                if self.drop_when_busy:
+                    state.stats['frames_dropped'] += 1
+                    return
+                self._lock.wait(0.1)
+                if self._stop_event.is_set():
+                    return
+
+            state.ready.append((state.next_seq, frame_index, time.monotonic(), frame))
+            state.next_seq += 1
+            self._lock.notify_all()
+
+    @staticmethod
+    def _pending(state):
+        return len(state.ready) + state.in_flight
+
+    def _schedule_loop(self):
+        """Round-robin ready frames from all streams onto the worker pool"""
+        stream_order = list(self.streams.values())
+        position = 0
+
+        while not self._stop_event.is_set():
+            with self._lock:
+                job = None
+                if self._in_flight < self._max_in_flight:
+                    for offset in range(len(stream_order)):
+                        state = stream_order[(position + offset) % len(stream_order)]
+                        if state.ready:
+                            job = (state, state.ready.popleft())
+                            position = (position + offset + 1) % len(stream_order)
+                            state.in_flight += 1
+                            self._in_flight += 1
+                            break
+
+                if job is None:
+                    if self._all_done():
+                        self._results.put(None)
+                        return
+                    self._lock.wait(0.1)
+                    continue
+
+            state, (seq, frame_index, captured_at, frame) = job
+            small_frame = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale) if self.scale != 1.0 else frame
+            rgb_frame = np.ascontiguousarray(small_frame[:, :, ::-1])
+
+            try:
+                future = self._executor.submit(_recognize_in_worker, rgb_frame)
+            except Exception as e:
+                # The pool is unusable (broken or shut down): end every stream instead of hanging results()
+                logger.error("❌ Cannot schedule frames of stream %s: %s", state.stream_id, e,
+                             extra={'stream_id': state.stream_id})
+                with self._lock:
+                    state.error = str(e)
+                    state.in_flight -= 1
+                    self._in_flight -= 1
+                self._stop_event.set()
+                self._results.put(None)
+                return
+            state.stats['frames_submitted'] += 1
+            future.add_done_callback(
+                lambda f, s=state, q=seq, i=frame_index, t=captured_at, fr=frame: self._complete(s, q, i, t, fr, f)
+            )
+
+    def _all_done(self):
+        return all(state.finished and not state.ready and state.in_flight == 0
+                   for state in self.streams.values())
+
+    def _complete(self, state, seq, frame_index, captured_at, frame, future):
+        """Collect a worker result and emit whatever is now in order"""
+        try:
+            faces = future.result()
+            error = None
+        except Exception as e:
+            faces = []
+            error = str(e)
+
+        for face_info in faces:
+            face_info.location = self._to_full_scale(face_info.location)
+
+        with self._lock:
+            state.in_flight -= 1
+            self._in_flight -= 1
+            state.reorder_buffer[seq] = {
+                'stream_id': state.stream_id,
+                'frame_index': frame_index,
+                'frame': frame,
+                'faces': faces,
+                'error': error,
+                'captured_at': captured_at
+            }
+
+            while state.next_emit_seq in state.reorder_buffer:
+                result = state.reorder_buffer.pop(state.next_emit_seq)
+                state.next_emit_seq += 1
+
+                lag = time.monotonic() - result['captured_at']
+                result['lag'] = lag
+                state.stats['results'] += 1
+                state.stats['last_lag'] = lag
+                state.stats['max_lag'] = max(state.stats['max_lag'], lag)
+                self._results.put(result)
+
+            self._lock.notify_all()
+
+    def _to_full_scale(self, location):
+        if self.scale == 1.0:
+            return tuple(location)
+        return tuple(int(round(v / self.scale)) for v in location)
+
+    def results(self, timeout=None):
+        """
+        Yield results as they complete, in frame order within each stream
+
+        Args:
+            timeout (float): Stop waiting after this many seconds without a result
+
+        Yields:
+            dict: stream_id, frame_index, frame, faces, lag (seconds), error
+        """
+        while True:
+            try:
+                result = self._results.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if result is None:
+                return
+            yield result
+
+    def stream_stats(self):
+        """Per-stream counters: frames read/submitted/dropped, results, lag, and the error that ended it"""
+        with self._lock:
+            return {stream_id: dict(state.stats, error=state.error) for stream_id, state in self.streams.items()}
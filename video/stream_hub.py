@@ -0,0 +1,211 @@
+# video/stream_hub.py
+"""
+Shared live pipeline behind the MJPEG streaming endpoint
+
+One capture + recognition thread runs per video source, no matter how many
+viewers are connected. Annotation and JPEG encoding happen on a separate
+thread and only ever work on the newest frame, and each viewer just waits
+for the next encoded frame. A slow viewer therefore skips frames instead of
+holding back recognition or the other viewers.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+from video.video_recognizer import VideoRecognizer
+
+logger = logging.getLogger(__name__)
+
+_BOUNDARY = b'frame'
+# Longest pause between two frames of a recorded file (timestamp jumps are not waited out)
+_MAX_FRAME_GAP = 1.0
+
+
+def annotate_frame(frame, faces):
+    """
+    Draw recognition results on a copy of a BGR frame
+
+    Args:
+        frame: numpy array image in OpenCV's BGR channel order
+        faces: List of face recognition results
+
+    Returns:
+        numpy array: Annotated copy of the frame
+    """
+    annotated = frame.copy()
+    for face_info in faces:
+        top, right, bottom, left = face_info.location
+        if face_info.recognized:
+            color = (0, 200, 0)
+            label = f"{face_info.name} ({face_info.confidence:.2f})"
+        else:
+            color = (0, 0, 220)
+            label = "Unknown"
+
+        cv2.rectangle(annotated, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(annotated, (left, bottom), (right, bottom + 22), color, cv2.FILLED)
+        cv2.putText(annotated, label, (left + 4, bottom + 16),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return annotated
+
+
+class StreamHub:
+    def __init__(self, source, recognizer, every_n_frames=5, scale=0.25,
+                 jpeg_quality=75, idle_timeout=30.0, tracker=None):
+        """
+        Initialize the stream hub
+
+        Args:
+            source: cv2.VideoCapture source (device index, file path or URL)
+            recognizer (FaceRecognizer): Recognizer holding the known faces
+            every_n_frames (int): Run detection on every Nth frame
+            scale (float): Frames are resized by this factor before detection
+            jpeg_quality (int): JPEG quality of the streamed frames
+            idle_timeout (float): Seconds without viewers before the pipeline stops
+            tracker (FaceTracker): Optional tracker passed to VideoRecognizer
+        """
+        self.source = source
+        # Only recorded files are paced: live sources deliver frames in real time
+        self.paced = isinstance(source, str) and os.path.isfile(source)
+        self.jpeg_quality = jpeg_quality
+        self.idle_timeout = idle_timeout
+        self.video_recognizer = VideoRecognizer(recognizer, every_n_frames=every_n_frames,
+                                                scale=scale, tracker=tracker)
+
+        self._condition = threading.Condition()
+        self._viewers = 0
+        self._last_viewer_left = time.monotonic()
+        self._running = False
+        # Incremented per start, so threads of a stopped run never act on a newer one
+        self._run_id = 0
+
+        # Newest captured frame (written by the capture thread)
+        self._latest = None
+        self._latest_seq = 0
+        # Newest encoded JPEG (written by the encoder thread)
+        self._jpeg = None
+        self._jpeg_seq = 0
+
+        self.stats = {'captured': 0, 'encoded': 0}
+
+    def _ensure_running(self):
+        """Start the capture and encoder threads if they aren't running (lock held)"""
+        if self._running:
+            return
+        self._running = True
+        self._run_id += 1
+        # Tracks from the previous run are stale (the previous run's thread no longer uses them)
+        if self.video_recognizer.tracker is not None:
+            self.video_recognizer.tracker.reset()
+        threading.Thread(target=self._capture_loop, args=(self._run_id,), name='stream-capture',
+                         daemon=True).start()
+        threading.Thread(target=self._encode_loop, args=(self._run_id,), name='stream-encode',
+                         daemon=True).start()
+        logger.info("🎥 Live stream started: %s", self.source, extra={'source': str(self.source)})
+
+    def _should_stop(self):
+        return (self._viewers == 0 and
+                time.monotonic() - self._last_viewer_left > self.idle_timeout)
+
+    def _is_current(self, run_id):
+        return self._running and self._run_id == run_id
+
+    def _capture_loop(self, run_id):
+        previous = None
+        try:
+            for result in self.video_recognizer.process(self.source):
+                if self.paced and previous is not None:
+                    # Recorded files would otherwise play as fast as they decode
+                    previous_timestamp, previous_shown = previous
+                    gap = min(max(result['timestamp'] - previous_timestamp, 0.0), _MAX_FRAME_GAP)
+                    delay = gap - (time.monotonic() - previous_shown)
+                    if delay > 0:
+                        time.sleep(delay)
+                previous = (result['timestamp'], time.monotonic())
+
+                with self._condition:
+                    self._latest = (result['frame'], result['faces'])
+                    self._latest_seq += 1
+                    self.stats['captured'] += 1
+                    self._condition.notify_all()
+                    if self._should_stop():
+                        # Marked stopped under the same lock that saw no viewers, so a
+                        # viewer arriving from now on starts a new run
+                        self._running = False
+                        self._condition.notify_all()
+                        break
+        finally:
+            with self._condition:
+                if self._run_id == run_id:
+                    self._running = False
+                self._condition.notify_all()
+            logger.info("⏹️  Live stream stopped: %s", self.source, extra={'source': str(self.source)})
+
+    def _encode_loop(self, run_id):
+        with self._condition:
+            encoded_seq = self._latest_seq
+        while True:
+            with self._condition:
+                while self._is_current(run_id) and self._latest_seq == encoded_seq:
+                    self._condition.wait(1.0)
+                if not self._is_current(run_id):
+                    return
+                frame, faces = self._latest
+                encoded_seq = self._latest_seq
+
+            ok, buffer = cv2.imencode('.jpg', annotate_frame(frame, faces),
+                                      [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            if not ok:
+                continue
+
+            with self._condition:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_seq = encoded_seq
+                self.stats['encoded'] += 1
+                self._condition.notify_all()
+
+    def frames(self):
+        """
+        Generate multipart MJPEG chunks for one viewer
+
+        Yields:
+            bytes: One multipart part per encoded frame; frames produced while
+                   the viewer is still sending the previous one are skipped
+        """
+        with self._condition:
+            self._viewers += 1
+            self._ensure_running()
+            # Start with the next frame encoded by the running pipeline
+            seen_seq = self._jpeg_seq
+
+        try:
+            while True:
+                with self._condition:
+                    while self._running and self._jpeg_seq == seen_seq:
+                        self._condition.wait(1.0)
+                    if self._jpeg_seq == seen_seq:
+                        return
+                    jpeg = self._jpeg
+                    seen_seq = self._jpeg_seq
+
+                yield (b'--' + _BOUNDARY + b'\r\n'
+                       b'Content-Type: image/jpeg\r\n'
+                       b'Content-Length: ' + str(len(jpeg)).encode('ascii') + b'\r\n\r\n' +
+                       jpeg + b'\r\n')
+        finally:
+            with self._condition:
+                self._viewers -= 1
+                self._last_viewer_left = time.monotonic()
+
+    @staticmethod
+    def mimetype():
+        """Content type of the stream produced by frames()"""
+        return f"multipart/x-mixed-replace; boundary={_BOUNDARY.decode('ascii')}"
+
+    def viewer_count(self):
+        with self._condition:
+            return self._viewers
@@ -0,0 +1,309 @@
+# video/video_indexer.py
+"""
+Offline "who appears when" indexing of recorded video
+
+The video is split into fixed-length time chunks that are processed in
+parallel worker processes, each seeking straight to its chunk. Per-chunk
+detections are checkpointed to disk so an interrupted run resumes where it
+stopped, and are then merged into per-person appearance intervals (an
+appearance spanning a chunk boundary becomes one interval).
+
+Usage:
+    python -m video.video_indexer recording.mp4 --database models/face_database.pkl
+    python -m video.video_indexer recording.mp4 --chunk-seconds 120 --workers 8 --output timeline.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set up once by _init_worker
+_worker_video_recognizer = None
+
+
+def _init_worker(database_path, tolerance, scale, model):
+    """Load the face database once per worker process"""
+    global _worker_video_recognizer
+    from face_detection.face_detector import FaceDetector
+    from face_recognition.face_recognizer import FaceRecognizer
+    from video.video_recognizer import VideoRecognizer
+
+    recognizer = FaceRecognizer()
+    recognizer.load_database(database_path)
+    if tolerance is not None:
+        recognizer.tolerance = tolerance
+    _worker_video_recognizer = VideoRecognizer(recognizer, detector=FaceDetector(model=model), scale=scale)
+
+
+def _process_chunk(video_path, chunk_index, start, end, sample_fps):
+    """
+    Detect and identify faces in one time chunk of a video
+
+    Returns:
+        dict: chunk index, sampled frame count and detections
+              [timestamp, name, distance]
+    """
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    step = max(1, int(round(fps / sample_fps)))
+
+    # Seek directly to the chunk instead of decoding everything before it
+    capture.set(cv2.CAP_PROP_POS_MSEC, start * 1000.0)
+
+    detections = []
+    sampled = 0
+    frame_offset = 0
+
+    try:
+        while True:
+            if not capture.grab():
+                break
+            # Read after grab(): before it, the position is still the previous frame's
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp >= end:
+                break
+            # Seeks land on the keyframe before start: those frames belong to the previous chunk
+            if timestamp < start:
+                continue
+
+            if frame_offset % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    sampled += 1
+                    for face_info in _worker_video_recognizer.recognize_frame(frame):
+                        distance = face_info.distance if face_info.recognized else None
+                        detections.append([round(timestamp, 3), face_info.name, distance])
+            frame_offset += 1
+    finally:
+        capture.release()
+
+    return {'chunk': chunk_index, 'start': start, 'end': end,
+            'sampled_frames': sampled, 'detections': detections}
+
+
+def merge_appearances(detections, max_gap):
+    """
+    Merge timestamped detections into per-person appearance intervals
+
+    Args:
+        detections: Iterable of [timestamp, name, distance]
+        max_gap (float): Detections of a person closer than this (seconds)
+                         belong to the same appearance
+
+    Returns:
+        dict: name -> list of {start, end, detections, best_distance}
+    """
+    by_person = {}
+    for timestamp, name, distance in sorted(detections, key=lambda d: d[0]):
+        intervals = by_person.setdefault(name, [])
+        if intervals and timestamp - intervals[-1]['end'] <= max_gap:
+            interval = intervals[-1]
+            interval['end'] = timestamp
+            interval['detections'] += 1
+        else:
+            interval = {'start': timestamp, 'end': timestamp, 'detections': 1, 'best_distance': None}
+            intervals.append(interval)
+
+        if distance is not None and (interval['best_distance'] is None or distance < interval['best_distance']):
+            interval['best_distance'] = round(distance, 4)
+    return by_person
+
+
+class VideoIndexer:
+    def __init__(self, database_path, chunk_seconds=60.0, sample_fps=2.0, scale=0.5,
+                 workers=None, tolerance=None, model='hog', max_gap=None, include_unknown=False):
+        """
+        Initialize the video indexer
+
+        Args:
+            database_path (str): Face database saved by FaceRecognizer.save_database
+            chunk_seconds (float): Length of the chunks processed in parallel
+            sample_fps (float): Frames per second of video that are analysed
+            scale (float): Frames are resized by this factor before detection
+            workers (int): Worker processes (defaults to the number of CPUs)
+            tolerance (float): Override the tolerance stored in the database
+            model (str): 'hog' or 'cnn'
+            max_gap (float): Largest gap (seconds) inside one appearance;
+                             defaults to three sampling intervals
+            include_unknown (bool): Keep intervals for unrecognized faces
+        """
+        self.database_path = database_path
+        self.chunk_seconds = chunk_seconds
+        self.sample_fps = sample_fps
+        self.scale = scale
+        self.workers = workers or os.cpu_count() or 1
+        self.tolerance = tolerance
+        self.model = model
+        self.max_gap = max_gap if max_gap is not None else 3.0 / sample_fps
+        self.include_unknown = include_unknown
+
+    @staticmethod
+    def probe(video_path):
+        """Duration (seconds) and frame rate of a video file"""
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise IOError(f"Cannot open video: {video_path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        capture.release()
+        return frame_count / fps, fps
+
+    def _signature(self, video_path):
+        """Identifies a run so checkpoints from different settings aren't mixed"""
+        stat = os.stat(video_path)
+        database_stat = os.stat(self.database_path)
+        key = json.dumps([os.path.abspath(video_path), stat.st_size, stat.st_mtime,
+                          database_stat.st_mtime, self.chunk_seconds, self.sample_fps,
+                          self.scale, self.tolerance, self.model])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _load_checkpoints(self, checkpoint_dir, signature):
+        meta_path = os.path.join(checkpoint_dir, 'meta.json')
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        try:
+            with open(meta_path, 'r') as f:
+                if json.load(f).get('signature') != signature:
+                    raise ValueError('settings changed')
+        except (OSError, ValueError):
+            # Stale or missing checkpoints: start over
+            for name in os.listdir(checkpoint_dir):
+                if name.startswith('chunk_'):
+                    os.remove(os.path.join(checkpoint_dir, name))
+            with open(meta_path, 'w') as f:
+                json.dump({'signature': signature}, f)
+            return {}
+
+        done = {}
+        for name in os.listdir(checkpoint_dir):
+            if name.startswith('chunk_') and name.endswith('.json'):
+                try:
+                    with open(os.path.join(checkpoint_dir, name), 'r') as f:
+                        result = json.load(f)
+                    done[result['chunk']] = result
+                except (OSError, ValueError, KeyError):
+                    continue
+        return done
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_dir, result):
+        path = os.path.join(checkpoint_dir, f"chunk_{result['chunk']:06d}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+    def index(self, video_path, checkpoint_dir=None):
+        """
+        Build the appearance timeline of a video
+
+        Args:
+            video_path (str): Path to the video file
+            checkpoint_dir (str): Where per-chunk results are kept between runs
+                                  (defaults to <video_path>.index_parts)
+
+        Returns:
+            dict: Timeline with per-person intervals and throughput stats
+        """
+        duration, fps = self.probe(video_path)
+        checkpoint_dir = checkpoint_dir or f"{video_path}.index_parts"
+        done = self._load_checkpoints(checkpoint_dir, self._signature(video_path))
+
+        chunks = []
+        start = 0.0
+        while start < duration:
+            chunks.append((len(chunks), start, min(start + self.chunk_seconds, duration)))
+            start += self.chunk_seconds
+
+        pending = [chunk for chunk in chunks if chunk[0] not in done]
+        logger.info("🎬 Indexing %s: %.1fs, %d chunk(s), %d already done", os.path.basename(video_path),
+                    duration, len(chunks), len(chunks) - len(pending),
+                    extra={'chunks': len(chunks), 'chunks_done': len(chunks) - len(pending)})
+
+        started = time.monotonic()
+        processed_seconds = 0.0
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                     initializer=_init_worker,
+                                     initargs=(self.database_path, self.tolerance, self.scale, self.model)) as executor:
+                futures = [executor.submit(_process_chunk, video_path, index, chunk_start, chunk_end, self.sample_fps)
+                           for index, chunk_start, chunk_end in pending]
+
+                for future in as_completed(futures):
+                    result = future.result()
+                    self._save_checkpoint(checkpoint_dir, result)
+                    done[result['chunk']] = result
+                    processed_seconds += result['end'] - result['start']
+
+                    elapsed = time.monotonic() - started
+                    logger.info("   ✅ Chunk %d/%d: %d detection(s), %.1fx real time", result['chunk'] + 1,
+                                len(chunks), len(result['detections']), processed_seconds / elapsed,
+                                extra={'chunk': result['chunk'], 'detections': len(result['detections'])})
+
+        elapsed = time.monotonic() - started
+        detections = [detection for result in done.values() for detection in result['detections']
+                      if self.include_unknown or detection[1] != 'Unknown']
+
+        timeline = {
+            'video': os.path.abspath(video_path),
+            'duration': round(duration, 3),
+            'fps': fps,
+            'sample_fps': self.sample_fps,
+            'people': merge_appearances(detections, self.max_gap),
+            'stats': {
+                'chunks': len(chunks),
+                'chunks_processed': len(pending),
+                'sampled_frames': sum(result['sampled_frames'] for result in done.values()),
+                'processing_time': round(elapsed, 3),
+                'realtime_factor': round(processed_seconds / elapsed, 2) if elapsed > 0 else None
+            }
+        }
+        return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index who appears when in a video file')
+    parser.add_argument('video', help='path to the video file')
+    parser.add_argument('--database', default=os.path.join('models', 'face_database.pkl'),
+                        help='face database saved by FaceRecognizer.save_database')
+    parser.add_argument('--output', default=None, help='timeline JSON (default: <video>.timeline.json)')
+    parser.add_argument('--chunk-seconds', type=float, default=60.0)
+    parser.add_argument('--sample-fps', type=float, default=2.0)
+    parser.add_argument('--scale', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tolerance', type=float, default=None)
+    parser.add_argument('--model', choices=['hog', 'cnn'], default='hog')
+    parser.add_argument('--include-unknown', action='store_true')
+    args = parser.parse_args()
+
+    configure_logging()
+    indexer = VideoIndexer(args.database, chunk_seconds=args.chunk_seconds, sample_fps=args.sample_fps,
+                           scale=args.scale, workers=args.workers, tolerance=args.tolerance,
+                           model=args.model, include_unknown=args.include_unknown)
+    timeline = indexer.index(args.video)
+
+    output_path = args.output or f"{args.video}.timeline.json"
+    with open(output_path, 'w') as f:
+        json.dump(timeline, f, indent=2)
+
+    print(f"💾 Timeline saved to: {output_path}")
+    for name, intervals in sorted(timeline['people'].items()):
+        spans = ', '.join(f"{i['start']:.1f}-{i['end']:.1f}s" for i in intervals)
+        print(f"👤 {name}: {spans}")
+    if timeline['stats']['realtime_factor']:
+        print(f"⚡ {timeline['stats']['realtime_factor']}x real time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# video/video_recognizer.py
+"""
+Streaming face recognition over any cv2.VideoCapture source
+
+Detection and encoding are far too slow to run on every frame of a 30 fps
+stream on CPU. VideoRecognizer runs them on a downscaled copy of every Nth
+frame (or as often as a per-frame time budget allows) and reuses the last
+results for the frames in between.
+"""
+
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from face_detection.face_detector import FaceDetector
+
+logger = logging.getLogger(__name__)
+
+
+class VideoRecognizer:
+    def __init__(self, recognizer, detector=None, every_n_frames=5, time_budget=None,
+                 scale=0.25, number_of_times_to_upsample=1, tracker=None):
+        """
+        Initialize the video recognizer
+
+        Args:
+            recognizer (FaceRecognizer): Recognizer holding the known faces
+            detector (FaceDetector): Detector to use (HOG detector by default)
+            every_n_frames (int): Run detection on every Nth frame
+            time_budget (float): Seconds of processing allowed per frame on
+                average; when set, frames are skipped adaptively instead of
+                using every_n_frames
+            scale (float): Frames are resized by this factor before detection
+            number_of_times_to_upsample (int): Upsampling passes for detection
+            tracker (FaceTracker): When given, faces are tracked between frames
+                and only new, re-acquired or stale tracks are re-encoded
+        """
+        self.recognizer = recognizer
+        self.detector = detector or FaceDetector(model='hog')
+        self.every_n_frames = max(1, int(every_n_frames))
+        self.time_budget = time_budget
+        self.scale = scale
+        self.number_of_times_to_upsample = number_of_times_to_upsample
+        self.tracker = tracker
+
+        self.stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {
+            'frames': 0,
+            'processed_frames': 0,
+            'encoded_faces': 0,
+            'processing_time': 0.0,
+            'elapsed_time': 0.0
+        }
+
+    def _detect(self, frame):
+        """Detect faces on the downscaled RGB frame"""
+        if self.scale != 1.0:
+            small_frame = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+        else:
+            small_frame = frame
+
+        # dlib expects contiguous RGB
+        rgb_frame = np.ascontiguousarray(small_frame[:, :, ::-1])
+
+        face_locations = self.detector.locate_faces(
+            rgb_frame, number_of_times_to_upsample=self.number_of_times_to_upsample
+        )
+        return rgb_frame, face_locations
+
+    def recognize_frame(self, frame, frame_index=0):
+        """
+        Detect, encode and identify faces in a single BGR frame
+
+        Args:
+            frame: numpy array image in OpenCV's BGR channel order
+            frame_index (int): Index of the frame, used by the tracker
+
+        Returns:
+            list: FaceMatch for each face, with locations in
+                  the coordinates of the full-size frame
+        """
+        rgb_frame, face_locations = self._detect(frame)
+        full_locations = [self._to_full_scale(location) for location in face_locations]
+
+        if self.tracker is not None:
+            return self._recognize_tracked(frame, frame_index, rgb_frame, face_locations, full_locations)
+
+        if not face_locations:
+            return []
+
+        face_encodings = self.detector.extract_face_encodings(rgb_frame, face_locations)
+        self.stats['encoded_faces'] += len(face_encodings)
+        return self.recognizer.match_faces(face_encodings, full_locations)
+
+    def _recognize_tracked(self, frame, frame_index, rgb_frame, face_locations, full_locations):
+        """Encode only the faces whose tracks need a fresh identity"""
+        tracks = self.tracker.update(full_locations, frame=frame)
+
+        pending = [i for i, track in enumerate(tracks) if self.tracker.needs_encoding(track, frame_index)]
+        if pending:
+            face_encodings = self.detector.extract_face_encodings(
+                rgb_frame, [face_locations[i] for i in pending]
+            )
+            matched = self.recognizer.match_faces(face_encodings, [full_locations[i] for i in pending])
+            for i, face_info in zip(pending, matched):
+                self.tracker.assign_identity(tracks[i], face_info, frame_index)
+            self.stats['encoded_faces'] += len(face_encodings)
+
+        return self.tracker.faces()
+
+    def _to_full_scale(self, location):
+        if self.scale == 1.0:
+            return tuple(location)
+        return tuple(int(round(v / self.scale)) for v in location)
+
+    def _should_process(self, frame_index, debt):
+        if self.time_budget is None:
+            return frame_index % self.every_n_frames == 0
+        return debt <= 0
+
+    def process(self, source, max_frames=None):
+        """
+        Run recognition over a video source and yield per-frame results
+
+        Args:
+            source: cv2.VideoCapture, device index, file path or stream URL
+            max_frames (int): Stop after this many frames
+
+        Yields:
+            dict: frame_index, timestamp (seconds), frame (BGR array), faces,
+                  processed (whether faces were computed on this frame)
+        """
+        owns_capture = not isinstance(source, cv2.VideoCapture)
+        capture = cv2.VideoCapture(source) if owns_capture else source
+
+        if not capture.isOpened():
+            logger.error("❌ Cannot open video source: %s", source, extra={'source': str(source)})
+            return
+
+        self._reset_stats()
+        started = time.monotonic()
+        frame_index = 0
+        faces = []
+        # Seconds of processing spent beyond the time budget, paid back by skipping frames.
+        # Never negative: cheap frames must not bank credit for a burst of expensive ones
+        debt = 0.0
+        fps = capture.get(cv2.CAP_PROP_FPS)
+
+        try:
+            while max_frames is None or frame_index < max_frames:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+
+                # Stay on the capture's timebase; wall-clock time only if it has none at all
+                position_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+                if position_ms > 0:
+                    timestamp = position_ms / 1000.0
+                elif fps > 0:
+                    timestamp = frame_index / fps
+                else:
+                    timestamp = time.monotonic() - started
+
+                processed = self._should_process(frame_index, debt)
+                if processed:
+                    frame_started = time.perf_counter()
+                    faces = self.recognize_frame(frame, frame_index)
+                    cost = time.perf_counter() - frame_started
+
+                    self.stats['processed_frames'] += 1
+                    self.stats['processing_time'] += cost
+                    if self.time_budget is not None:
+                        debt = max(debt + cost - self.time_budget, 0.0)
+                else:
+                    if self.time_budget is not None:
+                        debt = max(debt - self.time_budget, 0.0)
+                    if self.tracker is not None and self.tracker.use_correlation:
+                        self.tracker.predict(frame)
+                        faces = self.tracker.faces()
+
+                self.stats['frames'] += 1
+                self.stats['elapsed_time'] = time.monotonic() - started
+
+                yield {
+                    'frame_index': frame_index,
+                    'timestamp': timestamp,
+                    'frame': frame,
+                    'faces': faces,
+                    'processed': processed
+                }
+                frame_index += 1
+        finally:
+            if owns_capture:
+                capture.release()
+
+    def throughput(self):
+        """Frames per second achieved by the last (or current) run"""
+        elapsed = self.stats['elapsed_time']
+        return self.stats['frames'] / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,216 @@
+# web/admission.py
+"""
+Admission control and backpressure for the recognition server
+
+Detection and recognition are CPU and memory heavy. Instead of letting every
+request start work and slowing everyone down, a fixed number of requests run
+at once, a bounded number wait in line, and the rest are turned away quickly
+with a Retry-After hint.
+"""
+
+import io
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+from profiling import annotate
+
+
+class AdmissionRejected(Exception):
+    """Raised when the server is saturated and a request cannot be admitted"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ImageTooLarge(Exception):
+    """Raised when an uploaded image exceeds the per-request pixel budget"""
+
+    def __init__(self, width, height, max_pixels):
+        if width is None:
+            # Refused by PIL's decompression bomb check before the size was known to us
+            message = f"Image is too large to decode, budget is {max_pixels} pixels"
+        else:
+            message = f"Image is {width}x{height} ({width * height} pixels), budget is {max_pixels} pixels"
+        super().__init__(message)
+        self.width = width
+        self.height = height
+        self.max_pixels = max_pixels
+
+
+class InvalidImage(Exception):
+    """Raised when an upload is not an image PIL can read"""
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=2, max_queue=4, queue_timeout=10.0):
+        """
+        Initialize the admission controller
+
+        Args:
+            max_concurrent (int): Requests allowed to do heavy work at once
+            max_queue (int): Requests allowed to wait for a free slot
+            queue_timeout (float): Seconds a request may wait before giving up
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # Exponentially weighted average of time spent inside admit()
+        self._avg_service_time = 1.0
+
+        self.admitted_count = 0
+        self.rejected_count = 0
+
+    def retry_after(self):
+        """Estimate how many seconds a rejected client should wait"""
+        with self._condition:
+            return self._retry_after_locked()
+
+    @contextmanager
+    def admit(self):
+        """
+        Context manager guarding a heavy section
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out
+        """
+        queued = time.monotonic()
+        with self._condition:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.rejected_count += 1
+                    raise AdmissionRejected('queue full', self._retry_after_locked())
+
+                self._waiting += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_count += 1
+                            raise AdmissionRejected('queue timeout', self._retry_after_locked())
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._active += 1
+            self.admitted_count += 1
+
+        started = time.monotonic()
+        annotate(queue_ms=round((started - queued) * 1000, 3))
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._condition:
+                self._active -= 1
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+                self._condition.notify()
+
+    def _retry_after_locked(self):
+        backlog = self._active + self._waiting + 1
+        return max(1, int(math.ceil(self._avg_service_time * backlog / self.max_concurrent)))
+
+    def stats(self):
+        """Current load counters, suitable for a health endpoint"""
+        with self._condition:
+            return {
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted_count,
+                'rejected': self.rejected_count,
+                'avg_service_time': round(self._avg_service_time, 3)
+            }
+
+
+def enforce_pixel_budget(image_path, max_pixels, downscale=True, decode_slots=None, store=None,
+                         decode_timeout=10.0):
+    """
+    Check an image against a pixel budget before it is fully decoded
+
+    Only the image header is read to get the dimensions. Oversized JPEGs are
+    either rejected or replaced by a copy downscaled while decoding (draft
+    mode), so the full-size bitmap is never built. Other formats
+    can't be decoded at a reduced size and are always rejected when over
+    budget.
+
+    Args:
+        image_path (str): Path to the uploaded image
+        max_pixels (int): Largest allowed width * height
+        downscale (bool): Downscale oversized JPEGs instead of rejecting them
+        decode_slots: Optional semaphore bounding how many downscales run at once
+        decode_timeout (float): Seconds to wait for a decode slot
+        store (ArtifactStore): Content-addressed store the downscaled copy is put in;
+                               without one the file is replaced atomically
+
+    Returns:
+        str: Path of the image to use (image_path itself if it was within budget)
+
+    Raises:
+        ImageTooLarge: If the image is over budget and can't (or may not) be downscaled
+        InvalidImage: If the file is not a readable image
+        AdmissionRejected: If no decode slot frees up within decode_timeout
+    """
+    try:
+        image = Image.open(image_path)
+    except Image.DecompressionBombError:
+        raise ImageTooLarge(None, None, max_pixels)
+    except (Image.UnidentifiedImageError, OSError) as e:
+        raise InvalidImage(f"Not a readable image: {e}")
+
+    with image:
+        width, height = image.size
+        if width * height <= max_pixels:
+            return image_path
+
+        if not downscale or image.format != 'JPEG':
+            raise ImageTooLarge(width, height, max_pixels)
+
+        scale = math.sqrt(max_pixels / float(width * height))
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        image.draft('RGB', target)
+        draft_width, draft_height = image.size
+        # Draft mode shrinks by at most 8x: beyond that even the reduced decode is too big
+        if draft_width * draft_height > 4 * max_pixels:
+            raise ImageTooLarge(width, height, max_pixels)
+
+        # Runs before the request is admitted: time out like the admission queue does
+        if decode_slots is not None and not decode_slots.acquire(timeout=decode_timeout):
+            raise AdmissionRejected('decode slots busy', max(1, int(math.ceil(decode_timeout))))
+        try:
+            try:
+                resized = image.convert('RGB')
+            except OSError as e:
+                raise InvalidImage(f"Not a readable image: {e}")
+            resized.thumbnail(target)
+            encoded = io.BytesIO()
+            resized.save(encoded, format='JPEG')
+        finally:
+            if decode_slots is not None:
+                decode_slots.release()
+
+    encoded.seek(0)
+    if store is not None:
+        # The original keeps its own name; the smaller copy is stored under its own hash
+        resized_path, _ = store.put_stream(encoded, '.jpg')
+        return resized_path
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(image_path)))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(encoded.getbuffer())
+    os.replace(tmp_path, image_path)
+    return image_path
@@ -0,0 +1,185 @@
+# web/artifact_store.py
+"""
+Bounded, self-evicting storage for uploads and rendered results
+
+Files are stored under the hash of their contents, so the same upload is
+kept only once. A background sweeper removes files older than the age quota
+and then evicts least recently used files until the directory fits the size
+quota. Only files directly inside the store directory are ever removed.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    def __init__(self, root_dir, max_bytes, max_age_seconds, sweep_interval=300):
+        """
+        Initialize the artifact store
+
+        Args:
+            root_dir (str): Directory owned by this store
+            max_bytes (int): Size quota for all files in the store
+            max_age_seconds (float): Files unused for longer than this are removed
+            sweep_interval (float): Seconds between background sweeps
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = sweep_interval
+
+        self._sweeper = None
+        self._stop_event = threading.Event()
+        self._sweeper_lock = threading.Lock()
+
+        self.last_sweep = {'removed': 0, 'freed_bytes': 0, 'total_bytes': 0, 'files': 0}
+
+    def put_stream(self, stream, extension, chunk_size=1024 * 1024):
+        """
+        Store the contents of a binary stream under its content hash
+
+        Args:
+            stream: Readable binary file object (e.g. an uploaded file's stream)
+            extension (str): File extension to use, without the dot
+            chunk_size (int): Number of bytes copied per chunk
+
+        Returns:
+            tuple: (path of the stored file, hex digest of its contents)
+        """
+        os.makedirs(self.root_dir, exist_ok=True)
+        if self._sweeper is None:
+            self.start_sweeper()
+
+        digest = hashlib.sha1()
+        tmp_path = os.path.join(self.root_dir, f".upload-{os.getpid()}-{threading.get_ident()}.tmp")
+
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(chunk)
+                f.write(chunk)
+
+        hex_digest = digest.hexdigest()
+        extension = extension.lower().lstrip('.') or 'bin'
+        path = os.path.join(self.root_dir, f"{hex_digest}.{extension}")
+
+        if os.path.exists(path):
+            # Duplicate upload: keep the stored copy and mark it as recently used
+            os.remove(tmp_path)
+            self.touch(path)
+        else:
+            os.replace(tmp_path, path)
+
+        return path, hex_digest
+
+    @staticmethod
+    def touch(path):
+        """Mark a stored file as recently used (mtime drives LRU eviction)"""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def sweep(self):
+        """
+        Apply the age and size quotas once
+
+        Returns:
+            dict: Number of files removed, bytes freed and remaining totals
+        """
+        now = time.time()
+        entries = []
+
+        try:
+            with os.scandir(self.root_dir) as it:
+                for entry in it:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.name.endswith('.tmp') and now - stat.st_mtime < self.max_age_seconds:
+                        # Upload or render still being written
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return self.last_sweep
+
+        removed = 0
+        freed_bytes = 0
+        kept = []
+
+        for mtime, size, path in entries:
+            if now - mtime > self.max_age_seconds:
+                if self._remove(path):
+                    removed += 1
+                    freed_bytes += size
+            else:
+                kept.append((mtime, size, path))
+
+        total_bytes = sum(size for _, size, _ in kept)
+        if total_bytes > self.max_bytes:
+            # Least recently used first
+            kept.sort()
+            remaining = []
+            for mtime, size, path in kept:
+                if total_bytes > self.max_bytes and self._remove(path):
+                    removed += 1
+                    freed_bytes += size
+                    total_bytes -= size
+                else:
+                    remaining.append((mtime, size, path))
+            kept = remaining
+
+        self.last_sweep = {
+            'removed': removed,
+            'freed_bytes': freed_bytes,
+            'total_bytes': total_bytes,
+            'files': len(kept)
+        }
+        if removed:
+            logger.info("🧹 %s: removed %d file(s), freed %.1f MB", os.path.basename(self.root_dir), removed,
+                        freed_bytes / (1024 * 1024),
+                        extra={'store': self.root_dir, 'removed': removed, 'freed_bytes': freed_bytes})
+        return self.last_sweep
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def start_sweeper(self):
+        """Start the background sweeper thread (idempotent)"""
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop,
+                                             name=f"sweeper-{os.path.basename(self.root_dir)}",
+                                             daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread"""
+        self._stop_event.set()
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                self._sweeper.join()
+                self._sweeper = None
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("❌ Error sweeping %s: %s", self.root_dir, e, extra={'store': self.root_dir})
+            if self._stop_event.wait(self.sweep_interval):
+                return
@@ -0,0 +1,306 @@
+# web/enrollment.py
+"""
+Background enrollment of uploaded training images
+
+An enrollment request reserves room in the queue, stores the uploads and
+returns a job id. Detection, quality checks and encoding run in a pool of
+worker processes (dlib never blocks a request thread). Accepted encodings
+are committed to the live gallery in batches (every commit_every images
+or commit_interval seconds, and at the end of the job), because each
+commit republishes the whole shared gallery. A person therefore becomes
+recognizable while the rest of their images are still being processed.
+Accepted images are also copied to known_faces/<person>/, so
+load_known_faces can rebuild the gallery from them.
+
+An image is rejected when it shows no face or several faces (the label
+would be ambiguous), when the face is too small, or when the face is too
+blurry (variance of the Laplacian of the face crop). Job state is written
+as a small JSON file after every image, so any app worker process can
+answer status requests for it.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from web.admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+# Per-worker settings, set up once by _init_worker
+_worker_options = None
+
+
+def _init_worker(model, number_of_times_to_upsample, min_face_size, min_sharpness):
+    global _worker_options
+    _worker_options = {'model': model, 'upsample': number_of_times_to_upsample,
+                       'min_face_size': min_face_size, 'min_sharpness': min_sharpness}
+
+
+def face_sharpness(gray_face):
+    """Variance of the 4-neighbour Laplacian (low for blurry faces)"""
+    face = np.asarray(gray_face, dtype=np.float32)
+    if face.shape[0] < 3 or face.shape[1] < 3:
+        return 0.0
+    laplacian = (face[:-2, 1:-1] + face[2:, 1:-1] + face[1:-1, :-2] + face[1:-1, 2:]
+                 - 4.0 * face[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+def _encode_training_image(image_path):
+    """
+    Check and encode one training image (runs in a worker process)
+
+    Returns:
+        dict: status 'accepted' with the encoding, or 'rejected' with a reason
+    """
+    import face_recognition
+
+    options = _worker_options
+    try:
+        image = face_recognition.load_image_file(image_path)
+        locations = face_recognition.face_locations(image, number_of_times_to_upsample=options['upsample'],
+                                                    model=options['model'])
+        if not locations:
+            return {'status': 'rejected', 'reason': 'no face detected'}
+        if len(locations) > 1:
+            return {'status': 'rejected', 'reason': f"{len(locations)} faces detected, expected one"}
+
+        top, right, bottom, left = locations[0]
+        size = min(bottom - top, right - left)
+        if size < options['min_face_size']:
+            return {'status': 'rejected', 'reason': f"face too small ({size}px)"}
+
+        gray = np.asarray(Image.fromarray(image[top:bottom, left:right]).convert('L'))
+        sharpness = face_sharpness(gray)
+        if sharpness < options['min_sharpness']:
+            return {'status': 'rejected', 'reason': f"face too blurry (sharpness {sharpness:.0f})"}
+
+        encoding = face_recognition.face_encodings(image, [locations[0]])[0]
+        return {'status': 'accepted', 'encoding': encoding, 'location': [int(v) for v in locations[0]],
+                'sharpness': round(sharpness, 1)}
+    except Exception as e:
+        return {'status': 'rejected', 'reason': f"could not process image: {e}"}
+
+
+class EnrollmentManager:
+    def __init__(self, jobs_dir, get_recognizer, workers=2, max_pending_images=200,
+                 model='hog', number_of_times_to_upsample=1, min_face_size=60, min_sharpness=30.0,
+                 job_max_age=24 * 3600, known_faces_dir=None, commit_every=10, commit_interval=5.0):
+        """
+        Initialize the enrollment manager (worker processes start with the first job)
+
+        Args:
+            jobs_dir (str): Where job state files are written
+            get_recognizer: Function returning the recognizer whose gallery is updated
+            workers (int): Worker processes for detection and encoding
+            max_pending_images (int): Images allowed in flight before new jobs are turned away
+            model (str): Detection model, 'hog' or 'cnn'
+            number_of_times_to_upsample (int): Detection upsampling
+            min_face_size (int): Smallest accepted face side in pixels
+            min_sharpness (float): Lowest accepted face sharpness
+            job_max_age (float): Seconds finished job files are kept
+            known_faces_dir (str): Accepted images are copied to <known_faces_dir>/<person>/
+            commit_every (int): Accepted encodings committed to the gallery at once
+            commit_interval (float): Most seconds an accepted encoding waits for its commit
+        """
+        self.jobs_dir = jobs_dir
+        self.get_recognizer = get_recognizer
+        self.workers = workers
+        self.max_pending_images = max_pending_images
+        self.job_max_age = job_max_age
+        self.known_faces_dir = known_faces_dir
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._worker_args = (model, number_of_times_to_upsample, min_face_size, min_sharpness)
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending_images = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the app process has running threads
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker, initargs=self._worker_args)
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool (e.g. a worker killed by the OOM killer) so the next job starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save_job(self, job):
+        tmp_path = f"{self._job_path(job['job_id'])}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._job_path(job['job_id']))
+
+    def get_job(self, job_id):
+        """Job state dict, or None for an unknown (or expired) job id"""
+        if not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._job_path(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def reserve(self, count):
+        """
+        Reserve queue room for count images (before storing any upload)
+
+        The reservation is taken over by submit(); call release() instead if
+        the job is not submitted after all.
+
+        Raises:
+            AdmissionRejected: If the queue has no room for them
+        """
+        with self._lock:
+            if self._pending_images + count > self.max_pending_images:
+                raise AdmissionRejected('enrollment queue full', retry_after=30)
+            self._pending_images += count
+
+    def release(self, count):
+        """Give back a reservation that wasn't submitted"""
+        with self._lock:
+            self._pending_images -= count
+
+    def submit(self, person_name, images):
+        """
+        Start enrolling a person from uploaded images (room reserved with reserve())
+
+        Args:
+            person_name (str): Name to enroll the faces under
+            images (list): (stored image path, original file name) pairs
+
+        Returns:
+            dict: The new job (status 'queued')
+        """
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._remove_expired_jobs()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'person': person_name,
+            'status': 'queued',
+            'images': len(images),
+            'processed': 0,
+            'accepted': 0,
+            'committed': 0,
+            'rejected': [],
+            'created': round(time.time(), 3),
+            'finished': None,
+            'error': None
+        }
+        self._save_job(job)
+        submitted = dict(job)
+        threading.Thread(target=self._run, args=(job, images), name=f"enroll-{job['job_id'][:8]}",
+                         daemon=True).start()
+        return submitted
+
+    def _keep_image(self, person_name, image_path):
+        """Copy an accepted image to the person's known_faces directory (raises OSError)"""
+        person_dir = os.path.join(self.known_faces_dir, person_name)
+        os.makedirs(person_dir, exist_ok=True)
+        # Uploads are named by content hash, so the same image is only kept once
+        target = os.path.join(person_dir, os.path.basename(image_path))
+        if os.path.exists(target):
+            return
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=person_dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(image_path, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _run(self, job, images):
+        """Feed a job's images through the pool and commit the accepted faces in batches"""
+        job['status'] = 'running'
+        self._save_job(job)
+        executor = None
+        try:
+            executor = self._get_executor()
+            futures = {executor.submit(_encode_training_image, path): (path, name) for path, name in images}
+            recognizer = self.get_recognizer()
+            batch, batch_started = [], None
+            pending = set(futures)
+
+            while pending:
+                # Wakes up for the commit interval too: one slow image doesn't hold back the batch
+                timeout = None if not batch else max(0.0, batch_started + self.commit_interval - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    path, name = futures[future]
+                    if result['status'] == 'accepted' and self.known_faces_dir:
+                        try:
+                            self._keep_image(job['person'], path)
+                        except OSError as e:
+                            result = {'status': 'rejected', 'reason': f"could not keep image: {e}"}
+                    if result['status'] == 'accepted':
+                        if not batch:
+                            batch_started = time.monotonic()
+                        batch.append(result['encoding'])
+                        job['accepted'] += 1
+                    else:
+                        job['rejected'].append({'image': name, 'reason': result['reason']})
+                    job['processed'] += 1
+                    with self._lock:
+                        self._pending_images -= 1
+
+                # Every commit republishes the whole gallery: batch them
+                if batch and (len(batch) >= self.commit_every or not pending or
+                              time.monotonic() - batch_started >= self.commit_interval):
+                    recognizer.extend_person(job['person'], batch)
+                    job['committed'] += len(batch)
+                    batch = []
+                self._save_job(job)
+
+            job['status'] = 'done'
+            logger.info("🎓 Enrolled %s: %d of %d image(s) accepted", job['person'], job['accepted'],
+                        job['images'], extra={'job_id': job['job_id'], 'accepted': job['accepted'],
+                                              'rejected': len(job['rejected'])})
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._discard_executor(executor)
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            logger.error("❌ Enrollment job %s failed: %s", job['job_id'], e)
+            with self._lock:
+                self._pending_images -= job['images'] - job['processed']
+        job['finished'] = round(time.time(), 3)
+        self._save_job(job)
+
+    def _remove_expired_jobs(self):
+        cutoff = time.time() - self.job_max_age
+        for entry in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, entry)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
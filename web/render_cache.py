@@ -0,0 +1,233 @@
+# web/render_cache.py
+"""
+Lazy, content-addressed cache for annotated result previews
+
+Detection and recognition routes only *register* what should be drawn.
+The annotated JPEG is rendered the first time a client actually asks for
+it, downscaled to a preview size, and then served from disk.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from PIL import Image, ImageDraw
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+
+
+def file_digest(filepath, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-1 digest of a file without reading it into memory at once
+
+    Args:
+        filepath (str): Path to the file
+        chunk_size (int): Number of bytes read per chunk
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detection_annotations(face_locations):
+    """
+    Build annotations for plain face detection results
+
+    Args:
+        face_locations: List of face locations [(top, right, bottom, left)]
+
+    Returns:
+        list: Annotation dicts understood by ResultRenderCache
+    """
+    return [
+        {'location': [int(v) for v in location], 'label': f"Face {i + 1}", 'color': 'red'}
+        for i, location in enumerate(face_locations)
+    ]
+
+
+def recognition_annotations(recognized_faces):
+    """
+    Build annotations for face recognition results
+
+    Args:
+        recognized_faces: List of face recognition results
+
+    Returns:
+        list: Annotation dicts understood by ResultRenderCache
+    """
+    annotations = []
+    for face_info in recognized_faces:
+        if face_info.recognized:
+            label = f"{face_info.name} ({face_info.confidence:.2f})"
+            color = 'green'
+        else:
+            label = 'Unknown'
+            color = 'red'
+        annotations.append({
+            'location': [int(v) for v in face_info.location],
+            'label': label,
+            'color': color
+        })
+    return annotations
+
+
+class ResultRenderCache:
+    def __init__(self, cache_dir, max_size=1024, jpeg_quality=80, store=None):
+        """
+        Initialize the render cache
+
+        Args:
+            cache_dir (str): Directory holding specs and rendered previews
+            max_size (int): Longest side of a rendered preview in pixels
+            jpeg_quality (int): JPEG quality used for previews
+            store (ArtifactStore): Optional store enforcing quotas on cache_dir
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.jpeg_quality = jpeg_quality
+        self.store = store
+
+    def _spec_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def preview_path(self, key):
+        """Path of the rendered preview for a cache key"""
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    @staticmethod
+    def is_valid_key(key):
+        """Check that a key looks like one produced by register()"""
+        return bool(_KEY_PATTERN.match(key or ''))
+
+    def register(self, image_path, annotations, image_digest=None):
+        """
+        Register an annotated result without rendering it
+
+        Args:
+            image_path (str): Path to the source image
+            annotations (list): Annotation dicts (location, label, color)
+            image_digest (str): Precomputed digest of the source image
+
+        Returns:
+            str: Cache key identifying the preview
+        """
+        if image_digest is None:
+            image_digest = file_digest(image_path)
+
+        spec = {
+            'image_path': os.path.abspath(image_path),
+            'image_digest': image_digest,
+            'annotations': annotations,
+            'max_size': self.max_size,
+            'jpeg_quality': self.jpeg_quality
+        }
+        # Source path is not part of the identity: same pixels + same boxes = same preview
+        identity = {k: v for k, v in spec.items() if k != 'image_path'}
+        key = hashlib.sha1(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+        if self.store is not None:
+            self.store.start_sweeper()
+
+        spec_path = self._spec_path(key)
+        if not os.path.exists(spec_path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write_atomic(spec_path, json.dumps(spec).encode('utf-8'))
+        elif self.store is not None:
+            self.store.touch(spec_path)
+        return key
+
+    def get_or_render(self, key):
+        """
+        Return the preview path for a key, rendering it on first access
+
+        Args:
+            key (str): Cache key returned by register()
+
+        Returns:
+            str: Path to the JPEG preview, or None if the key is unknown
+        """
+        if not self.is_valid_key(key):
+            return None
+
+        preview_path = self.preview_path(key)
+        if os.path.exists(preview_path):
+            if self.store is not None:
+                self.store.touch(preview_path)
+                self.store.touch(self._spec_path(key))
+            return preview_path
+
+        try:
+            with open(self._spec_path(key), 'r') as f:
+                spec = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # The key promises these exact pixels: never render a source that changed since register()
+        try:
+            if file_digest(spec['image_path']) != spec['image_digest']:
+                return None
+        except OSError:
+            return None
+
+        self._render(spec, preview_path)
+        return preview_path
+
+    def _render(self, spec, preview_path):
+        """Decode, downscale, annotate and encode a single preview"""
+        max_size = spec['max_size']
+
+        with Image.open(spec['image_path']) as source:
+            original_width, original_height = source.size
+            # JPEG sources can be decoded directly at a reduced scale
+            source.draft('RGB', (max_size, max_size))
+            preview = source.convert('RGB')
+
+        preview.thumbnail((max_size, max_size))
+        scale_x = preview.width / original_width
+        scale_y = preview.height / original_height
+
+        draw = ImageDraw.Draw(preview)
+        line_width = max(1, int(round(3 * min(scale_x, scale_y))))
+
+        for annotation in spec['annotations']:
+            top, right, bottom, left = annotation['location']
+            top, bottom = int(top * scale_y), int(bottom * scale_y)
+            left, right = int(left * scale_x), int(right * scale_x)
+            color = annotation['color']
+            label = annotation['label']
+
+            draw.rectangle([left, top, right, bottom], outline=color, width=line_width)
+
+            text_bbox = draw.textbbox((left, bottom), label)
+            text_width = text_bbox[2] - text_bbox[0]
+            text_height = text_bbox[3] - text_bbox[1]
+            draw.rectangle([left, bottom, left + text_width + 10, bottom + text_height + 10], fill=color)
+            draw.text((left + 5, bottom + 3), label, fill="white")
+
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(preview_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                preview.save(f, format='JPEG', quality=spec['jpeg_quality'])
+            os.replace(tmp_path, preview_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _write_atomic(path, data):
+        # Unique temp name: threads of one process may write the same key concurrently
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise